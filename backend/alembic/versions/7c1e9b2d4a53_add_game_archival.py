@@ -0,0 +1,46 @@
+"""add game archival
+
+Revision ID: 7c1e9b2d4a53
+Revises: 03488f930e63
+Create Date: 2026-10-19 10:12:41.204117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e9b2d4a53'
+down_revision: Union[str, None] = '03488f930e63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('games', sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index(op.f('ix_games_finished_at'), 'games', ['finished_at'], unique=False)
+    op.create_table('archived_games',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('game_id', sa.Integer(), nullable=False),
+    sa.Column('room_id', sa.Integer(), nullable=True),
+    sa.Column('theme', sa.String(length=255), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('game_id')
+    )
+    op.create_index(op.f('ix_archived_games_id'), 'archived_games', ['id'], unique=False)
+    op.create_index(op.f('ix_archived_games_room_id'), 'archived_games', ['room_id'], unique=False)
+    op.create_index(op.f('ix_archived_games_finished_at'), 'archived_games', ['finished_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_archived_games_finished_at'), table_name='archived_games')
+    op.drop_index(op.f('ix_archived_games_room_id'), table_name='archived_games')
+    op.drop_index(op.f('ix_archived_games_id'), table_name='archived_games')
+    op.drop_table('archived_games')
+    op.drop_index(op.f('ix_games_finished_at'), table_name='games')
+    op.drop_column('games', 'finished_at')
@@ -0,0 +1,28 @@
+"""add room closed_at
+
+Revision ID: b4f2d8e61c07
+Revises: 7c1e9b2d4a53
+Create Date: 2026-10-19 14:37:09.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4f2d8e61c07'
+down_revision: Union[str, None] = '7c1e9b2d4a53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('gamerooms', sa.Column('closed_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index(op.f('ix_gamerooms_closed_at'), 'gamerooms', ['closed_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_gamerooms_closed_at'), table_name='gamerooms')
+    op.drop_column('gamerooms', 'closed_at')
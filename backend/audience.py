@@ -0,0 +1,213 @@
+# backend/audience.py
+import asyncio
+import json
+import os
+import uuid
+from fastapi import WebSocket
+from pydantic import ValidationError
+from database import redis
+from websocket import Connection, event_type, frame_too_large, manager as websocket_manager
+import metrics
+import rate_limit
+import room_lifecycle
+import schemas
+
+# Spectators get the room's events in batches at most this often
+AUDIENCE_FLUSH_INTERVAL_SECONDS = float(os.getenv("AUDIENCE_FLUSH_INTERVAL_SECONDS", "0.5"))
+AUDIENCE_MAX_PER_ROOM = int(os.getenv("AUDIENCE_MAX_PER_ROOM", "10000"))
+AUDIENCE_VOTE_TTL_SECONDS = int(os.getenv("AUDIENCE_VOTE_TTL_SECONDS", str(6 * 60 * 60)))
+
+# One vote per spectator per question, counted entirely in Redis
+_AUDIENCE_VOTE_SCRIPT = """
+if redis.call('SADD', KEYS[1], ARGV[1]) == 1 then
+    redis.call('HINCRBY', KEYS[2], ARGV[2], 1)
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+    return 1
+end
+return 0
+"""
+
+_audience_vote = redis.register_script(_AUDIENCE_VOTE_SCRIPT)
+
+
+def audience_channel(room_code: str) -> str:
+    """Events for spectators only, on top of the room's own channel."""
+    return f"audience:{room_code}"
+
+
+def votes_key(room_code: str, question_id: int) -> str:
+    return f"audience:{room_code}:{question_id}:votes"
+
+
+def voters_key(room_code: str, question_id: int) -> str:
+    return f"audience:{room_code}:{question_id}:voters"
+
+
+async def get_votes(room_code: str, question_id: int) -> dict:
+    counts = await redis.hgetall(votes_key(room_code, question_id))
+    return {answer_id: int(count) for answer_id, count in counts.items()}
+
+
+class AudienceHub:
+    """
+    Per-worker fan-out for spectators. Each room with local spectators has one
+    relay task on its own subscription, kept apart from the players' shared
+    one so spectators never count as present. Events are buffered and sent as
+    one pre-serialized batch per flush interval.
+    """
+
+    def __init__(self):
+        self.spectators: dict[str, dict[str, Connection]] = {}
+        self._relays: dict[str, asyncio.Task] = {}
+        self._pending: dict[str, list] = {}
+        self._current_question: dict[str, int] = {}
+        # Answer ids of the round open for voting, from its start_voting event
+        self._options: dict[str, frozenset] = {}
+        self._last_votes: dict[str, dict] = {}
+
+    async def connect(self, websocket: WebSocket, room_code: str):
+        if websocket_manager.draining:
+            await websocket_manager.refuse(websocket, 1012)
+            return None, None
+        if len(self.spectators.get(room_code, {})) >= AUDIENCE_MAX_PER_ROOM:
+            await websocket_manager.refuse(websocket, 1013)
+            return None, None
+
+        conn = await websocket_manager.accept(websocket, room_code, None)
+        spectator_id = uuid.uuid4().hex[:12]
+        self.spectators.setdefault(room_code, {})[spectator_id] = conn
+        if room_code not in self._relays:
+            self._relays[room_code] = asyncio.create_task(self._relay(room_code))
+        return spectator_id, conn
+
+    def disconnect(self, room_code: str, spectator_id: str):
+        room = self.spectators.get(room_code, {})
+        conn = room.pop(spectator_id, None)
+        if conn is not None:
+            conn.task.cancel()
+        if not room:
+            self.spectators.pop(room_code, None)
+            relay = self._relays.pop(room_code, None)
+            if relay:
+                relay.cancel()
+            self._pending.pop(room_code, None)
+            self._current_question.pop(room_code, None)
+            self._options.pop(room_code, None)
+            self._last_votes.pop(room_code, None)
+
+    async def release_room(self, room_code: str):
+        conns = list(self.spectators.get(room_code, {}).items())
+        for spectator_id, conn in conns:
+            self.disconnect(room_code, spectator_id)
+            try:
+                await conn.websocket.close(code=1001)
+            except RuntimeError:
+                pass  # Already closed
+
+    def accepts_vote(self, room_code: str, question_id: int, answer_id: int) -> bool:
+        return question_id == self._current_question.get(room_code) and answer_id in self._options.get(room_code, ())
+
+    async def receive(self, conn: Connection, spectator_id: str):
+        """
+        Takes votes until the socket closes. Votes and rate limits are keyed on
+        the id this worker gave the connection, which a client can't pick or
+        reuse; a spectator who reconnects is a new voter.
+        """
+        websocket, room_code = conn.websocket, conn.room_code
+        while True:
+            if conn.wire_protocol.binary:
+                data = await websocket.receive_bytes()
+            else:
+                data = await websocket.receive_text()
+
+            if not await rate_limit.allow_audience_message(room_code, spectator_id):
+                websocket_manager.reject(conn, "rate_limited", "You're doing that too fast. Slow down!")
+                continue
+            if frame_too_large(data):
+                websocket_manager.reject(conn, "frame_too_large", "Message is too large.")
+                continue
+            try:
+                message = schemas.AudienceVoteMessage.model_validate(conn.wire_protocol.decode(data))
+            except (ValueError, ValidationError):
+                websocket_manager.reject(conn, "invalid", "Message could not be understood.")
+                continue
+
+            question_id, answer_id = message.payload.question_id, message.payload.answer_id
+            if not self.accepts_vote(room_code, question_id, answer_id):
+                websocket_manager.reject(conn, "invalid_vote", "Voting isn't open for that answer.")
+                continue
+            await _audience_vote(
+                keys=[voters_key(room_code, question_id), votes_key(room_code, question_id)],
+                args=[spectator_id, answer_id, AUDIENCE_VOTE_TTL_SECONDS],
+            )
+            metrics.AUDIENCE_VOTES.inc()
+
+    def _buffer(self, room_code: str, message: str):
+        pending = self._pending.setdefault(room_code, [])
+        event = event_type(message)
+        if event == "player_update":
+            pending[:] = [m for m in pending if event_type(m) != "player_update"]
+        elif event == "new_question":
+            self._current_question[room_code] = json.loads(message)["question"]["id"]
+            self._options.pop(room_code, None)
+        elif event == "start_voting":
+            self._options[room_code] = frozenset(answer["id"] for answer in json.loads(message)["answers"])
+        elif event == "round_over":
+            self._options.pop(room_code, None)
+        pending.append(message)
+
+    def queue_publish(self, pipe, message: str, room_code: str):
+        """Adds a message for the room's spectators, and not its players, to a pipeline."""
+        pipe.publish(audience_channel(room_code), message)
+
+    async def flush_all(self):
+        """Sends every room's buffered batch now, ahead of a shutdown."""
+        for room_code in list(self._pending):
+            await self._flush(room_code)
+
+    async def _flush(self, room_code: str):
+        pending = self._pending.pop(room_code, [])
+
+        question_id = self._current_question.get(room_code)
+        if question_id is not None:
+            votes = await get_votes(room_code, question_id)
+            if votes and votes != self._last_votes.get(room_code):
+                self._last_votes[room_code] = votes
+                pending.append(json.dumps({"event": "audience_votes", "question_id": question_id, "votes": votes}))
+
+        if not pending:
+            return
+        # Messages are already JSON, so the batch is assembled without re-serializing
+        batch = '{"event": "audience_batch", "events": [' + ", ".join(pending) + "]}"
+        for conn in self.spectators.get(room_code, {}).values():
+            conn.send_queue.put(batch)
+        metrics.AUDIENCE_BATCHES.inc()
+
+    async def _relay(self, room_code: str):
+        loop = asyncio.get_running_loop()
+        pubsub = redis.pubsub()
+        channels = (f"room:{room_code}", audience_channel(room_code))
+        await pubsub.subscribe(*channels)
+        next_flush = loop.time() + AUDIENCE_FLUSH_INTERVAL_SECONDS
+        try:
+            while True:
+                timeout = max(0.0, next_flush - loop.time())
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+                if message and message['type'] == 'message':
+                    self._buffer(room_code, message['data'])
+                if loop.time() >= next_flush:
+                    await self._flush(room_code)
+                    next_flush = loop.time() + AUDIENCE_FLUSH_INTERVAL_SECONDS
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await pubsub.unsubscribe(*channels)
+            await pubsub.close()
+
+
+hub = AudienceHub()
+room_lifecycle.lifecycle.on_release(hub.release_room)
+
+metrics.AUDIENCE_SPECTATORS.set_function(lambda: sum(len(room) for room in hub.spectators.values()))
+
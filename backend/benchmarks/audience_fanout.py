@@ -0,0 +1,104 @@
+# backend/benchmarks/audience_fanout.py
+"""
+Simulates a streamed room with thousands of spectators on one worker.
+
+Connects in-memory fake sockets to the AudienceHub, publishes a burst of
+room events through Redis and measures how long until every spectator has
+the batch, then casts one audience vote per spectator. Needs a local Redis
+(REDIS_URL); MySQL is never touched. Run from backend/:
+
+    python benchmarks/audience_fanout.py --spectators 5000 --rounds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from routers import rooms  # noqa: E402,F401  (import order: rooms -> websocket -> audience)
+import audience  # noqa: E402
+from database import redis  # noqa: E402
+
+ROOM = "BENCHA"
+
+
+class FakeSocket:
+    def __init__(self, delivered: asyncio.Event, target: int):
+        self.scope = {"subprotocols": []}
+        self.frames = 0
+        self.bytes = 0
+        self._delivered = delivered
+        self._target = target
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def close(self, code=1000):
+        pass
+
+    async def send_text(self, data: str):
+        self.frames += 1
+        self.bytes += len(data)
+        FakeSocket.received += 1
+        if FakeSocket.received >= self._target:
+            self._delivered.set()
+
+    received = 0
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spectators", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    delivered = asyncio.Event()
+    sockets = [FakeSocket(delivered, args.spectators) for _ in range(args.spectators)]
+    ids = [(await audience.hub.connect(ws, ROOM))[0] for ws in sockets]
+    memory = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(baseline, "filename"))
+    await asyncio.sleep(0.1)  # let the relay subscribe
+
+    latencies = []
+    for round_number in range(1, args.rounds + 1):
+        FakeSocket.received = 0
+        delivered.clear()
+        start = time.perf_counter()
+        await redis.publish(f"room:{ROOM}", json.dumps({"event": "new_question", "question": {"id": round_number, "question_text": "?", "correct_answer_text": "!", "game_id": 1}}))
+        for user_id in range(1, 9):
+            await redis.publish(f"room:{ROOM}", json.dumps({"event": "player_answered", "user_id": user_id}))
+        await redis.publish(f"room:{ROOM}", json.dumps({"event": "player_update", "players": [{"id": i, "username": f"p{i}", "score": round_number} for i in range(1, 9)]}))
+        await delivered.wait()
+        latencies.append(time.perf_counter() - start)
+
+    vote_start = time.perf_counter()
+    for spectator_id in ids:
+        await audience._audience_vote(
+            keys=[audience.voters_key(ROOM, args.rounds), audience.votes_key(ROOM, args.rounds)],
+            args=[spectator_id, 1, 60],
+        )
+    vote_elapsed = time.perf_counter() - vote_start
+
+    frames = sum(ws.frames for ws in sockets)
+    sent_bytes = sum(ws.bytes for ws in sockets)
+    print(f"{args.spectators} spectators, {args.rounds} rounds of 10 events each")
+    print(f"publish -> all delivered: median {statistics.median(latencies) * 1000:.0f} ms, max {max(latencies) * 1000:.0f} ms "
+          f"(includes up to {audience.AUDIENCE_FLUSH_INTERVAL_SECONDS * 1000:.0f} ms batching delay)")
+    print(f"frames per spectator per round: {frames / args.spectators / args.rounds:.1f}, bytes per spectator per round: {sent_bytes / args.spectators / args.rounds:.0f}")
+    print(f"hub memory per spectator: {memory / args.spectators:.0f} B")
+    print(f"audience votes: {args.spectators / vote_elapsed:.0f} votes/s (sequential, one connection)")
+
+    for spectator_id in ids:
+        audience.hub.disconnect(ROOM, spectator_id)
+    await redis.delete(audience.voters_key(ROOM, args.rounds), audience.votes_key(ROOM, args.rounds))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
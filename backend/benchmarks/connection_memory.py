@@ -0,0 +1,104 @@
+# backend/benchmarks/connection_memory.py
+"""
+Measures what an idle player socket costs a worker.
+
+Opens in-memory sockets through ConnectionManager.connect, spread over rooms
+of --players, each with its endpoint coroutine parked in message_receiver
+the way an idle client's is. Reports resident memory and Python heap growth
+per 1,000 connections, plus tasks and Redis connections per socket, and
+projects the total for --project sockets. Needs a local Redis (REDIS_URL);
+MySQL is never touched. Run from backend/:
+
+    python benchmarks/connection_memory.py --connections 10000
+"""
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from routers import rooms  # noqa: E402,F401  (import order: rooms -> websocket -> audience)
+from websocket import manager  # noqa: E402
+from database import redis, redis_pool  # noqa: E402
+
+
+class IdleSocket:
+    scope = {"subprotocols": []}
+    _never = None
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def receive_text(self):
+        await IdleSocket._never.wait()
+
+    async def send_text(self, data: str):
+        pass
+
+    async def close(self, code=1000):
+        pass
+
+
+def resident_bytes() -> int:
+    # Current RSS from /proc; ru_maxrss (peak, KiB on Linux) elsewhere
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--players", type=int, default=8, help="Sockets per room")
+    parser.add_argument("--project", type=int, default=10000, help="Socket count to size a worker for")
+    args = parser.parse_args()
+
+    IdleSocket._never = asyncio.Event()
+    # Warm up imports, the shared subscription and the fan-out task
+    warm = await manager.connect(IdleSocket(), "WARMUP", -1)
+    await manager.disconnect(warm)
+
+    gc.collect()
+    tracemalloc.start()
+    heap_before = tracemalloc.get_traced_memory()[0]
+    rss_before = resident_bytes()
+    tasks_before = len(asyncio.all_tasks())
+
+    receivers = []
+    for i in range(args.connections):
+        conn = await manager.connect(IdleSocket(), f"MEM{i // args.players:05d}", i + 1)
+        receivers.append(asyncio.create_task(manager.message_receiver(conn)))
+    await asyncio.sleep(0.5)  # let every writer and receiver park
+
+    gc.collect()
+    heap = tracemalloc.get_traced_memory()[0] - heap_before
+    rss = resident_bytes() - rss_before
+    tasks = len(asyncio.all_tasks()) - tasks_before
+    tracemalloc.stop()
+
+    per_thousand = 1000 / args.connections
+    print(f"{args.connections} idle sockets in {len(manager.registry.by_room)} rooms")
+    print(f"resident memory: {rss * per_thousand / 2**20:.1f} MiB per 1,000 sockets")
+    print(f"python heap:     {heap * per_thousand / 2**20:.1f} MiB per 1,000 sockets ({heap / args.connections:.0f} B each)")
+    print(f"asyncio tasks:   {tasks / args.connections:.1f} per socket (receiver counted as the endpoint coroutine)")
+    print(f"redis connections held: {len(redis_pool._connections)}")
+    print(f"projected for {args.project} sockets: {rss * args.project / args.connections / 2**20:.0f} MiB resident")
+
+    for task in receivers:
+        task.cancel()
+    await asyncio.gather(*receivers, return_exceptions=True)
+    await redis.delete(*{f"room:MEM{i // args.players:05d}:presence" for i in range(args.connections)})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,422 @@
+# backend/benchmarks/game_replay.py
+"""
+Replays recorded games against the game engine and fails on regressions.
+
+Traces are JSON-lines files written by a server running with
+EVENT_TRACE_PATH set (see event_trace.py): room create and join, sockets
+connecting, the start, every answer and vote, the host advancing, and
+disconnects. Each trace is replayed straight into the room handlers
+(_start_game_logic, handle_answer_submission, handle_vote_submission,
+host_advance_to_next_question) through ConnectionManager.handle_message and
+the crud functions, with no sockets. MySQL is replaced by a SQLite file and
+Gemini by a scratch question cache; Redis is a local scratch database
+(REDIS_URL, default db 15, which is flushed). Set GAME_STORE=redis to
+replay against the Redis-only game store, or METADATA_CACHE_SIZE=0 to
+replay without the metadata cache (metadata_cache_rounds.py compares both).
+
+Every call to those functions is timed, and its SQL statements counted,
+including the calls it makes itself. Heap allocations are measured on one
+extra pass under tracemalloc, so tracing never skews the timings. The
+results are compared with the baseline in traces/baseline.json, and the
+script exits 1 if any function got slower, more query-hungry or more
+allocation-heavy than the thresholds allow, or if there is no baseline to
+compare with. Timings depend on the machine, so re-record the baseline
+where the comparison runs. Run from backend/:
+
+    python benchmarks/game_replay.py --repeat 5 --update-baseline  # record a baseline
+    python benchmarks/game_replay.py --repeat 5                    # compare against it
+"""
+import argparse
+import asyncio
+import contextvars
+import functools
+import glob
+import inspect
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bazinga_replay.sqlite3')}")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+# Replays run flat out; the pause players get to read their vote result is not engine work
+os.environ.setdefault("VOTE_RESULTS_DISPLAY_SECONDS", "0")
+
+from fastapi.concurrency import run_in_threadpool  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from routers import rooms as rooms_router  # noqa: E402  (import order: rooms -> websocket -> audience)
+from websocket import Connection, SendQueue, manager  # noqa: E402
+from database import SessionLocal, engine, redis, redis_pipeline  # noqa: E402
+from services import gemini  # noqa: E402
+import crud, models, schemas  # noqa: E402
+import game_state  # noqa: E402
+import game_store  # noqa: E402
+import presence  # noqa: E402
+import protocol  # noqa: E402
+import room_lifecycle  # noqa: E402
+
+TRACES_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "traces")
+ROOM_FUNCTIONS = ["_start_game_logic", "handle_answer_submission", "handle_vote_submission", "host_advance_to_next_question", "advance_to_next_question"]
+
+_frames = contextvars.ContextVar("replay_frames", default=())
+# Set while the harness looks things up itself, so its reads aren't counted
+_paused = contextvars.ContextVar("replay_paused", default=False)
+
+
+class FunctionStats:
+    def __init__(self):
+        self.times_ms = []
+        self.queries = 0
+        self.alloc_bytes = 0
+
+
+class Frame:
+    __slots__ = ("stats", "queries")
+
+    def __init__(self, stats: FunctionStats):
+        self.stats = stats
+        self.queries = 0
+
+
+class Profiler:
+    """Wraps the functions under test; a call's figures include the calls it makes."""
+
+    def __init__(self):
+        self.stats: dict[str, FunctionStats] = {}
+        self.tracing = False
+        # Statements issued inside any instrumented call, each counted once
+        self.queries = 0
+        event.listen(engine, "after_cursor_execute", self._count_query)
+
+    def _count_query(self, conn, cursor, statement, parameters, context, executemany):
+        # run_in_threadpool copies the context, so crud work in threads is attributed too
+        frames = _frames.get()
+        if frames:
+            self.queries += 1
+        for frame in frames:
+            frame.queries += 1
+
+    def reset(self, tracing: bool):
+        self.stats = {}
+        self.tracing = tracing
+        self.queries = 0
+
+    def _enter(self, name: str):
+        frame = Frame(self.stats.setdefault(name, FunctionStats()))
+        token = _frames.set(_frames.get() + (frame,))
+        alloc = tracemalloc.get_traced_memory()[0] if self.tracing else 0
+        return frame, token, alloc, time.perf_counter()
+
+    def _exit(self, frame, token, alloc, start):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        _frames.reset(token)
+        frame.stats.times_ms.append(elapsed_ms)
+        frame.stats.queries += frame.queries
+        if self.tracing:
+            frame.stats.alloc_bytes += max(0, tracemalloc.get_traced_memory()[0] - alloc)
+
+    def instrument(self, module, name: str, label: str):
+        func = getattr(module, name)
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if _paused.get():
+                    return await func(*args, **kwargs)
+                entered = self._enter(label)
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self._exit(*entered)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if _paused.get():
+                    return func(*args, **kwargs)
+                entered = self._enter(label)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._exit(*entered)
+        setattr(module, name, wrapper)
+
+
+def load_trace(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def seed_question_cache(traces: list, path: str):
+    # Enough cached questions per theme that no game reaches the Gemini API
+    needed = {}
+    for trace in traces:
+        for e in trace:
+            if e["kind"] == "start_game":
+                needed[e["theme"]] = max(needed.get(e["theme"], 0), e["num_questions"])
+    questions = {
+        theme: [{"question_text": f"Replay question {i} about {theme}?", "correct_answer": f"replay answer {i}"} for i in range(count)]
+        for theme, count in needed.items()
+    }
+    with open(path, "w") as f:
+        json.dump(questions, f)
+    gemini.QUESTIONS_FILE_PATH = path
+
+
+class Replay:
+    """Plays one trace; trace room codes and user ids are mapped to fresh ones."""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.rooms: dict[str, str] = {}
+        self.users: dict[int, int] = {}
+        self.conns: dict[int, Connection] = {}
+        self.started: set = set()
+        self.games: dict[str, int] = {}
+
+    def _user(self, db, trace_user: int):
+        username = f"replay-{self.run_id}-{trace_user}"
+        db_user = crud.get_user_by_username(db, username=username) or crud.create_user(db, schemas.UserCreate(username=username, password="x"))
+        self.users[trace_user] = db_user.id
+        return db_user
+
+    def _create_room(self, e):
+        db = SessionLocal()
+        try:
+            room = schemas.GameRoomCreate(name=e.get("name", "replay"), max_players=e.get("max_players", 8))
+            self.rooms[e["room"]] = crud.create_room(db, room, self._user(db, e["user"])).room_code
+        finally:
+            db.close()
+
+    def _join(self, e):
+        db = SessionLocal()
+        try:
+            crud.join_room(db, self.rooms[e["room"]], self._user(db, e["user"]))
+        finally:
+            db.close()
+
+    async def _current_question(self, room_code: str):
+        """Returns (question id, correct answer, {author id: answer id}) for the room's live question."""
+        token = _paused.set(True)
+        db = SessionLocal()
+        try:
+            state = await game_state.get(room_code)
+            question = await game_store.current_question(db, state)
+            answers = await game_store.store.get_answers(db, question.id)
+            self.games[room_code] = state.game_id
+            return question.id, question.correct_answer_text, {a.player_id: a.id for a in answers}
+        finally:
+            db.close()
+            _paused.reset(token)
+
+    async def _set_presence(self, room_code: str, user_id: int, joined: bool):
+        room_conns = [c for c in self.conns.values() if c.room_code == room_code]
+        async with redis_pipeline() as pipe:
+            if joined:
+                pipe.sadd(room_lifecycle.users_key(room_code), user_id)
+            else:
+                pipe.srem(room_lifecycle.users_key(room_code), user_id)
+            presence.queue_set_count(pipe, room_code, len(room_conns))
+            await pipe.execute()
+
+    async def _send(self, user_id: int, message: dict):
+        await manager.handle_message(self.conns[user_id], schemas.ClientMessage.validate_python(message))
+
+    async def play(self, trace: list):
+        for e in trace:
+            kind = e["kind"]
+            if kind == "create_room":
+                await run_in_threadpool(self._create_room, e)
+                continue
+            if kind == "join":
+                await run_in_threadpool(self._join, e)
+                continue
+
+            room_code, user_id = self.rooms[e["room"]], self.users[e["user"]]
+            if kind == "connect":
+                self.conns[user_id] = Connection(None, room_code, user_id, protocol.for_subprotocol(None), SendQueue())
+                await self._set_presence(room_code, user_id, joined=True)
+            elif kind == "disconnect":
+                self.conns.pop(user_id, None)
+                await self._set_presence(room_code, user_id, joined=False)
+                # What the debounced answer check would run once the leave settles
+                await rooms_router.handle_answer_submission(room_code)
+            elif kind == "start_game":
+                self.started.add(room_code)
+                await self._send(user_id, {"type": "START_GAME", "payload": {"theme": e["theme"], "num_questions": e["num_questions"]}})
+            elif kind == "answer":
+                question_id, correct_answer, _ = await self._current_question(room_code)
+                # Replayed questions differ from the recorded ones, so a guess of the real answer is re-aimed at this one
+                text = correct_answer if e["rejected"] == "correct" else e["text"]
+                await self._send(user_id, {"type": "SUBMIT_ANSWER", "payload": {"question_id": question_id, "answer_text": text}})
+            elif kind == "vote":
+                _, _, answers = await self._current_question(room_code)
+                author = self.users.get(e["author"]) if e["author"] is not None else None
+                await self._send(user_id, {"type": "SUBMIT_VOTE", "payload": {"answer_id": answers[author]}})
+            elif kind == "next_question":
+                db = SessionLocal()
+                try:
+                    await rooms_router.host_advance_to_next_question(room_code, user_id, db)
+                finally:
+                    db.close()
+
+    async def finished_games(self) -> int:
+        token = _paused.set(True)
+        db = SessionLocal()
+        try:
+            games = [await game_store.store.get_game(db, game_id) for game_id in self.games.values()]
+            return sum(1 for game in games if game and game.finished)
+        finally:
+            db.close()
+            _paused.reset(token)
+
+
+async def keep_worker_alive():
+    # Replayed players count as present only while this worker heartbeats
+    while True:
+        await presence.heartbeat()
+        await asyncio.sleep(presence.WORKER_HEARTBEAT_SECONDS)
+
+
+async def replay_all(traces: list, run_id: str) -> tuple:
+    finished = started = 0
+    for i, trace in enumerate(traces):
+        replay = Replay(f"{run_id}-{i}")
+        await replay.play(trace)
+        finished += await replay.finished_games()
+        started += len(replay.started)
+    # Let debounced broadcasts and background score writes land before the next pass
+    await asyncio.sleep(rooms_router.PLAYER_UPDATE_DEBOUNCE_SECONDS + 0.1)
+    return finished, started
+
+
+def summarize(timed: dict, traced: dict, runs: int) -> dict:
+    summary = {}
+    for name, stats in sorted(timed.items()):
+        times = sorted(stats.times_ms)
+        calls = len(times)
+        alloc = traced.get(name)
+        summary[name] = {
+            "calls_per_run": calls / runs,
+            "median_ms": statistics.median(times),
+            "p95_ms": times[min(calls - 1, int(calls * 0.95))],
+            "queries_per_call": stats.queries / calls,
+            "alloc_kib_per_call": alloc.alloc_bytes / len(alloc.times_ms) / 1024 if alloc and alloc.times_ms else 0.0,
+        }
+    return summary
+
+
+def compare(summary: dict, baseline: dict, args) -> list:
+    failures = []
+    for name, current in summary.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if current["median_ms"] > base["median_ms"] * args.time_threshold and current["median_ms"] - base["median_ms"] > args.time_slack_ms:
+            failures.append(f"{name}: median {base['median_ms']:.2f} -> {current['median_ms']:.2f} ms")
+        if current["queries_per_call"] > base["queries_per_call"] + args.query_slack:
+            failures.append(f"{name}: {base['queries_per_call']:.1f} -> {current['queries_per_call']:.1f} queries per call")
+        if (current["alloc_kib_per_call"] > base["alloc_kib_per_call"] * args.alloc_threshold
+                and current["alloc_kib_per_call"] - base["alloc_kib_per_call"] > args.alloc_slack_kib):
+            failures.append(f"{name}: {base['alloc_kib_per_call']:.1f} -> {current['alloc_kib_per_call']:.1f} KiB allocated per call")
+    return failures
+
+
+def print_report(summary: dict, baseline: dict):
+    print(f"{'function':<36} {'calls':>6} {'median ms':>10} {'p95 ms':>8} {'queries':>8} {'KiB':>8} {'base ms':>8} {'base q':>7}")
+    for name, s in summary.items():
+        base = baseline.get(name, {})
+        base_ms = f"{base['median_ms']:.2f}" if base else "-"
+        base_q = f"{base['queries_per_call']:.1f}" if base else "-"
+        print(f"{name:<36} {s['calls_per_run']:>6.0f} {s['median_ms']:>10.2f} {s['p95_ms']:>8.2f} "
+              f"{s['queries_per_call']:>8.1f} {s['alloc_kib_per_call']:>8.1f} {base_ms:>8} {base_q:>7}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trace", action="append", help="Trace file (repeatable); defaults to benchmarks/traces/*.jsonl")
+    parser.add_argument("--baseline", default=os.path.join(TRACES_DIR, "baseline.json"))
+    parser.add_argument("--update-baseline", action="store_true", help="Write this run's figures as the new baseline")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed passes over the traces, after one warm-up")
+    parser.add_argument("--time-threshold", type=float, default=1.25, help="Allowed median slowdown ratio")
+    parser.add_argument("--time-slack-ms", type=float, default=0.5, help="Slowdowns smaller than this never fail")
+    parser.add_argument("--query-slack", type=float, default=0.0, help="Extra queries per call allowed")
+    parser.add_argument("--alloc-threshold", type=float, default=1.5, help="Allowed allocation growth ratio")
+    parser.add_argument("--alloc-slack-kib", type=float, default=16.0, help="Allocation growth smaller than this never fails")
+    parser.add_argument("--output", help="Also write this run's figures to this file, in the baseline's format")
+    args = parser.parse_args()
+
+    paths = args.trace or sorted(glob.glob(os.path.join(TRACES_DIR, "*.jsonl")))
+    traces = [load_trace(path) for path in paths]
+    seed_question_cache(traces, os.path.join(tempfile.gettempdir(), "bazinga_replay_questions.json"))
+
+    await run_in_threadpool(models.Base.metadata.drop_all, bind=engine)
+    await run_in_threadpool(models.Base.metadata.create_all, bind=engine)
+    await redis.flushdb()
+
+    profiler = Profiler()
+    for name in ROOM_FUNCTIONS:
+        profiler.instrument(rooms_router, name, name)
+    for name, func in inspect.getmembers(crud, inspect.isfunction):
+        if func.__module__ == crud.__name__ and not name.startswith("_") and name != "utcnow":
+            profiler.instrument(crud, name, f"crud.{name}")
+    for name, _ in inspect.getmembers(game_store.GameStore, inspect.iscoroutinefunction):
+        profiler.instrument(game_store.store, name, f"store.{name}")
+
+    heartbeat = asyncio.create_task(keep_worker_alive())
+    run_id = str(int(time.time()))
+    await replay_all(traces, f"{run_id}-warmup")
+
+    profiler.reset(tracing=False)
+    finished = started = 0
+    for i in range(args.repeat):
+        done, total = await replay_all(traces, f"{run_id}-{i}")
+        finished, started = finished + done, started + total
+    timed = profiler.stats
+    # Each next_question event closes one round
+    rounds = args.repeat * sum(1 for trace in traces for e in trace if e["kind"] == "next_question")
+    queries_per_round = profiler.queries / max(rounds, 1)
+
+    profiler.reset(tracing=True)
+    tracemalloc.start()
+    await replay_all(traces, f"{run_id}-alloc")
+    tracemalloc.stop()
+    traced = profiler.stats
+    heartbeat.cancel()
+
+    summary = summarize(timed, traced, args.repeat)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["functions"]
+
+    print(f"{len(paths)} trace(s) x {args.repeat} passes; {finished}/{started} games reached game_over")
+    print_report(summary, baseline)
+    print(f"SQL statements per round: {queries_per_round:.1f}")
+
+    figures = {"traces": [os.path.basename(p) for p in paths], "repeat": args.repeat, "queries_per_round": queries_per_round, "functions": summary}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(figures, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(figures, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    failures = compare(summary, baseline, args)
+    if finished < started:
+        failures.append(f"only {finished} of {started} replayed games reached game_over; the engine diverged from the trace")
+    if not baseline:
+        # Nothing was compared, which must not read as a pass
+        failures.append(f"no baseline at {args.baseline}; record one with --update-baseline")
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    print("FAIL" if failures else "PASS")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
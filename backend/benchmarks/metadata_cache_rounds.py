@@ -0,0 +1,56 @@
+# backend/benchmarks/metadata_cache_rounds.py
+"""
+Shows what the metadata cache saves: replays the recorded games twice with
+benchmarks/game_replay.py, once with METADATA_CACHE_SIZE=0 and once with the
+cache on, and compares the SQL statements issued per round and per call of
+each function whose count changed. Exits 1 if the cache doesn't cut the
+statements per round. Needs what game_replay.py needs (a local Redis). Run
+from backend/:
+
+    python benchmarks/metadata_cache_rounds.py --repeat 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPLAY = os.path.join(os.path.dirname(os.path.realpath(__file__)), "game_replay.py")
+
+
+def replay(cache_size: str, repeat: int, workdir: str) -> dict:
+    output = os.path.join(workdir, f"cache-{cache_size}.json")
+    env = {**os.environ, "METADATA_CACHE_SIZE": cache_size}
+    # Recorded as a throwaway baseline, so the replay reports without comparing
+    subprocess.run(
+        [sys.executable, REPLAY, "--repeat", str(repeat), "--baseline", output, "--update-baseline"],
+        env=env, check=True, stdout=subprocess.DEVNULL,
+    )
+    with open(output) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--cache-size", default="4096")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        uncached = replay("0", args.repeat, workdir)
+        cached = replay(args.cache_size, args.repeat, workdir)
+
+    print(f"{'function':<36} {'queries off':>12} {'queries on':>11}")
+    for name, off in uncached["functions"].items():
+        on = cached["functions"].get(name)
+        if on and on["queries_per_call"] != off["queries_per_call"]:
+            print(f"{name:<36} {off['queries_per_call']:>12.1f} {on['queries_per_call']:>11.1f}")
+    before, after = uncached["queries_per_round"], cached["queries_per_round"]
+    print(f"SQL statements per round: {before:.1f} without the cache, {after:.1f} with it "
+          f"({(1 - after / before) * 100 if before else 0:.0f}% fewer)")
+    sys.exit(0 if after < before else 1)
+
+
+if __name__ == "__main__":
+    main()
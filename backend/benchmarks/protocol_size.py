@@ -0,0 +1,81 @@
+# backend/benchmarks/protocol_size.py
+"""
+Replays the server messages of a synthetic game through each wire protocol
+and reports bytes per game and encode CPU per broadcast, per socket.
+
+The "+deflate" rows estimate permessage-deflate with context takeover (the
+uvicorn default) by streaming each socket's frames through one zlib context.
+Needs msgpack for the v2 rows. Run from backend/:
+
+    python benchmarks/protocol_size.py --players 8 --questions 10
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+import protocol  # noqa: E402
+
+
+def game_messages(num_players: int, num_questions: int):
+    players = [{"username": f"player{i}", "id": i, "score": 0} for i in range(1, num_players + 1)]
+    questions = [
+        {"question_text": f"Which surprisingly long trivia question number {q} has this answer?",
+         "correct_answer_text": f"Answer {q}", "id": q, "game_id": 1, "correct_answer_id": None}
+        for q in range(1, num_questions + 1)
+    ]
+    messages = [json.dumps({"event": "player_update", "players": players}) for _ in range(num_players)]
+    messages.append(json.dumps({"event": "game_started", "game": {"theme": "Weird History", "id": 1, "room_id": 1, "questions": questions, "current_question_id": 1}}))
+    for question in questions:
+        messages.append(json.dumps({"event": "new_question", "question": question}))
+        messages += [json.dumps({"event": "player_answered", "user_id": p["id"]}) for p in players]
+        answers = [{"answer_text": f"Fake answer from {p['username']}", "id": p["id"], "player_id": p["id"]} for p in players]
+        messages.append(json.dumps({"event": "start_voting", "answers": answers}))
+        messages += [json.dumps({"event": "player_voted", "user_id": p["id"]}) for p in players]
+        results = {p["id"]: {"is_correct": False, "fooled_by": "player1", "text": "Fake answer"} for p in players}
+        messages.append(json.dumps({"event": "all_vote_results", "results": results}))
+        # A round usually moves a few scores, not all of them
+        for p in random.sample(players, k=max(1, num_players // 3)):
+            p["score"] += 1
+        messages.append(json.dumps({"event": "player_update", "players": players}))
+        messages.append(json.dumps({"event": "round_over", "results": [{"answer_text": "x", "author": "y", "voters": [], "points": 0}]}))
+    messages.append(json.dumps({"event": "game_over", "leaderboard": players}))
+    return messages
+
+
+def measure(subprotocol, messages, sockets: int):
+    total_bytes = 0
+    deflated_bytes = 0
+    start = time.perf_counter()
+    for _ in range(sockets):
+        wire = protocol.for_subprotocol(subprotocol)
+        compressor = zlib.compressobj(wbits=-15)
+        for message in messages:
+            encoded = wire.encode(message)
+            frame = encoded if isinstance(encoded, bytes) else encoded.encode()
+            total_bytes += len(frame)
+            deflated_bytes += len(compressor.compress(frame) + compressor.flush(zlib.Z_SYNC_FLUSH))
+    elapsed = time.perf_counter() - start
+    return total_bytes / sockets, deflated_bytes / sockets, elapsed / (sockets * len(messages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--questions", type=int, default=10)
+    args = parser.parse_args()
+
+    random.seed(0)
+    messages = game_messages(args.players, args.questions)
+    print(f"{len(messages)} broadcasts per game, {args.players} sockets")
+    for subprotocol in protocol.supported_subprotocols():
+        raw, deflated, cpu = measure(subprotocol, messages, args.players)
+        print(f"{subprotocol:<20} {raw:>9.0f} B/socket/game  +deflate {deflated:>8.0f} B  {cpu * 1e6:>6.1f} us/broadcast/socket")
+
+
+if __name__ == "__main__":
+    main()
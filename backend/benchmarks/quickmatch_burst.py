@@ -0,0 +1,75 @@
+# backend/benchmarks/quickmatch_burst.py
+"""
+Burst test for quick-match seating: fires thousands of concurrent seat
+claims at the lobby index and checks that no room is handed out more seats
+than it has and that the burst fills rooms instead of scattering players
+across new ones.
+
+Only the Redis side is exercised (lobby.claim_seat); the MySQL join that
+follows a claim touches a single room row, so DATABASE_URL defaults to an
+unused SQLite file. Needs a local Redis (REDIS_URL); the lobby keys are
+cleared first, so point it at a scratch database. Run from backend/:
+
+    python benchmarks/quickmatch_burst.py --players 5000 --themes 4
+"""
+import argparse
+import asyncio
+import collections
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+# Importing database needs a URL even though nothing here touches MySQL
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bazinga_quickmatch.sqlite3')}")
+
+from database import redis  # noqa: E402
+import crud  # noqa: E402
+import lobby  # noqa: E402
+
+
+async def clear_lobby(themes):
+    await redis.delete(lobby.ROOMS_KEY, lobby.SEATS_KEY, *(lobby.listing_key(t) for t in themes))
+
+
+async def claim(theme: str, room_size: int, latencies: list):
+    start = time.perf_counter()
+    result = await lobby.claim_seat(theme, crud.new_room_code(), room_size)
+    latencies.append(time.perf_counter() - start)
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=5000)
+    parser.add_argument("--themes", type=int, default=4)
+    parser.add_argument("--room-size", type=int, default=8)
+    args = parser.parse_args()
+
+    themes = [f"bench-theme-{i}" for i in range(args.themes)]
+    await clear_lobby(themes)
+    latencies = []
+    started = time.perf_counter()
+    results = await asyncio.gather(*(claim(themes[i % len(themes)], args.room_size, latencies) for i in range(args.players)))
+    elapsed = time.perf_counter() - started
+
+    seats = collections.Counter(room_code for room_code, _ in results)
+    created = sum(1 for _, was_created in results if was_created)
+    overbooked = [room_code for room_code, taken in seats.items() if taken > args.room_size]
+    # Claims are serialized per theme, so only each theme's last room may be partly full
+    ideal = sum(-(-len(range(i, args.players, len(themes))) // args.room_size) for i in range(len(themes)))
+    latencies.sort()
+
+    print(f"{args.players} claims in {elapsed:.2f}s ({args.players / elapsed:.0f}/s)")
+    print(f"claim latency p50 {statistics.median(latencies) * 1000:.2f}ms, p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f}ms")
+    print(f"rooms created {created} (minimum {ideal}), seats per room avg {args.players / max(created, 1):.2f}")
+    print(f"overbooked rooms: {len(overbooked)}")
+    await clear_lobby(themes)
+    if overbooked or created != ideal:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
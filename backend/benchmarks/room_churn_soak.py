@@ -0,0 +1,174 @@
+# backend/benchmarks/room_churn_soak.py
+"""
+Soak test for room expiry: runs a compressed day of room churn and checks
+that per-worker memory, Redis keys and open rooms stay flat: the run exits
+1 if the second half's peaks rise past the allowed growth over the first
+half's (see --max-heap-growth-kib, --max-key-growth, --max-room-growth).
+
+Each simulated hour creates a batch of rooms, connects players through the
+connection manager with in-memory sockets, starts a game, then lets
+everyone leave. Rooms are left to expire through the real Redis TTL and
+keyspace notification path, with the idle TTL scaled down to match the
+compressed clock. Needs a local Redis that allows CONFIG SET; the run
+flushes it, so REDIS_URL defaults to the scratch db 15 and any other db is
+refused. MySQL is replaced by a SQLite file unless DATABASE_URL is set.
+Run from backend/:
+
+    python benchmarks/room_churn_soak.py --hours 24 --rooms-per-hour 200
+"""
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bazinga_soak.sqlite3')}")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+SCRATCH_REDIS_DB = 15
+
+from fastapi.concurrency import run_in_threadpool  # noqa: E402
+from routers import rooms  # noqa: E402  (import order: rooms -> websocket -> audience)
+from websocket import manager  # noqa: E402
+from database import SessionLocal, engine, redis, redis_pipeline  # noqa: E402
+import crud, models, schemas  # noqa: E402
+import game_state  # noqa: E402
+import room_lifecycle  # noqa: E402
+
+
+class FakeSocket:
+    scope = {"subprotocols": []}
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, data: str):
+        pass
+
+    async def close(self, code=1000):
+        pass
+
+
+def reset_database():
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+
+
+def create_rooms(count: int, players: int):
+    db = SessionLocal()
+    try:
+        created = []
+        for _ in range(count):
+            users = [crud.create_user(db, schemas.UserCreate(username=f"soak-{time.perf_counter_ns()}-{i}", password="x")) for i in range(players)]
+            db_room = crud.create_room(db, schemas.GameRoomCreate(name="soak", max_players=players), users[0])
+            for user in users[1:]:
+                crud.join_room(db, db_room.room_code, user)
+            created.append((db_room.room_code, [u.id for u in users]))
+        return created
+    finally:
+        db.close()
+
+
+def count_open_rooms():
+    db = SessionLocal()
+    try:
+        return db.query(models.GameRoom).filter(models.GameRoom.closed_at.is_(None)).count()
+    finally:
+        db.close()
+
+
+async def churn(created):
+    lifecycle = room_lifecycle.lifecycle
+    conns = []
+    for room_code, user_ids in created:
+        for user_id in user_ids:
+            conns.append(await manager.connect(FakeSocket(), room_code, user_id))
+        async with redis_pipeline() as pipe:
+            pipe.sadd(room_lifecycle.users_key(room_code), *user_ids)
+            game_state.queue_start(pipe, room_code, 1, ["soak question"])
+            lifecycle.queue_touch(pipe, room_code)
+            await pipe.execute()
+        rooms.player_updates.schedule(room_code)
+
+    for conn in conns:
+        await manager.disconnect(conn)
+        await redis.srem(room_lifecycle.users_key(conn.room_code), conn.user_id)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--rooms-per-hour", type=int, default=200)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--hour-seconds", type=float, default=3.0, help="Real seconds per simulated hour")
+    parser.add_argument("--max-heap-growth-kib", type=float, default=256.0, help="Allowed rise in peak heap, first half to second half")
+    parser.add_argument("--max-key-growth", type=int, help="Allowed rise in peak Redis keys (default: 2 per room of one hour)")
+    parser.add_argument("--max-room-growth", type=int, help="Allowed rise in peak open and tracked rooms (default: one hour's rooms)")
+    args = parser.parse_args()
+    # Samples land at different points of an hour's expiry, so a peak can
+    # move by about one hour's rooms without anything leaking
+    max_key_growth = args.max_key_growth if args.max_key_growth is not None else 2 * args.rooms_per_hour
+    max_room_growth = args.max_room_growth if args.max_room_growth is not None else args.rooms_per_hour
+
+    redis_db = redis.connection_pool.connection_kwargs.get("db", 0)
+    if int(redis_db) != SCRATCH_REDIS_DB:
+        sys.exit(f"Refusing to flush Redis db {redis_db}; point REDIS_URL at the scratch db {SCRATCH_REDIS_DB}.")
+
+    # One simulated hour of idling is enough to expire a room
+    idle_ttl = max(1, int(args.hour_seconds / 2))
+    lifecycle = room_lifecycle.lifecycle
+    lifecycle.idle_ttl = idle_ttl
+    lifecycle.touch_interval = idle_ttl / 10
+
+    await run_in_threadpool(reset_database)
+    await redis.flushdb()
+    listener = asyncio.create_task(lifecycle.listen_for_expirations())
+    # One warm-up round so first-use allocations don't count as growth
+    await churn(await run_in_threadpool(create_rooms, 1, args.players))
+    await asyncio.sleep(args.hour_seconds)
+
+    tracemalloc.start()
+    gc.collect()
+    baseline = tracemalloc.get_traced_memory()[0]
+    samples = []
+    print(f"{'hour':>4} {'heap KiB':>9} {'rooms held':>10} {'tracked':>8} {'redis keys':>10} {'open rooms':>10}")
+    for hour in range(1, args.hours + 1):
+        start = time.perf_counter()
+        await churn(await run_in_threadpool(create_rooms, args.rooms_per_hour, args.players))
+        await asyncio.sleep(max(0.0, args.hour_seconds - (time.perf_counter() - start)))
+
+        gc.collect()
+        heap = (tracemalloc.get_traced_memory()[0] - baseline) / 1024
+        sample = (hour, heap, len(manager.registry.by_room), len(lifecycle._last_touch), await redis.dbsize(), await run_in_threadpool(count_open_rooms))
+        samples.append(sample)
+        print(f"{sample[0]:>4} {sample[1]:>9.0f} {sample[2]:>10} {sample[3]:>8} {sample[4]:>10} {sample[5]:>10}")
+
+    listener.cancel()
+    # Compare the second half of the run against the first to spot a slow leak
+    failures = []
+    half = len(samples) // 2
+    if not half:
+        failures.append("too few hours to compare; run at least --hours 2")
+    for column, name, unit, limit in ((1, "heap", " KiB", args.max_heap_growth_kib), (3, "tracked rooms", "", max_room_growth),
+                                      (4, "redis keys", "", max_key_growth), (5, "open rooms", "", max_room_growth)):
+        if not half:
+            break
+        early = max(s[column] for s in samples[:half])
+        late = max(s[column] for s in samples[half:])
+        print(f"peak {name}, first half -> second half: {early:.0f}{unit} -> {late:.0f}{unit} (allowed rise {limit:.0f}{unit})")
+        if late - early > limit:
+            failures.append(f"{name} grew by {late - early:.0f}{unit}")
+    # Everyone leaves each hour, so no socket may still be held
+    if samples and samples[-1][2]:
+        failures.append(f"{samples[-1][2]} rooms still hold sockets after everyone left")
+    for failure in failures:
+        print(f"LEAK {failure}")
+    print("FAIL" if failures else "PASS")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
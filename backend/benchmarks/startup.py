@@ -0,0 +1,75 @@
+# backend/benchmarks/startup.py
+"""
+Measures how long a backend worker takes to become useful.
+
+Reports the time to import `main` in a fresh interpreter and the time from
+launching uvicorn to the first accepted HTTP connection, both with
+FAST_STARTUP on and with the default startup that recreates the schema and
+wipes MySQL and Redis. The servers run against a scratch SQLite file and
+Redis db 15 (override with BENCH_DATABASE_URL / BENCH_REDIS_URL), never the
+app's own data. Needs a local Redis. Run from backend/:
+
+    python benchmarks/startup.py --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+SCRATCH_ENV = {
+    "DATABASE_URL": os.getenv("BENCH_DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bazinga_startup.sqlite3')}"),
+    "REDIS_URL": os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/15"),
+}
+
+
+def server_env(fast_startup: bool) -> dict:
+    return {**os.environ, **SCRATCH_ENV, "FAST_STARTUP": "true" if fast_startup else "false"}
+
+
+def time_import():
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=BACKEND_DIR, env=server_env(True), text=True)
+    return float(output.strip().splitlines()[-1])
+
+
+def time_first_connection(port: int, timeout: float, fast_startup: bool):
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=server_env(fast_startup),
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=0.5) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"Server did not accept a connection within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    import_times = [time_import() for _ in range(args.runs)]
+    print(f"import main:                            median {statistics.median(import_times) * 1000:.0f} ms, max {max(import_times) * 1000:.0f} ms")
+    for fast_startup, mode in ((True, "FAST_STARTUP=true"), (False, "FAST_STARTUP=false (schema + wipe)")):
+        boot_times = [time_first_connection(args.port, args.timeout, fast_startup) for _ in range(args.runs)]
+        print(f"launch -> first request, {mode:<34} median {statistics.median(boot_times) * 1000:.0f} ms, max {max(boot_times) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,22 @@
 # backend/crud.py
-from sqlalchemy.orm import Session
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session, joinedload
+import datetime
 import shortuuid
 import models, schemas
 from typing import List
 
+def utcnow():
+    # Naive UTC, since MySQL DATETIME columns drop the timezone
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
 # --- User CRUD ---
 def get_user_by_username(db: Session, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
 
+def get_usernames(db: Session, user_ids) -> dict:
+    return dict(db.query(models.User.id, models.User.username).filter(models.User.id.in_(list(user_ids))).all())
+
 def create_user(db: Session, user: schemas.UserCreate):
     fake_hashed_password = user.password + "notreallyhashed"
     db_user = models.User(username=user.username, hashed_password=fake_hashed_password)
@@ -20,12 +29,14 @@ def create_user(db: Session, user: schemas.UserCreate):
 def get_room_by_code(db: Session, room_code: str):
     return db.query(models.GameRoom).filter(models.GameRoom.room_code == room_code).first()
 
-def create_room(db: Session, room: schemas.GameRoomCreate, owner: models.User):
-    room_code = shortuuid.ShortUUID().random(length=6).upper()
+def new_room_code() -> str:
+    return shortuuid.ShortUUID().random(length=6).upper()
+
+def create_room(db: Session, room: schemas.GameRoomCreate, owner: models.User, room_code: str = None):
     db_room = models.GameRoom(
         name=room.name, 
         max_players=room.max_players, 
-        room_code=room_code,
+        room_code=room_code or new_room_code(),
         owner=owner
     )
     db_room.players.append(owner)
@@ -36,7 +47,7 @@ def create_room(db: Session, room: schemas.GameRoomCreate, owner: models.User):
 
 def join_room(db: Session, room_code: str, user: models.User):
     db_room = get_room_by_code(db, room_code)
-    if db_room and len(db_room.players) < db_room.max_players:
+    if db_room and db_room.closed_at is None and len(db_room.players) < db_room.max_players:
         if user not in db_room.players:
             db_room.players.append(user)
             db.commit()
@@ -44,6 +55,26 @@ def join_room(db: Session, room_code: str, user: models.User):
         return db_room
     return None
 
+def close_room(db: Session, room_code: str) -> bool:
+    closed = (
+        db.query(models.GameRoom)
+        .filter(models.GameRoom.room_code == room_code, models.GameRoom.closed_at.is_(None))
+        .update({models.GameRoom.closed_at: utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    return bool(closed)
+
+def get_open_rooms_older_than(db: Session, age_seconds: int, after_id: int, limit: int):
+    """(id, room_code) of open rooms created more than `age_seconds` ago, in id order after `after_id`."""
+    cutoff = utcnow() - datetime.timedelta(seconds=age_seconds)
+    return (
+        db.query(models.GameRoom.id, models.GameRoom.room_code)
+        .filter(models.GameRoom.closed_at.is_(None), models.GameRoom.created_at < cutoff, models.GameRoom.id > after_id)
+        .order_by(models.GameRoom.id)
+        .limit(limit)
+        .all()
+    )
+
 # --- Game & Question CRUD ---
 def create_game_with_questions(db: Session, room_id: int, theme: str, questions: List[schemas.QuestionCreate]):
     db_game = models.Game(room_id=room_id, theme=theme)
@@ -69,6 +100,20 @@ def create_game_with_questions(db: Session, room_id: int, theme: str, questions:
     db.refresh(db_game)
     return db_game
 
+def add_question(db: Session, game_id: int, question: schemas.QuestionCreate):
+    db_question = models.Question(
+        game_id=game_id,
+        question_text=question.question_text,
+        correct_answer_text=question.correct_answer_text
+    )
+    db.add(db_question)
+    db.commit()
+    db.refresh(db_question)
+    return db_question
+
+def get_question_at(db: Session, game_id: int, index: int):
+    return db.query(models.Question).filter(models.Question.game_id == game_id).order_by(models.Question.id).offset(index).first()
+
 def set_current_question(db: Session, game_id: int, question_id: int):
     db_game = db.query(models.Game).filter(models.Game.id == game_id).first()
     if db_game:
@@ -77,6 +122,10 @@ def set_current_question(db: Session, game_id: int, question_id: int):
         db.refresh(db_game)
     return db_game
 
+def finish_game(db: Session, game_id: int):
+    db.query(models.Game).filter(models.Game.id == game_id, models.Game.finished_at.is_(None)).update({models.Game.finished_at: utcnow()})
+    db.commit()
+
 def create_answer(db: Session, answer: schemas.AnswerCreate, player_id: int):
     db_answer = models.Answer(**answer.dict(), player_id=player_id)
     db.add(db_answer)
@@ -85,7 +134,8 @@ def create_answer(db: Session, answer: schemas.AnswerCreate, player_id: int):
     return db_answer
 
 def get_answers_for_question(db: Session, question_id: int):
-    return db.query(models.Answer).filter(models.Answer.question_id == question_id).all()
+    # Authors are loaded in the same query; vote results need their names
+    return db.query(models.Answer).options(joinedload(models.Answer.player)).filter(models.Answer.question_id == question_id).all()
 
 def set_correct_answer_for_question(db: Session, question_id: int, answer_id: int):
     db_question = db.query(models.Question).filter(models.Question.id == question_id).first()
@@ -102,20 +152,57 @@ def create_vote(db: Session, vote: schemas.VoteCreate, voter_id: int):
     db.refresh(db_vote)
     return db_vote
 
+def get_votes_for_question(db: Session, question_id: int):
+    return (
+        db.query(models.Vote)
+        .join(models.Answer)
+        .options(joinedload(models.Vote.voter))
+        .filter(models.Answer.question_id == question_id)
+        .all()
+    )
+
 def update_scores(db: Session, score_updates: dict, game_id: int):
-    for user_id, points in score_updates.items():
-        db.query(models.PlayerGameScore).filter_by(player_id=user_id, game_id=game_id).update({"score": models.PlayerGameScore.score + points})
+    if not score_updates:
+        return
+    # One UPDATE for the whole round, whatever the number of players
+    points = case(score_updates, value=models.PlayerGameScore.player_id, else_=0)
+    (
+        db.query(models.PlayerGameScore)
+        .filter(models.PlayerGameScore.game_id == game_id, models.PlayerGameScore.player_id.in_(score_updates))
+        .update({"score": models.PlayerGameScore.score + points}, synchronize_session=False)
+    )
     db.commit()
 
 def get_scores_for_game(db: Session, game_id: int):
-    return db.query(models.PlayerGameScore).filter_by(game_id=game_id).all()
+    return db.query(models.PlayerGameScore).options(joinedload(models.PlayerGameScore.player)).filter_by(game_id=game_id).all()
+
+def get_max_game_id(db: Session) -> int:
+    """The highest game id MySQL has seen, counting games already archived."""
+    live = db.query(func.max(models.Game.id)).scalar() or 0
+    archived = db.query(func.max(models.ArchivedGame.game_id)).scalar() or 0
+    return max(live, archived)
+
+def get_theme_scores(db: Session):
+    """(theme, player_id, points) summed over the games still in the hot tables."""
+    return (
+        db.query(models.Game.theme, models.PlayerGameScore.player_id, func.sum(models.PlayerGameScore.score))
+        .join(models.PlayerGameScore, models.PlayerGameScore.game_id == models.Game.id)
+        .group_by(models.Game.theme, models.PlayerGameScore.player_id)
+        .all()
+    )
+
+def get_archived_scores(db: Session, batch_size: int = 500):
+    """(theme, payload) of every archived game, streamed in batches."""
+    return db.query(models.ArchivedGame.theme, models.ArchivedGame.payload).yield_per(batch_size)
 
 def clear_all_data(db: Session):
     # Break circular dependencies by setting nullable foreign keys to NULL
     db.query(models.Game).update({models.Game.current_question_id: None})
     db.query(models.Question).update({models.Question.correct_answer_id: None})
 
-    # Delete records in an order that respects foreign key constraints
+    # Delete records in an order that respects foreign key constraints.
+    # Users and archived_games are the long-term record the theme
+    # leaderboards are rebuilt from, so they survive
     db.query(models.Vote).delete()
     db.query(models.Answer).delete()
     db.query(models.Question).delete()
@@ -123,6 +210,5 @@ def clear_all_data(db: Session):
     db.query(models.Game).delete()
     db.execute(models.room_players_association.delete())
     db.query(models.GameRoom).delete()
-    db.query(models.User).delete()
     db.commit()
 
@@ -4,16 +4,41 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
-import redis.asyncio as redis
+import redis.asyncio as aioredis
+import query_profiler
 
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost")
+# Player sockets share one pub/sub connection per worker; each room with
+# spectators holds one more, plus headroom for commands.
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "512"))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
 
 engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_recycle=3600, pool_pre_ping=True)
+if query_profiler.SQL_PROFILING_ENABLED:
+    query_profiler.install(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
-redis = redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
+redis_pool = aioredis.BlockingConnectionPool.from_url(
+    REDIS_URL,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=REDIS_POOL_TIMEOUT,
+    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+    socket_keepalive=True,
+    encoding="utf-8",
+    decode_responses=True,
+)
+redis = aioredis.Redis(connection_pool=redis_pool)
+
+def redis_pipeline():
+    """
+    Returns a non-transactional pipeline so that the reads and publishes for
+    one game event go out in a single round trip. Use as `async with`.
+    """
+    return redis.pipeline(transaction=False)
+
@@ -0,0 +1,56 @@
+# backend/debounce.py
+import asyncio
+import metrics
+import query_profiler
+
+
+class RoomDebouncer:
+    """
+    Collapses calls for the same room into one run of `action(room_code)` at the
+    end of a `window`-second window. Calls made while the action is running open
+    a fresh window, so the last change is never lost.
+    """
+
+    def __init__(self, name: str, action, window: float):
+        self.name = name
+        self.action = action
+        self.window = window
+        self._pending: dict[str, asyncio.Task] = {}
+
+    def schedule(self, room_code: str):
+        if room_code in self._pending:
+            metrics.DEBOUNCED_CALLS.inc(action=self.name)
+            return
+        self._pending[room_code] = asyncio.create_task(self._run(room_code))
+
+    def cancel(self, room_code: str):
+        task = self._pending.pop(room_code, None)
+        if task:
+            task.cancel()
+
+    async def wait(self, room_code: str):
+        """Returns once the room has no action pending, including any scheduled while waiting."""
+        while (task := self._pending.get(room_code)) is not None:
+            await asyncio.wait([task])
+
+    async def flush(self):
+        """Runs every pending action now instead of at the end of its window."""
+        room_codes = list(self._pending)
+        for room_code in room_codes:
+            self.cancel(room_code)
+        for room_code in room_codes:
+            await self._call(room_code)
+
+    async def _run(self, room_code: str):
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            self._pending.pop(room_code, None)
+        await self._call(room_code)
+
+    async def _call(self, room_code: str):
+        try:
+            with query_profiler.profile_scope(f"debounced:{self.name}"):
+                await self.action(room_code)
+        except Exception as e:
+            print(f"Error in debounced {self.name} for room {room_code}: {e}")
@@ -0,0 +1,136 @@
+# backend/drain.py
+"""
+Graceful worker drain for rolling deploys.
+
+On SIGTERM the worker stops accepting sockets, runs its pending debounced
+updates, and tells every socket to reconnect with a resume token and a
+jittered delay. All game state lives in Redis and MySQL, so whichever worker
+the client lands on picks the room up where it was; the jitter spreads the
+reconnects out so the remaining workers don't take them all at once. Sockets
+are closed once their queues are written out, or at DRAIN_DEADLINE_SECONDS,
+and the signal is then handed to the server's own handler to shut down.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import signal
+import metrics
+import presence
+from audience import hub as audience_hub
+from database import redis_pipeline
+from routers import rooms as rooms_router
+from websocket import manager as websocket_manager
+
+logger = logging.getLogger("bazinga.drain")
+
+# Keep below the process manager's stop timeout (gunicorn --graceful-timeout)
+DRAIN_DEADLINE_SECONDS = float(os.getenv("DRAIN_DEADLINE_SECONDS", "20"))
+# How many reconnects per second the rest of the fleet should absorb; the
+# jitter window grows with the socket count to stay under it
+RECONNECT_RATE_PER_SECOND = float(os.getenv("RECONNECT_RATE_PER_SECOND", "200"))
+RECONNECT_MIN_WINDOW_MS = int(os.getenv("RECONNECT_MIN_WINDOW_MS", "1000"))
+RECONNECT_MAX_WINDOW_MS = int(os.getenv("RECONNECT_MAX_WINDOW_MS", "15000"))
+# Lets broadcasts queued by the flushed timers reach local sockets before the reconnect event
+DRAIN_SETTLE_SECONDS = 0.25
+_QUEUE_POLL_SECONDS = 0.05
+
+_drain_task = None
+
+
+def reconnect_window_ms(sockets: int) -> int:
+    window = sockets / RECONNECT_RATE_PER_SECOND * 1000
+    return int(min(max(window, RECONNECT_MIN_WINDOW_MS), RECONNECT_MAX_WINDOW_MS))
+
+
+def _reconnect_message(token, window_ms: int) -> str:
+    return json.dumps({"event": "reconnect", "resume_token": token, "retry_after_ms": random.randint(0, window_ms)})
+
+
+async def drain(deadline_seconds: float = DRAIN_DEADLINE_SECONDS):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + deadline_seconds
+    websocket_manager.draining = True
+
+    players = [conn for room in list(websocket_manager.registry.by_room.values()) for conn in room.values()]
+    spectators = [conn for room in list(audience_hub.spectators.values()) for conn in room.values()]
+    logger.info("Draining %d player and %d spectator sockets", len(players), len(spectators))
+
+    # Timers first, so whatever they broadcast goes out ahead of the reconnect event
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(rooms_router.player_updates.flush(), rooms_router.answer_checks.flush()),
+            timeout=max(0.0, deadline - loop.time()),
+        )
+    except asyncio.TimeoutError:
+        logger.warning("Debounced updates did not finish before the drain deadline")
+    await asyncio.sleep(DRAIN_SETTLE_SECONDS)
+    await audience_hub.flush_all()
+
+    # Players keep counting as present through their resume token, so this
+    # worker's share of the room count is dropped in the same round trip
+    async with redis_pipeline() as pipe:
+        tokens = [presence.queue_issue_resume_token(pipe, conn.room_code, conn.user_id) for conn in players]
+        for room_code in {conn.room_code for conn in players}:
+            presence.queue_set_count(pipe, room_code, 0)
+        await pipe.execute()
+
+    window_ms = reconnect_window_ms(len(players) + len(spectators))
+    for conn, token in zip(players, tokens):
+        websocket_manager.send_personal(conn, _reconnect_message(token, window_ms))
+    for conn in spectators:
+        websocket_manager.send_personal(conn, _reconnect_message(None, window_ms))
+    metrics.WS_DRAIN_RECONNECTS.inc(len(players), kind="player")
+    metrics.WS_DRAIN_RECONNECTS.inc(len(spectators), kind="spectator")
+
+    conns = players + spectators
+    while loop.time() < deadline and any(len(conn.send_queue) for conn in conns):
+        await asyncio.sleep(_QUEUE_POLL_SECONDS)
+    unsent = sum(1 for conn in conns if len(conn.send_queue))
+    if unsent:
+        logger.warning("Closing %d sockets with unsent messages at the drain deadline", unsent)
+
+    # 1012 (service restart); clients that missed the event still retry
+    await asyncio.gather(*(websocket_manager.close(conn, 1012) for conn in conns))
+    logger.info("Drain finished in %.1fs", deadline_seconds - (deadline - loop.time()))
+
+
+def _pass_on(original, signum, frame):
+    if callable(original):
+        original(signum, frame)
+    else:
+        signal.signal(signum, original)
+        os.kill(os.getpid(), signum)
+
+
+def install_signal_handler():
+    """
+    Runs drain() on the first SIGTERM and then hands the signal to the
+    handler that was installed before (uvicorn's or gunicorn's), so the
+    server only starts shutting sockets down once they have been handed off.
+    A second SIGTERM skips the drain.
+    """
+    loop = asyncio.get_running_loop()
+    original = signal.getsignal(signal.SIGTERM)
+
+    def drained(task, signum, frame):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Drain failed: %s", task.exception())
+        _pass_on(original, signum, frame)
+
+    def start_drain(signum, frame):
+        global _drain_task
+        _drain_task = loop.create_task(drain())
+        _drain_task.add_done_callback(lambda task: drained(task, signum, frame))
+
+    def handle_sigterm(signum, frame):
+        if _drain_task is not None:
+            _pass_on(original, signum, frame)
+        else:
+            loop.call_soon_threadsafe(start_drain, signum, frame)
+
+    try:
+        signal.signal(signal.SIGTERM, handle_sigterm)
+    except ValueError:
+        logger.warning("Not on the main thread; SIGTERM will not drain sockets")
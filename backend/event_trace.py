@@ -0,0 +1,29 @@
+# backend/event_trace.py
+"""
+Records the game events a worker handles, for replay by
+benchmarks/game_replay.py. Off unless EVENT_TRACE_PATH is set; each event is
+then appended to that file as one JSON line.
+
+Room codes and user ids are written as this server saw them and remapped on
+replay. Question and answer ids can't be reproduced, so answers note whether
+they were rejected and votes name the author of the chosen answer instead.
+"""
+import json
+import os
+import threading
+import time
+
+EVENT_TRACE_PATH = os.getenv("EVENT_TRACE_PATH")
+TRACING = bool(EVENT_TRACE_PATH)
+
+_started = time.monotonic()
+_lock = threading.Lock()
+
+
+def record(kind: str, room_code: str, **fields):
+    if not TRACING:
+        return
+    line = json.dumps({"t": round(time.monotonic() - _started, 3), "kind": kind, "room": room_code, **fields})
+    # Called from both the event loop and the threadpool
+    with _lock, open(EVENT_TRACE_PATH, "a") as f:
+        f.write(line + "\n")
@@ -0,0 +1,129 @@
+# backend/game_state.py
+import os
+from dataclasses import dataclass
+from typing import Optional
+from database import redis, redis_pipeline
+
+# Bump when the layout of game_state:* keys changes; hashes written by another
+# version are treated as missing rather than misread.
+SCHEMA_VERSION = 2
+GAME_STATE_TTL_SECONDS = int(os.getenv("GAME_STATE_TTL_SECONDS", str(6 * 60 * 60)))
+
+_FIELDS = ("v", "game_id", "current_question_index", "question_count", "questions_done")
+
+# Questions are streamed into a running game. Both scripts check game_id so a
+# producer left over from an earlier game in the room can't touch the new one.
+_ADD_QUESTION_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'game_id') ~= ARGV[1] then
+    return -1
+end
+redis.call('SADD', KEYS[2], ARGV[2])
+return redis.call('HINCRBY', KEYS[1], 'question_count', 1)
+"""
+
+_FINISH_QUESTIONS_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'game_id') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'questions_done', 1)
+return 1
+"""
+
+# Moves on only from the round the caller saw, so a double-clicked "next"
+# advances once
+_ADVANCE_QUESTION_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'game_id') ~= ARGV[1]
+        or redis.call('HGET', KEYS[1], 'current_question_index') ~= ARGV[2] then
+    return -1
+end
+local index = redis.call('HINCRBY', KEYS[1], 'current_question_index', 1)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return index
+"""
+
+_add_question = redis.register_script(_ADD_QUESTION_SCRIPT)
+_finish_questions = redis.register_script(_FINISH_QUESTIONS_SCRIPT)
+_advance_question = redis.register_script(_ADVANCE_QUESTION_SCRIPT)
+
+
+@dataclass
+class GameState:
+    game_id: int
+    current_question_index: int = 0
+    # Questions created so far, and whether the producer has stopped adding more
+    question_count: int = 0
+    questions_done: bool = True
+
+
+def state_key(room_code: str) -> str:
+    return f"game_state:{room_code}"
+
+
+def seen_questions_key(room_code: str) -> str:
+    # Kept as a Redis set next to the hash so the per-round hash stays a few bytes
+    return f"game_state:{room_code}:seen"
+
+
+def queue_read(pipe, room_code: str):
+    """Queues an HMGET of the small per-round fields; decode the reply with parse()."""
+    pipe.hmget(state_key(room_code), _FIELDS)
+
+
+def parse(values) -> Optional[GameState]:
+    version, game_id, current_question_index, question_count, questions_done = values
+    if version is None or int(version) != SCHEMA_VERSION or game_id is None:
+        return None
+    return GameState(
+        game_id=int(game_id),
+        current_question_index=int(current_question_index or 0),
+        question_count=int(question_count or 0),
+        questions_done=questions_done == "1",
+    )
+
+
+async def get(room_code: str) -> Optional[GameState]:
+    return parse(await redis.hmget(state_key(room_code), _FIELDS))
+
+
+async def get_seen_questions(room_code: str) -> set:
+    return await redis.smembers(seen_questions_key(room_code))
+
+
+def queue_start(pipe, room_code: str, game_id: int, question_texts, questions_done: bool = True):
+    """
+    Queues the writes for a new game: fresh round fields plus the texts it will
+    show. Pass questions_done=False when more questions will be streamed in
+    with add_question().
+    """
+    pipe.hset(state_key(room_code), mapping={
+        "v": SCHEMA_VERSION,
+        "game_id": game_id,
+        "current_question_index": 0,
+        "question_count": len(question_texts),
+        "questions_done": int(questions_done),
+    })
+    pipe.expire(state_key(room_code), GAME_STATE_TTL_SECONDS)
+    if question_texts:
+        pipe.sadd(seen_questions_key(room_code), *question_texts)
+    pipe.expire(seen_questions_key(room_code), GAME_STATE_TTL_SECONDS)
+
+
+async def advance_question(room_code: str, game_id: int, from_index: int) -> int:
+    """
+    Moves the room from question `from_index` to the next one and returns the
+    new index, or -1 if another advance (or a new game) got there first.
+    """
+    return await _advance_question(
+        keys=[state_key(room_code), seen_questions_key(room_code)],
+        args=[game_id, from_index, GAME_STATE_TTL_SECONDS],
+    )
+
+
+async def add_question(room_code: str, game_id: int, question_text: str) -> int:
+    """Records one more playable question; returns the new count, or -1 if the room moved on."""
+    return await _add_question(keys=[state_key(room_code), seen_questions_key(room_code)], args=[game_id, question_text])
+
+
+async def finish_questions(room_code: str, game_id: int):
+    await _finish_questions(keys=[state_key(room_code)], args=[game_id])
@@ -0,0 +1,597 @@
+# backend/game_store.py
+"""
+Where games, questions, answers, votes and scores are kept.
+
+The room handlers only talk to `store`, chosen per deployment by GAME_STORE:
+
+- "sql" (default): the crud functions on MySQL, as before.
+- "redis": everything in Redis under store:*, expiring with the game state,
+  so latency-sensitive casual rooms make no relational writes during play.
+  With GAME_STORE_SNAPSHOT on, a finished game is written to MySQL once, as
+  the same ArchivedGame document retention.py produces.
+
+Rooms and users stay in MySQL either way. Both stores return the plain
+records below rather than ORM objects, so handlers can't lazy-load across
+them; every method takes the handler's session like crud does, and the
+Redis store ignores it (an unused SessionLocal never checks out a
+connection). Unless METADATA_CACHE_SIZE is 0, games and questions are read
+through the per-worker metadata cache (see metadata_cache.py).
+"""
+import abc
+import asyncio
+import datetime
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from database import SessionLocal, redis, redis_pipeline
+from game_state import GAME_STATE_TTL_SECONDS
+import crud, models, schemas
+import metadata_cache
+import retention
+
+GAME_STORE = os.getenv("GAME_STORE", "sql")
+GAME_STORE_SNAPSHOT = os.getenv("GAME_STORE_SNAPSHOT", "true").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger("bazinga.game_store")
+
+
+@dataclass(slots=True)
+class QuestionRecord:
+    id: int
+    game_id: int
+    question_text: str
+    correct_answer_text: str
+    correct_answer_id: Optional[int] = None
+
+
+@dataclass(slots=True)
+class GameRecord:
+    # current_question_id / current_question are the pointer the store last
+    # recorded; handlers find the round through the Redis game state instead
+    # (see current_question()), and the cached store leaves them out
+    id: int
+    room_id: int
+    theme: str
+    current_question_id: Optional[int] = None
+    current_question: Optional[QuestionRecord] = None
+    finished: bool = False
+    # Only filled in when asked for, e.g. for the game_started payload
+    questions: List[QuestionRecord] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class AnswerRecord:
+    id: int
+    question_id: int
+    player_id: Optional[int]
+    answer_text: str
+    player_name: Optional[str] = None
+
+
+@dataclass(slots=True)
+class VoteRecord:
+    id: int
+    answer_id: int
+    voter_id: int
+    voter_name: Optional[str] = None
+
+
+@dataclass(slots=True)
+class ScoreRecord:
+    game_id: int
+    player_id: int
+    score: int
+    username: Optional[str] = None
+
+
+class GameStore(abc.ABC):
+    """The operations the game handlers need; see SqlGameStore and RedisGameStore."""
+
+    @abc.abstractmethod
+    async def create_game(self, db: Session, room: models.GameRoom, theme: str, questions: List[schemas.QuestionCreate]) -> GameRecord:
+        ...
+
+    @abc.abstractmethod
+    async def add_question(self, db: Session, game_id: int, question: schemas.QuestionCreate) -> QuestionRecord:
+        ...
+
+    @abc.abstractmethod
+    async def get_game(self, db: Session, game_id: int, with_questions: bool = False) -> Optional[GameRecord]:
+        ...
+
+    @abc.abstractmethod
+    async def get_question(self, db: Session, question_id: int) -> Optional[QuestionRecord]:
+        ...
+
+    @abc.abstractmethod
+    async def get_question_at(self, db: Session, game_id: int, index: int) -> Optional[QuestionRecord]:
+        """The game's question at `index`, in the order they were added."""
+
+    @abc.abstractmethod
+    async def set_current_question(self, db: Session, game_id: int, question_id: int):
+        ...
+
+    @abc.abstractmethod
+    async def finish_game(self, db: Session, game_id: int):
+        ...
+
+    @abc.abstractmethod
+    async def create_answer(self, db: Session, question_id: int, answer_text: str, player_id: Optional[int]) -> AnswerRecord:
+        ...
+
+    @abc.abstractmethod
+    async def get_answers(self, db: Session, question_id: int) -> List[AnswerRecord]:
+        ...
+
+    @abc.abstractmethod
+    async def set_correct_answer(self, db: Session, question_id: int, answer_id: int):
+        ...
+
+    @abc.abstractmethod
+    async def create_vote(self, db: Session, answer_id: int, voter_id: int) -> Optional[VoteRecord]:
+        ...
+
+    @abc.abstractmethod
+    async def get_votes(self, db: Session, question_id: int) -> List[VoteRecord]:
+        ...
+
+    @abc.abstractmethod
+    async def add_scores(self, db: Session, game_id: int, score_updates: dict):
+        ...
+
+    @abc.abstractmethod
+    async def get_scores(self, db: Session, game_id: int) -> List[ScoreRecord]:
+        ...
+
+
+def _question_record(q: models.Question) -> QuestionRecord:
+    return QuestionRecord(q.id, q.game_id, q.question_text, q.correct_answer_text, q.correct_answer_id)
+
+
+def _game_record(g: models.Game, with_questions: bool) -> GameRecord:
+    return GameRecord(
+        id=g.id,
+        room_id=g.room_id,
+        theme=g.theme,
+        current_question_id=g.current_question_id,
+        current_question=_question_record(g.current_question) if g.current_question_id else None,
+        finished=g.finished_at is not None,
+        questions=[_question_record(q) for q in g.questions] if with_questions else [],
+    )
+
+
+def _answer_record(a: models.Answer) -> AnswerRecord:
+    return AnswerRecord(a.id, a.question_id, a.player_id, a.answer_text, a.player.username if a.player else None)
+
+
+class SqlGameStore(GameStore):
+    """The crud functions, run in the threadpool and returned as records."""
+
+    async def create_game(self, db, room, theme, questions):
+        def create():
+            return _game_record(crud.create_game_with_questions(db, room_id=room.id, theme=theme, questions=questions), with_questions=True)
+        return await run_in_threadpool(create)
+
+    async def add_question(self, db, game_id, question):
+        return _question_record(await run_in_threadpool(crud.add_question, db, game_id, question))
+
+    async def get_game(self, db, game_id, with_questions=False):
+        def get():
+            db_game = db.query(models.Game).filter(models.Game.id == game_id).first()
+            return _game_record(db_game, with_questions) if db_game else None
+        return await run_in_threadpool(get)
+
+    async def get_question(self, db, question_id):
+        db_question = await run_in_threadpool(db.query(models.Question).filter(models.Question.id == question_id).first)
+        return _question_record(db_question) if db_question else None
+
+    async def get_question_at(self, db, game_id, index):
+        db_question = await run_in_threadpool(crud.get_question_at, db, game_id, index)
+        return _question_record(db_question) if db_question else None
+
+    async def set_current_question(self, db, game_id, question_id):
+        await run_in_threadpool(crud.set_current_question, db, game_id, question_id)
+
+    async def finish_game(self, db, game_id):
+        await run_in_threadpool(crud.finish_game, db, game_id)
+
+    async def create_answer(self, db, question_id, answer_text, player_id):
+        answer = schemas.AnswerCreate(question_id=question_id, answer_text=answer_text)
+        db_answer = await run_in_threadpool(crud.create_answer, db, answer, player_id=player_id)
+        return AnswerRecord(db_answer.id, db_answer.question_id, db_answer.player_id, db_answer.answer_text)
+
+    async def get_answers(self, db, question_id):
+        def get():
+            return [_answer_record(a) for a in crud.get_answers_for_question(db, question_id)]
+        return await run_in_threadpool(get)
+
+    async def set_correct_answer(self, db, question_id, answer_id):
+        await run_in_threadpool(crud.set_correct_answer_for_question, db, question_id, answer_id)
+
+    async def create_vote(self, db, answer_id, voter_id):
+        db_vote = await run_in_threadpool(crud.create_vote, db, schemas.VoteCreate(answer_id=answer_id), voter_id=voter_id)
+        return VoteRecord(db_vote.id, db_vote.answer_id, db_vote.voter_id)
+
+    async def get_votes(self, db, question_id):
+        def get():
+            return [VoteRecord(v.id, v.answer_id, v.voter_id, v.voter.username if v.voter else None) for v in crud.get_votes_for_question(db, question_id)]
+        return await run_in_threadpool(get)
+
+    async def add_scores(self, db, game_id, score_updates):
+        await run_in_threadpool(crud.update_scores, db, score_updates, game_id)
+
+    async def get_scores(self, db, game_id):
+        def get():
+            return [ScoreRecord(s.game_id, s.player_id, s.score, s.player.username) for s in crud.get_scores_for_game(db, game_id)]
+        return await run_in_threadpool(get)
+
+
+def _optional_int(value) -> Optional[int]:
+    return int(value) if value else None
+
+
+# KEYS: ids; ARGV: question count. Returns nil until the game counter is seeded
+_NEXT_GAME_IDS_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], 'game') == 0 then
+    return false
+end
+return {redis.call('HINCRBY', KEYS[1], 'game', 1), redis.call('HINCRBY', KEYS[1], 'question', ARGV[1])}
+"""
+
+
+class RedisGameStore(GameStore):
+    """
+    Games kept entirely in Redis, expiring GAME_STATE_TTL_SECONDS after their
+    last write. Ids come from counters in store:ids. Every read or write is
+    one or two pipelined round trips.
+
+    Game ids end up in archived_games.game_id next to MySQL's own, so the game
+    counter starts above every id MySQL has used, and is seeded again the
+    same way whenever Redis has lost it.
+    """
+
+    IDS_KEY = "store:ids"
+
+    def __init__(self, snapshot: bool = GAME_STORE_SNAPSHOT, ttl: int = GAME_STATE_TTL_SECONDS):
+        self.snapshot = snapshot
+        self.ttl = ttl
+        # Holds references to in-flight snapshots so they aren't garbage collected
+        self._snapshots = set()
+        self._next_game_ids = redis.register_script(_NEXT_GAME_IDS_SCRIPT)
+
+    @staticmethod
+    def game_key(game_id: int) -> str:
+        return f"store:game:{game_id}"
+
+    @staticmethod
+    def question_key(question_id: int) -> str:
+        return f"store:question:{question_id}"
+
+    @staticmethod
+    def answer_key(answer_id: int) -> str:
+        return f"store:answer:{answer_id}"
+
+    def _expire(self, pipe, key: str):
+        pipe.expire(key, self.ttl)
+
+    def _queue_question(self, pipe, question_id: int, game_id: int, question: schemas.QuestionCreate):
+        pipe.hset(self.question_key(question_id), mapping={
+            "game_id": game_id,
+            "question_text": question.question_text,
+            "correct_answer_text": question.correct_answer_text,
+            "correct_answer_id": "",
+        })
+        self._expire(pipe, self.question_key(question_id))
+        pipe.rpush(f"{self.game_key(game_id)}:questions", question_id)
+        self._expire(pipe, f"{self.game_key(game_id)}:questions")
+
+    @staticmethod
+    def _parse_question(question_id: int, fields: dict) -> Optional[QuestionRecord]:
+        if not fields:
+            return None
+        return QuestionRecord(
+            id=int(question_id),
+            game_id=int(fields["game_id"]),
+            question_text=fields["question_text"],
+            correct_answer_text=fields["correct_answer_text"],
+            correct_answer_id=_optional_int(fields["correct_answer_id"]),
+        )
+
+    async def _usernames(self, game_id: int, user_ids) -> dict:
+        user_ids = sorted({user_id for user_id in user_ids if user_id is not None})
+        if not user_ids:
+            return {}
+        names = await redis.hmget(f"{self.game_key(game_id)}:players", user_ids)
+        return dict(zip(user_ids, names))
+
+    async def create_game(self, db, room, theme, questions):
+        players = list(room.players)
+        ids = await self._next_game_ids(keys=[self.IDS_KEY], args=[len(questions)])
+        if ids is None:
+            await self._seed_game_ids()
+            ids = await self._next_game_ids(keys=[self.IDS_KEY], args=[len(questions)])
+        game_id, last_question_id = ids
+        question_ids = range(last_question_id - len(questions) + 1, last_question_id + 1)
+
+        key = self.game_key(game_id)
+        async with redis_pipeline() as pipe:
+            pipe.hset(key, mapping={"room_id": room.id, "theme": theme, "current_question_id": "", "created_at": time.time()})
+            self._expire(pipe, key)
+            if players:
+                pipe.hset(f"{key}:players", mapping={p.id: p.username for p in players})
+                pipe.hset(f"{key}:scores", mapping={p.id: 0 for p in players})
+                self._expire(pipe, f"{key}:players")
+                self._expire(pipe, f"{key}:scores")
+            for question_id, question in zip(question_ids, questions):
+                self._queue_question(pipe, question_id, game_id, question)
+            await pipe.execute()
+
+        return GameRecord(
+            id=game_id,
+            room_id=room.id,
+            theme=theme,
+            questions=[QuestionRecord(qid, game_id, q.question_text, q.correct_answer_text) for qid, q in zip(question_ids, questions)],
+        )
+
+    async def _seed_game_ids(self):
+        db = SessionLocal()
+        try:
+            floor = await run_in_threadpool(crud.get_max_game_id, db)
+        finally:
+            db.close()
+        # Another worker may have seeded it meanwhile, from the same floor or past it
+        await redis.hsetnx(self.IDS_KEY, "game", floor)
+
+    async def add_question(self, db, game_id, question):
+        question_id = await redis.hincrby(self.IDS_KEY, "question", 1)
+        async with redis_pipeline() as pipe:
+            self._queue_question(pipe, question_id, game_id, question)
+            await pipe.execute()
+        return QuestionRecord(question_id, game_id, question.question_text, question.correct_answer_text)
+
+    async def get_game(self, db, game_id, with_questions=False):
+        key = self.game_key(game_id)
+        async with redis_pipeline() as pipe:
+            pipe.hgetall(key)
+            pipe.lrange(f"{key}:questions", 0, -1)
+            fields, question_ids = await pipe.execute()
+        if not fields:
+            return None
+
+        current_question_id = _optional_int(fields["current_question_id"])
+        wanted = question_ids if with_questions else ([current_question_id] if current_question_id else [])
+        questions = {}
+        if wanted:
+            async with redis_pipeline() as pipe:
+                for question_id in wanted:
+                    pipe.hgetall(self.question_key(question_id))
+                for question_id, question_fields in zip(wanted, await pipe.execute()):
+                    questions[int(question_id)] = self._parse_question(question_id, question_fields)
+
+        return GameRecord(
+            id=int(game_id),
+            room_id=int(fields["room_id"]),
+            theme=fields["theme"],
+            current_question_id=current_question_id,
+            current_question=questions.get(current_question_id),
+            finished="finished_at" in fields,
+            questions=[questions[int(qid)] for qid in question_ids if questions.get(int(qid))] if with_questions else [],
+        )
+
+    async def get_question(self, db, question_id):
+        return self._parse_question(question_id, await redis.hgetall(self.question_key(question_id)))
+
+    async def get_question_at(self, db, game_id, index):
+        question_id = await redis.lindex(f"{self.game_key(game_id)}:questions", index)
+        if question_id is None:
+            return None
+        return await self.get_question(db, question_id)
+
+    async def set_current_question(self, db, game_id, question_id):
+        await redis.hset(self.game_key(game_id), "current_question_id", question_id)
+
+    async def finish_game(self, db, game_id):
+        key = self.game_key(game_id)
+        if not await redis.exists(key):
+            return
+        # Only the first caller finishes the game, and so only one snapshot is written
+        if not await redis.hsetnx(key, "finished_at", time.time()):
+            return
+        if self.snapshot:
+            task = asyncio.create_task(self._snapshot(game_id))
+            self._snapshots.add(task)
+            task.add_done_callback(self._snapshots.discard)
+
+    async def create_answer(self, db, question_id, answer_text, player_id):
+        answer_id = await redis.hincrby(self.IDS_KEY, "answer", 1)
+        answers_key = f"{self.question_key(question_id)}:answers"
+        async with redis_pipeline() as pipe:
+            pipe.rpush(answers_key, json.dumps({"id": answer_id, "player_id": player_id, "answer_text": answer_text}))
+            self._expire(pipe, answers_key)
+            # Votes only carry the answer id, so they need a way back to the question
+            pipe.set(self.answer_key(answer_id), question_id, ex=self.ttl)
+            await pipe.execute()
+        return AnswerRecord(answer_id, int(question_id), player_id, answer_text)
+
+    async def get_answers(self, db, question_id):
+        async with redis_pipeline() as pipe:
+            pipe.hget(self.question_key(question_id), "game_id")
+            pipe.lrange(f"{self.question_key(question_id)}:answers", 0, -1)
+            game_id, raw = await pipe.execute()
+        answers = [json.loads(a) for a in raw]
+        names = await self._usernames(game_id, (a["player_id"] for a in answers)) if game_id else {}
+        return [AnswerRecord(a["id"], int(question_id), a["player_id"], a["answer_text"], names.get(a["player_id"])) for a in answers]
+
+    async def set_correct_answer(self, db, question_id, answer_id):
+        await redis.hset(self.question_key(question_id), "correct_answer_id", answer_id)
+
+    async def create_vote(self, db, answer_id, voter_id):
+        async with redis_pipeline() as pipe:
+            pipe.hincrby(self.IDS_KEY, "vote", 1)
+            pipe.get(self.answer_key(answer_id))
+            vote_id, question_id = await pipe.execute()
+        if question_id is None:
+            return None
+        votes_key = f"{self.question_key(question_id)}:votes"
+        async with redis_pipeline() as pipe:
+            pipe.rpush(votes_key, json.dumps({"id": vote_id, "answer_id": answer_id, "voter_id": voter_id}))
+            self._expire(pipe, votes_key)
+            await pipe.execute()
+        return VoteRecord(vote_id, answer_id, voter_id)
+
+    async def get_votes(self, db, question_id):
+        async with redis_pipeline() as pipe:
+            pipe.hget(self.question_key(question_id), "game_id")
+            pipe.lrange(f"{self.question_key(question_id)}:votes", 0, -1)
+            game_id, raw = await pipe.execute()
+        votes = [json.loads(v) for v in raw]
+        names = await self._usernames(game_id, (v["voter_id"] for v in votes)) if game_id else {}
+        return [VoteRecord(v["id"], v["answer_id"], v["voter_id"], names.get(v["voter_id"])) for v in votes]
+
+    async def add_scores(self, db, game_id, score_updates):
+        key = f"{self.game_key(game_id)}:scores"
+        async with redis_pipeline() as pipe:
+            for user_id, points in score_updates.items():
+                pipe.hincrby(key, user_id, points)
+            self._expire(pipe, key)
+            await pipe.execute()
+
+    async def get_scores(self, db, game_id):
+        scores = await redis.hgetall(f"{self.game_key(game_id)}:scores")
+        names = await self._usernames(game_id, (int(user_id) for user_id in scores))
+        return [ScoreRecord(int(game_id), int(user_id), int(score), names.get(int(user_id))) for user_id, score in scores.items()]
+
+    async def _snapshot(self, game_id: int):
+        """Writes a finished game to MySQL as one ArchivedGame row."""
+        try:
+            game = await self.get_game(None, game_id, with_questions=True)
+            if game is None:
+                return
+            created_at, finished_at = await redis.hmget(self.game_key(game_id), ["created_at", "finished_at"])
+            answers, votes = [], []
+            for question in game.questions:
+                answers += await self.get_answers(None, question.id)
+                votes += await self.get_votes(None, question.id)
+            scores = await self.get_scores(None, game_id)
+            payload = retention.build_payloads([game], game.questions, answers, votes, scores)[game.id]
+
+            def utc(timestamp):
+                return datetime.datetime.fromtimestamp(float(timestamp), datetime.timezone.utc).replace(tzinfo=None)
+
+            def write():
+                db = SessionLocal()
+                try:
+                    db.add(models.ArchivedGame(
+                        game_id=game.id, room_id=game.room_id, theme=game.theme,
+                        created_at=utc(created_at), finished_at=utc(finished_at), payload=payload,
+                    ))
+                    db.commit()
+                finally:
+                    db.close()
+
+            await run_in_threadpool(write)
+        except Exception as e:
+            logger.error(f"Error snapshotting game {game_id} to MySQL: {e}")
+
+
+def _fixed_question(question: Optional[QuestionRecord]) -> Optional[QuestionRecord]:
+    if question is None:
+        return None
+    return QuestionRecord(question.id, question.game_id, question.question_text, question.correct_answer_text)
+
+
+def _fixed_game(game: Optional[GameRecord]) -> Optional[GameRecord]:
+    if game is None:
+        return None
+    return GameRecord(
+        id=game.id, room_id=game.room_id, theme=game.theme, finished=game.finished,
+        questions=[_fixed_question(q) for q in game.questions],
+    )
+
+
+class CachedGameStore(GameStore):
+    """
+    Serves games and questions from the metadata cache. Only the fields that
+    are fixed once written are cached: the per-round current question and
+    correct_answer_id come back as None, so moving on to the next round
+    invalidates nothing. Adding a question and finishing the game do. Cached
+    records are shared between callers, so handlers must not modify what
+    these methods return.
+    """
+
+    def __init__(self, inner: GameStore):
+        self.inner = inner
+
+    async def create_game(self, db, room, theme, questions):
+        return await self.inner.create_game(db, room, theme, questions)
+
+    async def add_question(self, db, game_id, question):
+        record = await self.inner.add_question(db, game_id, question)
+        await metadata_cache.invalidate(metadata_cache.game_tag(game_id))
+        return record
+
+    async def get_game(self, db, game_id, with_questions=False):
+        async def load():
+            return _fixed_game(await self.inner.get_game(db, game_id, with_questions))
+        return await metadata_cache.games.get(("game", game_id, with_questions), metadata_cache.game_tag(game_id), load)
+
+    async def get_question(self, db, question_id):
+        async def load():
+            return _fixed_question(await self.inner.get_question(db, question_id))
+        return await metadata_cache.games.get(("question", question_id), metadata_cache.question_tag(question_id), load)
+
+    async def get_question_at(self, db, game_id, index):
+        async def load():
+            return _fixed_question(await self.inner.get_question_at(db, game_id, index))
+        return await metadata_cache.games.get(("question_at", game_id, index), metadata_cache.game_tag(game_id), load)
+
+    async def set_current_question(self, db, game_id, question_id):
+        await self.inner.set_current_question(db, game_id, question_id)
+
+    async def finish_game(self, db, game_id):
+        await self.inner.finish_game(db, game_id)
+        await metadata_cache.invalidate(metadata_cache.game_tag(game_id))
+
+    async def create_answer(self, db, question_id, answer_text, player_id):
+        return await self.inner.create_answer(db, question_id, answer_text, player_id)
+
+    async def get_answers(self, db, question_id):
+        return await self.inner.get_answers(db, question_id)
+
+    async def set_correct_answer(self, db, question_id, answer_id):
+        await self.inner.set_correct_answer(db, question_id, answer_id)
+
+    async def create_vote(self, db, answer_id, voter_id):
+        return await self.inner.create_vote(db, answer_id, voter_id)
+
+    async def get_votes(self, db, question_id):
+        return await self.inner.get_votes(db, question_id)
+
+    async def add_scores(self, db, game_id, score_updates):
+        await self.inner.add_scores(db, game_id, score_updates)
+
+    async def get_scores(self, db, game_id):
+        return await self.inner.get_scores(db, game_id)
+
+
+async def current_question(db: Session, state) -> Optional[QuestionRecord]:
+    """The question a room is on, by the round index in its Redis game state; None between rounds and after the last."""
+    return await store.get_question_at(db, state.game_id, state.current_question_index)
+
+
+def create_store(kind: str = GAME_STORE) -> GameStore:
+    if kind == "redis":
+        store = RedisGameStore()
+    elif kind == "sql":
+        store = SqlGameStore()
+    else:
+        raise ValueError(f"Unknown GAME_STORE {kind!r}; expected 'sql' or 'redis'")
+    return CachedGameStore(store) if metadata_cache.METADATA_CACHE_SIZE else store
+
+
+store = create_store()
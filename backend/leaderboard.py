@@ -0,0 +1,213 @@
+# backend/leaderboard.py
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from fastapi.concurrency import run_in_threadpool
+from database import SessionLocal, redis, redis_pipeline
+import crud
+import game_store
+import schemas
+from game_state import GAME_STATE_TTL_SECONDS
+
+# Live scores are kept in Redis sorted sets; the game store's copy (MySQL's
+# player_game_scores by default) is brought up to date in the background and
+# used to rebuild a missing set.
+#
+# The all-time theme sets have no TTL but are still only a copy: MySQL keeps
+# every game's scores, in player_game_scores until retention moves them into
+# the archived_games documents. rebuild_theme_leaderboards() sums both back
+# into leaderboard:theme:*, and a worker runs it at startup whenever Redis has
+# lost the THEMES_BUILT_KEY marker (a flush, a new instance). Points from
+# rounds still being written when it runs can be missed. Run it by hand from
+# backend/ with `python leaderboard.py`.
+THEMES_BUILT_KEY = "leaderboard:themes:built"
+
+# Display names are cached per user and expire; a miss is read from MySQL
+USERNAME_TTL_SECONDS = int(os.getenv("USERNAME_TTL_SECONDS", str(24 * 60 * 60)))
+
+logger = logging.getLogger("bazinga.leaderboard")
+
+# Holds references to in-flight MySQL writes so they aren't garbage collected
+_pending_writes = set()
+
+
+def game_key(game_id: int) -> str:
+    return f"leaderboard:game:{game_id}"
+
+
+def theme_key(theme: str) -> str:
+    return f"leaderboard:theme:{theme}"
+
+
+def username_key(user_id: int) -> str:
+    return f"leaderboard:username:{user_id}"
+
+
+def queue_usernames(pipe, usernames: dict):
+    for user_id, username in usernames.items():
+        pipe.set(username_key(user_id), username, ex=USERNAME_TTL_SECONDS)
+
+
+def queue_start_game(pipe, game_id: int, players):
+    """Seeds the game's sorted set at zero so every player ranks from the first round."""
+    if not players:
+        return
+    pipe.zadd(game_key(game_id), {p.id: 0 for p in players})
+    pipe.expire(game_key(game_id), GAME_STATE_TTL_SECONDS)
+    queue_usernames(pipe, {p.id: p.username for p in players})
+
+
+def queue_add_points(pipe, game_id: int, theme: str, score_updates: dict):
+    for user_id, points in score_updates.items():
+        pipe.zincrby(game_key(game_id), points, user_id)
+        pipe.zincrby(theme_key(theme), points, user_id)
+
+
+def queue_read_game(pipe, game_id: int):
+    pipe.zrevrange(game_key(game_id), 0, -1, withscores=True)
+
+
+async def _players_from_ranking(ranking) -> list:
+    if not ranking:
+        return []
+    user_ids = [int(user_id) for user_id, _ in ranking]
+    usernames = await redis.mget([username_key(user_id) for user_id in user_ids])
+    missing = [user_id for user_id, username in zip(user_ids, usernames) if username is None]
+    if missing:
+        found = await _load_usernames(missing)
+        if found:
+            async with redis_pipeline() as pipe:
+                queue_usernames(pipe, found)
+                await pipe.execute()
+        usernames = [username or found.get(user_id) for user_id, username in zip(user_ids, usernames)]
+    return [
+        schemas.Player(id=int(user_id), username=username or "Unknown", score=int(score))
+        for (user_id, score), username in zip(ranking, usernames)
+    ]
+
+
+async def _load_usernames(user_ids) -> dict:
+    db = SessionLocal()
+    try:
+        return await run_in_threadpool(crud.get_usernames, db, user_ids)
+    finally:
+        db.close()
+
+
+async def get_game_players(game_id: int, ranking=None) -> list:
+    """Players of a game ordered by score, rebuilt from MySQL if the set has expired."""
+    if ranking is None:
+        ranking = await redis.zrevrange(game_key(game_id), 0, -1, withscores=True)
+    if not ranking:
+        ranking = await reconcile_game(game_id)
+    return await _players_from_ranking(ranking)
+
+
+async def reconcile_game(game_id: int):
+    """Rewrites a game's sorted set from the game store's scores and returns the ranking."""
+    db = SessionLocal()
+    try:
+        scores = await game_store.store.get_scores(db, game_id)
+        if not scores:
+            return []
+        async with redis_pipeline() as pipe:
+            pipe.delete(game_key(game_id))
+            pipe.zadd(game_key(game_id), {s.player_id: s.score for s in scores})
+            pipe.expire(game_key(game_id), GAME_STATE_TTL_SECONDS)
+            usernames = {s.player_id: s.username for s in scores if s.username}
+            queue_usernames(pipe, usernames)
+            await pipe.execute()
+        ranked = sorted(scores, key=lambda s: s.score, reverse=True)
+        return [(str(s.player_id), s.score) for s in ranked]
+    finally:
+        db.close()
+
+
+def persist_scores_later(score_updates: dict, game_id: int):
+    """Applies a round's points to the game store off the hot path."""
+    async def write():
+        db = SessionLocal()
+        try:
+            await game_store.store.add_scores(db, game_id, score_updates)
+        except Exception as e:
+            logger.error(f"Error persisting scores for game {game_id}: {e}")
+        finally:
+            db.close()
+
+    task = asyncio.create_task(write())
+    _pending_writes.add(task)
+    task.add_done_callback(_pending_writes.discard)
+
+
+async def flush_pending_writes():
+    """Waits for the score writes persist_scores_later() has handed off so far."""
+    if _pending_writes:
+        await asyncio.gather(*_pending_writes)
+
+
+async def get_theme_leaders(theme: str, limit: int) -> list:
+    ranking = await redis.zrevrange(theme_key(theme), 0, limit - 1, withscores=True)
+    return await _players_from_ranking(ranking)
+
+
+async def get_rank(key: str, user_id: int):
+    """Returns (1-based rank, score) or None; ZREVRANK keeps this O(log n)."""
+    async with redis_pipeline() as pipe:
+        rank, score = await pipe.zrevrank(key, user_id).zscore(key, user_id).execute()
+    if rank is None:
+        return None
+    return rank + 1, int(score)
+
+
+def theme_totals(db) -> dict:
+    """theme -> {player_id: points} over every game MySQL still knows about, live or archived."""
+    totals = defaultdict(lambda: defaultdict(int))
+    for theme, player_id, points in crud.get_theme_scores(db):
+        totals[theme][player_id] += int(points or 0)
+    for theme, payload in crud.get_archived_scores(db):
+        for score in json.loads(payload)["scores"]:
+            totals[theme][score["player_id"]] += score["score"]
+    return {
+        theme: {player_id: points for player_id, points in players.items() if points}
+        for theme, players in totals.items()
+    }
+
+
+async def rebuild_theme_leaderboards() -> int:
+    """Replaces every leaderboard:theme:* set with the totals from MySQL. Returns how many themes were written."""
+    db = SessionLocal()
+    try:
+        totals = await run_in_threadpool(theme_totals, db)
+    finally:
+        db.close()
+    stale = [key async for key in redis.scan_iter(match=theme_key("*"))]
+    # One MULTI, so readers see either the old sets or the rebuilt ones
+    async with redis.pipeline(transaction=True) as pipe:
+        if stale:
+            pipe.delete(*stale)
+        for theme, players in totals.items():
+            if players:
+                pipe.zadd(theme_key(theme), players)
+        pipe.set(THEMES_BUILT_KEY, 1)
+        await pipe.execute()
+    return sum(1 for players in totals.values() if players)
+
+
+async def ensure_theme_leaderboards():
+    """Rebuilds the theme sets if Redis lost them; the first worker to claim the marker does it."""
+    # The claim expires, so a worker that dies mid-rebuild doesn't block the next one
+    if not await redis.set(THEMES_BUILT_KEY, 0, nx=True, ex=300):
+        return
+    try:
+        themes = await rebuild_theme_leaderboards()
+        logger.info(f"Rebuilt {themes} theme leaderboards from MySQL.")
+    except Exception as e:
+        logger.error(f"Error rebuilding theme leaderboards: {e}")
+        await redis.delete(THEMES_BUILT_KEY)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    print(f"Rebuilt {asyncio.run(rebuild_theme_leaderboards())} theme leaderboards.")
@@ -0,0 +1,140 @@
+# backend/lobby.py
+"""
+Public lobby index and quick-match seating.
+
+Public rooms that haven't started are listed in lobby:{theme}, a sorted set
+of room codes scored by free seats. lobby:seats holds each room's free seat
+count and lobby:rooms its theme, and both outlive a room dropping off its
+listing while nobody is connected. A room leaves the lobby for good when its
+game starts or it expires.
+
+Quick-match claims a seat in one script call: the fullest room that still
+has a seat (ZRANGEBYSCORE 1 +inf LIMIT 0 1, O(log n)) gives up a seat, or,
+when the theme has no open room, the caller's new room code is listed with
+the caller in it. Later callers in the same burst fill that room rather than
+each creating their own. Seats are counted in Redis, so concurrent claims
+never hand out more seats than a room has; MySQL's join check still has the
+last word if the two ever disagree.
+"""
+from database import redis, redis_pipeline
+
+ROOMS_KEY = "lobby:rooms"
+SEATS_KEY = "lobby:seats"
+# Rooms created without a theme are matched together
+ANY_THEME = "any"
+
+# KEYS: listing, seats, rooms; ARGV: new room code, room size, theme
+_CLAIM_SEAT_SCRIPT = """
+local best = redis.call('ZRANGEBYSCORE', KEYS[1], 1, '+inf', 'LIMIT', 0, 1)[1]
+if best then
+    local free = redis.call('HINCRBY', KEYS[2], best, -1)
+    if free > 0 then
+        redis.call('ZADD', KEYS[1], free, best)
+    else
+        redis.call('ZREM', KEYS[1], best)
+    end
+    return {best, 0}
+end
+local free = tonumber(ARGV[2]) - 1
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[3])
+redis.call('HSET', KEYS[2], ARGV[1], free)
+if free > 0 then
+    redis.call('ZADD', KEYS[1], free, ARGV[1])
+end
+return {ARGV[1], 1}
+"""
+
+# KEYS: listing, seats; ARGV: room code, free seats according to MySQL.
+# Only ever lowers the count, since seats claimed here may not be in MySQL yet
+_SYNC_SEATS_SCRIPT = """
+local current = redis.call('HGET', KEYS[2], ARGV[1])
+if not current then
+    return -1
+end
+local free = math.min(tonumber(current), tonumber(ARGV[2]))
+redis.call('HSET', KEYS[2], ARGV[1], free)
+if free > 0 then
+    redis.call('ZADD', KEYS[1], 'XX', free, ARGV[1])
+else
+    redis.call('ZREM', KEYS[1], ARGV[1])
+end
+return free
+"""
+
+# KEYS: listing, seats; ARGV: room code
+_RELIST_SCRIPT = """
+local free = tonumber(redis.call('HGET', KEYS[2], ARGV[1]))
+if free and free > 0 then
+    redis.call('ZADD', KEYS[1], free, ARGV[1])
+end
+return free
+"""
+
+_claim_seat = redis.register_script(_CLAIM_SEAT_SCRIPT)
+_sync_seats = redis.register_script(_SYNC_SEATS_SCRIPT)
+_relist = redis.register_script(_RELIST_SCRIPT)
+
+
+def lobby_theme(theme) -> str:
+    return theme.strip().lower() if theme and theme.strip() else ANY_THEME
+
+
+def listing_key(theme: str) -> str:
+    return f"lobby:{theme}"
+
+
+async def list_room(room_code: str, theme: str, free_seats: int):
+    async with redis_pipeline() as pipe:
+        pipe.hset(ROOMS_KEY, room_code, theme)
+        pipe.hset(SEATS_KEY, room_code, free_seats)
+        if free_seats > 0:
+            pipe.zadd(listing_key(theme), {room_code: free_seats})
+        await pipe.execute()
+
+
+async def claim_seat(theme: str, new_room_code: str, room_size: int):
+    """Returns (room_code, created): a seat in the fullest open room, or new_room_code listed as a new room."""
+    room_code, created = await _claim_seat(
+        keys=[listing_key(theme), SEATS_KEY, ROOMS_KEY],
+        args=[new_room_code, room_size, theme],
+    )
+    return room_code, bool(created)
+
+
+async def sync_seats(room_code: str, free_seats: int):
+    """Applies a join made by room code; a no-op for rooms that aren't listed."""
+    theme = await redis.hget(ROOMS_KEY, room_code)
+    if theme is not None:
+        await _sync_seats(keys=[listing_key(theme), SEATS_KEY], args=[room_code, free_seats])
+
+
+def queue_theme(pipe, room_code: str):
+    """Queues a read of the room's lobby theme (None unless it's a public room that hasn't started)."""
+    pipe.hget(ROOMS_KEY, room_code)
+
+
+async def unlist(room_code: str, theme: str):
+    """Hides a room nobody is connected to; relist() brings it back with its seats intact."""
+    await redis.zrem(listing_key(theme), room_code)
+
+
+async def relist(room_code: str, theme: str):
+    await _relist(keys=[listing_key(theme), SEATS_KEY], args=[room_code])
+
+
+async def withdraw(room_code: str):
+    """Removes a room from the lobby for good, once its game starts or it expires."""
+    theme = await redis.hget(ROOMS_KEY, room_code)
+    if theme is None:
+        return
+    async with redis_pipeline() as pipe:
+        pipe.zrem(listing_key(theme), room_code)
+        pipe.hdel(SEATS_KEY, room_code)
+        pipe.hdel(ROOMS_KEY, room_code)
+        await pipe.execute()
+
+
+async def open_rooms(theme: str, limit: int):
+    """(room_code, free_seats) for the theme's listed rooms, fullest first."""
+    rooms = await redis.zrangebyscore(listing_key(theme), 1, "+inf", start=0, num=limit, withscores=True)
+    return [(room_code, int(free)) for room_code, free in rooms]
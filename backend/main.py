@@ -1,24 +1,62 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-import models, crud
+from fastapi.concurrency import run_in_threadpool
+import models, crud, metadata_cache, metrics, query_profiler, retention, room_lifecycle
 from database import engine, SessionLocal, redis
-from routers import rooms
+from routers import rooms, leaderboard
+from leaderboard import ensure_theme_leaderboards, flush_pending_writes
+import drain
+import asyncio
 import contextlib
+import logging
+import os
 
-# This will create the tables if they don't exist
-models.Base.metadata.create_all(bind=engine)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-@contextlib.asynccontextmanager
-async def lifespan(app: FastAPI):
+# Skips schema creation and the startup wipe, for deployments where Alembic
+# owns the schema and restarts must not drop live games. The wipe clears
+# rooms, games and Redis, but keeps users and theme leaderboard totals.
+FAST_STARTUP = os.getenv("FAST_STARTUP", "false").lower() in ("1", "true", "yes")
+
+def reset_database():
+    # This will create the tables if they don't exist
+    models.Base.metadata.create_all(bind=engine)
+    # Every game goes to the archive first, which the theme leaderboards are rebuilt from
+    retention.archive_all()
     # Clear all data on startup
     db = SessionLocal()
     try:
         crud.clear_all_data(db)
-        await redis.flushdb()
     finally:
         db.close()
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Connection work happens here rather than at import so that importing
+    # the app (workers, tooling) never blocks on MySQL or Redis.
+    if not FAST_STARTUP:
+        await run_in_threadpool(reset_database)
+        await redis.flushdb()
+    else:
+        await redis.ping()
+    # The theme leaderboards live in Redis; bring them back if it was flushed
+    background_tasks = [asyncio.create_task(ensure_theme_leaderboards())]
+    if retention.RETENTION_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(retention.retention_loop()))
+    if room_lifecycle.ROOM_IDLE_TTL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(room_lifecycle.lifecycle.listen_for_expirations()))
+        if room_lifecycle.ROOM_SWEEP_INTERVAL_SECONDS > 0:
+            background_tasks.append(asyncio.create_task(room_lifecycle.lifecycle.sweep_loop()))
+    if metadata_cache.METADATA_CACHE_SIZE > 0:
+        background_tasks.append(asyncio.create_task(metadata_cache.listen_for_invalidations()))
+    if drain.DRAIN_DEADLINE_SECONDS > 0:
+        drain.install_signal_handler()
     yield
-    # Any cleanup on shutdown would go here
+    # Rounds that just ended still have their points on the way to MySQL
+    await flush_pending_writes()
+    for task in background_tasks:
+        task.cancel()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -37,8 +75,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+async def profile_sql_queries(request, call_next):
+    with query_profiler.profile_scope(f"{request.method} {request.url.path}") as stats:
+        response = await call_next(request)
+        # Attribute to the route template rather than the concrete room code
+        route = request.scope.get("route")
+        if route is not None:
+            stats.label = f"{request.method} {route.path}"
+    return response
+
+if query_profiler.SQL_PROFILING_ENABLED:
+    app.middleware("http")(profile_sql_queries)
+
 app.include_router(rooms.router)
+app.include_router(leaderboard.router)
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Bazinga! backend."}
+
+metrics.DB_POOL_CONNECTIONS.set_function(lambda: {
+    "checked_out": engine.pool.checkedout(),
+    "checked_in": engine.pool.checkedin(),
+    "overflow": max(engine.pool.overflow(), 0),
+})
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return metrics.render_latest()
@@ -0,0 +1,184 @@
+# backend/metadata_cache.py
+"""
+Per-worker LRU cache of room and game metadata that rarely changes during a
+game: who owns a room, and a game's theme and questions. Per-round pointers
+(the current question, a question's correct answer id) are never cached.
+
+Entries expire after METADATA_CACHE_TTL_SECONDS and the least recently used
+are evicted past METADATA_CACHE_SIZE per cache (0 turns caching off). Each
+entry carries a tag such as game:{id}. A worker that changes something
+cached drops the tag's entries at once and publishes the tag on
+metadata:invalidate, and every other worker drops them when
+listen_for_invalidations() hears it. A lookup that was loading while any
+invalidation arrived isn't stored, so it can't put back what was just
+dropped. Messages published while the subscription is down are lost, so
+the caches are cleared whenever it (re)subscribes; the TTL bounds the rest.
+"""
+import asyncio
+import collections
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from database import redis
+import crud
+import metrics
+import presence
+import room_lifecycle
+
+METADATA_CACHE_SIZE = int(os.getenv("METADATA_CACHE_SIZE", "4096"))
+METADATA_CACHE_TTL_SECONDS = float(os.getenv("METADATA_CACHE_TTL_SECONDS", "30"))
+INVALIDATION_CHANNEL = "metadata:invalidate"
+_RESUBSCRIBE_DELAY_SECONDS = 1.0
+
+logger = logging.getLogger("bazinga.metadata_cache")
+
+_caches = []
+
+
+class MetadataCache:
+    """An LRU of key -> value with a TTL; values are shared, so callers must treat them as read-only."""
+
+    def __init__(self, name: str, maxsize: int = METADATA_CACHE_SIZE, ttl: float = METADATA_CACHE_TTL_SECONDS):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: collections.OrderedDict = collections.OrderedDict()  # key -> (expires_at, tag, value)
+        self._tags: dict[str, set] = {}
+        # Bumped by every invalidation; a load that saw it change is not stored
+        self._epoch = 0
+        _caches.append(self)
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, key, tag: str, load):
+        """Returns the cached value for key, or awaits load() and caches what it returns (None is never cached)."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                metrics.METADATA_CACHE_LOOKUPS.inc(cache=self.name, result="hit")
+                return entry[2]
+            self._drop(key)
+        metrics.METADATA_CACHE_LOOKUPS.inc(cache=self.name, result="miss")
+
+        epoch = self._epoch
+        value = await load()
+        if value is not None and self.maxsize and epoch == self._epoch:
+            self._put(key, tag, value)
+        return value
+
+    def _put(self, key, tag: str, value):
+        self._drop(key)
+        self._entries[key] = (time.monotonic() + self.ttl, tag, value)
+        self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._tags.get(entry[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tags[entry[1]]
+
+    def invalidate(self, tag: str):
+        self._epoch += 1
+        for key in self._tags.pop(tag, ()):
+            self._entries.pop(key, None)
+
+    def clear(self):
+        self._epoch += 1
+        self._entries.clear()
+        self._tags.clear()
+
+
+rooms = MetadataCache("room")
+games = MetadataCache("game")
+
+
+def room_tag(room_code: str) -> str:
+    return f"room:{room_code}"
+
+
+def game_tag(game_id: int) -> str:
+    return f"game:{game_id}"
+
+
+def question_tag(question_id: int) -> str:
+    return f"question:{question_id}"
+
+
+def _invalidate_local(tags):
+    for cache in _caches:
+        for tag in tags:
+            cache.invalidate(tag)
+
+
+async def invalidate(*tags: str):
+    """Drops the tagged entries here and on every other worker. Call after the change is committed."""
+    _invalidate_local(tags)
+    metrics.METADATA_CACHE_INVALIDATIONS.inc(source="local")
+    if METADATA_CACHE_SIZE:
+        await redis.publish(INVALIDATION_CHANNEL, " ".join((presence.WORKER_ID, *tags)))
+
+
+def clear():
+    for cache in _caches:
+        cache.clear()
+
+
+async def listen_for_invalidations():
+    while True:
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Anything published before this point was missed
+            clear()
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if not message or message['type'] != 'message':
+                    continue
+                worker_id, *tags = message['data'].split(" ")
+                if worker_id != presence.WORKER_ID:
+                    _invalidate_local(tags)
+                    metrics.METADATA_CACHE_INVALIDATIONS.inc(source="remote")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Invalidation subscription failed ({e}); resubscribing.")
+            await asyncio.sleep(_RESUBSCRIBE_DELAY_SECONDS)
+        finally:
+            try:
+                await pubsub.close()
+            except Exception:
+                pass
+
+
+@dataclass(slots=True, frozen=True)
+class RoomMeta:
+    id: int
+    room_code: str
+    owner_id: int
+    max_players: int
+
+
+async def get_room(db, room_code: str) -> Optional[RoomMeta]:
+    """The room's fixed fields; players change with every join, so they come from crud.get_room_by_code."""
+    def load():
+        db_room = crud.get_room_by_code(db, room_code)
+        return RoomMeta(db_room.id, db_room.room_code, db_room.owner_id, db_room.max_players) if db_room else None
+
+    return await rooms.get(room_code, room_tag(room_code), lambda: run_in_threadpool(load))
+
+
+# Every worker runs the release, so each only needs to drop its own copy
+room_lifecycle.lifecycle.on_release(lambda room_code: rooms.invalidate(room_tag(room_code)))
+
+metrics.METADATA_CACHE_ENTRIES.set_function(lambda: {cache.name: len(cache) for cache in _caches})
@@ -0,0 +1,223 @@
+# backend/metrics.py
+import os
+import threading
+import time
+import contextlib
+import functools
+
+# Metrics are off unless explicitly enabled; every recording call short-circuits
+# on this flag so the hot paths pay a single attribute lookup when disabled.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NOOP_TIMER = contextlib.nullcontext()
+REGISTRY = []
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict):
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labelvalues, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, labelvalues, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [("_total", key, None, value) for key, value in items]
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        """Computes the gauge lazily at scrape time instead of on every change."""
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            result = self._function()
+            if isinstance(result, dict):
+                return [("", key if isinstance(key, tuple) else (key,), None, value) for key, value in result.items()]
+            return [("", (), None, result)]
+        with self._lock:
+            items = list(self._values.items())
+        return [("", key, None, value) for key, value in items]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels):
+        if not METRICS_ENABLED:
+            return _NOOP_TIMER
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(entry[0]), entry[1], entry[2])) for key, entry in self._values.items()]
+        samples = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for upper, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append(("_bucket", key, ("le", _format_value(float(upper))), cumulative))
+            samples.append(("_sum", key, None, total))
+            samples.append(("_count", key, None, count))
+        return samples
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def timed(histogram: Histogram, **labels):
+    """Decorates a coroutine so each call is observed in the given histogram."""
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render_latest() -> str:
+    """Renders every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Game metrics ---
+WS_MESSAGES = Counter("bazinga_ws_messages", "WebSocket messages received, by type.", ["type"])
+WS_MESSAGES_REJECTED = Counter("bazinga_ws_messages_rejected", "Inbound WebSocket messages rejected before handling.", ["reason"])
+WS_MESSAGE_LATENCY = Histogram("bazinga_ws_message_seconds", "Time spent handling an inbound WebSocket message.", ["type"])
+GAME_HANDLER_LATENCY = Histogram("bazinga_game_handler_seconds", "Time spent in game logic handlers.", ["handler"])
+GAME_START_PHASE_LATENCY = Histogram("bazinga_game_start_phase_seconds", "Time spent in each phase of starting a game.", ["phase"])
+REDIS_PUBLISH_LATENCY = Histogram("bazinga_redis_publish_seconds", "Time spent publishing a room broadcast to Redis.")
+WS_FANOUT_LATENCY = Histogram("bazinga_ws_fanout_seconds", "Time spent forwarding a pub/sub message to a local socket.")
+WS_FANOUT_MESSAGES = Counter("bazinga_ws_fanout_messages", "Pub/sub messages forwarded to local sockets.")
+WS_SEND_QUEUE_DEPTH = Gauge("bazinga_ws_send_queue_depth", "Messages waiting in per-socket send queues on this worker.", ["stat"])
+WS_SEND_DROPPED = Counter("bazinga_ws_send_dropped", "Outbound messages dropped before reaching a socket.", ["reason"])
+WS_SLOW_CONSUMER_EVICTIONS = Counter("bazinga_ws_slow_consumer_evictions", "Sockets closed for staying over the send queue high-water mark.")
+DEBOUNCED_CALLS = Counter("bazinga_debounced_calls", "Room updates merged into an already pending debounce window.", ["action"])
+AUDIENCE_SPECTATORS = Gauge("bazinga_audience_spectators", "Spectator sockets open on this worker.")
+AUDIENCE_BATCHES = Counter("bazinga_audience_batches", "Batched event frames flushed to room audiences.")
+AUDIENCE_VOTES = Counter("bazinga_audience_votes", "Audience votes received on this worker.")
+ROOMS_EXPIRED = Counter("bazinga_rooms_expired", "Idle rooms closed by this worker.", ["source"])
+TRACKED_ROOMS = Gauge("bazinga_lifecycle_tracked_rooms", "Rooms this worker is refreshing the idle TTL for.")
+WS_DRAIN_RECONNECTS = Counter("bazinga_ws_drain_reconnects", "Sockets told to reconnect elsewhere while this worker drained.", ["kind"])
+METADATA_CACHE_LOOKUPS = Counter("bazinga_metadata_cache_lookups", "Room and game metadata cache lookups, by cache and hit or miss.", ["cache", "result"])
+METADATA_CACHE_INVALIDATIONS = Counter("bazinga_metadata_cache_invalidations", "Metadata cache invalidations, made here (local) or heard from other workers (remote).", ["source"])
+METADATA_CACHE_ENTRIES = Gauge("bazinga_metadata_cache_entries", "Entries held in each metadata cache on this worker.", ["cache"])
+QUICKMATCH_CLAIMS = Counter("bazinga_quickmatch_claims", "Quick-match requests, by how the seat was found.", ["result"])
+WS_RESUMES = Counter("bazinga_ws_resumes", "Reconnects that presented a resume token, by outcome.", ["result"])
+ACTIVE_ROOMS = Gauge("bazinga_active_rooms", "Rooms with at least one socket on this worker.")
+ACTIVE_SOCKETS = Gauge("bazinga_active_sockets", "WebSocket connections open on this worker.")
+DB_QUERIES_PER_EVENT = Histogram("bazinga_db_queries_per_event", "SQL statements emitted per profiled message or route.", ["scope"], buckets=(1, 2, 5, 10, 20, 50, 100))
+DB_POOL_CONNECTIONS = Gauge("bazinga_db_pool_connections", "Database pool connections by state.", ["state"])
@@ -30,6 +30,7 @@ class GameRoom(Base):
     max_players = Column(Integer, default=8)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     owner_id = Column(Integer, ForeignKey('users.id'))
+    closed_at = Column(DateTime(timezone=True), nullable=True, index=True) # Set when the room expires after going idle
 
     owner = relationship("User", back_populates="owned_rooms")
     players = relationship("User", secondary=room_players_association, back_populates="rooms")
@@ -42,6 +43,7 @@ class Game(Base):
     theme = Column(String(255), nullable=False)
     current_question_id = Column(Integer, ForeignKey('questions.id'), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True, index=True) # Set when game_over fires
 
     room = relationship("GameRoom", back_populates="games")
     questions = relationship("Question", back_populates="game", foreign_keys="[Question.game_id]", order_by="Question.id")
@@ -91,4 +93,13 @@ class Vote(Base):
     answer = relationship("Answer", back_populates="votes")
     voter = relationship("User")
 
-
+class ArchivedGame(Base):
+    """A finished game moved out of the hot tables as one compact JSON document."""
+    __tablename__ = "archived_games"
+    id = Column(Integer, primary_key=True, index=True)
+    game_id = Column(Integer, unique=True, nullable=False)
+    room_id = Column(Integer, index=True)
+    theme = Column(String(255), nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True), index=True)
+    payload = Column(Text, nullable=False)
@@ -0,0 +1,89 @@
+# backend/presence.py
+"""
+Counts connected players per room across workers.
+
+Each worker writes the number of player sockets it holds for a room into its
+own field of room:{code}:presence, and heartbeats its id into the
+workers:alive sorted set. Fields from workers that stopped heartbeating are
+ignored, so a crashed worker can't leave ghost players that stall a round.
+
+A draining worker hands its players a resume token each and lists them in
+room:{code}:resuming until they reconnect elsewhere, so the handoff doesn't
+look like everyone left mid-round.
+"""
+import json
+import os
+import secrets
+import time
+import uuid
+from database import redis, redis_pipeline
+
+WORKER_ID = uuid.uuid4().hex[:12]
+WORKERS_KEY = "workers:alive"
+WORKER_HEARTBEAT_SECONDS = float(os.getenv("WORKER_HEARTBEAT_SECONDS", "5"))
+WORKER_TIMEOUT_SECONDS = float(os.getenv("WORKER_TIMEOUT_SECONDS", "15"))
+PRESENCE_TTL_SECONDS = int(os.getenv("PRESENCE_TTL_SECONDS", str(6 * 60 * 60)))
+RESUME_TOKEN_TTL_SECONDS = int(os.getenv("RESUME_TOKEN_TTL_SECONDS", "60"))
+
+
+def presence_key(room_code: str) -> str:
+    return f"room:{room_code}:presence"
+
+
+def resuming_key(room_code: str) -> str:
+    return f"room:{room_code}:resuming"
+
+
+def resume_token_key(token: str) -> str:
+    return f"resume:{token}"
+
+
+def queue_set_count(pipe, room_code: str, count: int):
+    if count:
+        pipe.hset(presence_key(room_code), WORKER_ID, count)
+        pipe.expire(presence_key(room_code), PRESENCE_TTL_SECONDS)
+    else:
+        pipe.hdel(presence_key(room_code), WORKER_ID)
+
+
+def queue_count(pipe, room_code: str):
+    """Queues the three reads parse_count() needs; they add no round trip to an existing pipeline."""
+    now = time.time()
+    pipe.hgetall(presence_key(room_code))
+    pipe.zrangebyscore(WORKERS_KEY, now - WORKER_TIMEOUT_SECONDS, "+inf")
+    pipe.zcount(resuming_key(room_code), now, "+inf")
+
+
+def parse_count(counts: dict, live_workers, resuming: int = 0) -> int:
+    live_workers = set(live_workers)
+    return resuming + sum(int(count) for worker, count in counts.items() if worker in live_workers)
+
+
+def queue_issue_resume_token(pipe, room_code: str, user_id: int) -> str:
+    """Queues a resume token for a player being handed off; they count as present until it expires or is used."""
+    token = secrets.token_urlsafe(16)
+    expires_at = time.time() + RESUME_TOKEN_TTL_SECONDS
+    pipe.set(resume_token_key(token), json.dumps({"room_code": room_code, "user_id": user_id}), ex=RESUME_TOKEN_TTL_SECONDS)
+    pipe.zadd(resuming_key(room_code), {user_id: expires_at})
+    pipe.zremrangebyscore(resuming_key(room_code), "-inf", time.time())
+    pipe.expire(resuming_key(room_code), RESUME_TOKEN_TTL_SECONDS)
+    return token
+
+
+async def consume_resume_token(token: str, room_code: str, user_id: int) -> bool:
+    """Redeems a token once; True if it was issued for this player and room."""
+    # GETDEL (Redis 6.2+), so two reconnects racing with one token can't both redeem it
+    issued = await redis.getdel(resume_token_key(token))
+    if not issued or json.loads(issued) != {"room_code": room_code, "user_id": user_id}:
+        return False
+    await redis.zrem(resuming_key(room_code), user_id)
+    return True
+
+
+async def heartbeat():
+    async with redis_pipeline() as pipe:
+        now = time.time()
+        pipe.zadd(WORKERS_KEY, {WORKER_ID: now})
+        # Forget workers that have been gone for a while
+        pipe.zremrangebyscore(WORKERS_KEY, "-inf", now - 10 * WORKER_TIMEOUT_SECONDS)
+        await pipe.execute()
@@ -0,0 +1,89 @@
+# backend/protocol.py
+import functools
+import json
+from typing import Optional
+
+try:
+    import msgpack
+except ImportError:  # the compact protocol is only offered when msgpack is installed
+    msgpack = None
+
+# WebSocket subprotocols a client can offer in Sec-WebSocket-Protocol. Clients
+# that offer none (the current web app) keep getting plain JSON text frames.
+JSON_V1 = "bazinga.v1.json"
+MSGPACK_V2 = "bazinga.v2.msgpack"
+
+
+def supported_subprotocols():
+    return ([MSGPACK_V2] if msgpack is not None else []) + [JSON_V1]
+
+
+def negotiate(offered) -> Optional[str]:
+    """Picks the first subprotocol the client offered that this server speaks."""
+    supported = supported_subprotocols()
+    for subprotocol in offered or []:
+        if subprotocol in supported:
+            return subprotocol
+    return None
+
+
+def for_subprotocol(subprotocol: Optional[str]):
+    if subprotocol == MSGPACK_V2:
+        return MsgpackDeltaProtocol()
+    return JsonProtocol()
+
+
+class JsonProtocol:
+    """v1: server messages are forwarded as the JSON text they were published as."""
+    binary = False
+
+    def encode(self, message: str):
+        return message
+
+    def decode(self, data) -> dict:
+        return json.loads(data)
+
+
+@functools.lru_cache(maxsize=256)
+def _pack_json(message: str) -> bytes:
+    # Every socket in a room encodes the same published string, so cache by it
+    return msgpack.packb(json.loads(message), use_bin_type=True)
+
+
+class MsgpackDeltaProtocol:
+    """
+    v2: MessagePack binary frames. player_update becomes player_delta, carrying
+    only players that changed since the last update sent on this connection.
+    `seq` increases by one per player message and `base` names the update the
+    delta applies to; a client that sees a gap should reconnect for a full list.
+    """
+    binary = True
+
+    def __init__(self):
+        self.seq = 0
+        self._players = None
+
+    def encode(self, message: str) -> bytes:
+        if message.startswith('{"event": "player_update"'):
+            return self._encode_player_update(json.loads(message))
+        return _pack_json(message)
+
+    def decode(self, data) -> dict:
+        return msgpack.unpackb(data, raw=False)
+
+    def _encode_player_update(self, message: dict) -> bytes:
+        players = {p["id"]: p for p in message["players"]}
+        base = self.seq
+        self.seq += 1
+        if self._players is None:
+            payload = {"event": "player_update", "seq": self.seq, "players": message["players"]}
+        else:
+            payload = {
+                "event": "player_delta",
+                "seq": self.seq,
+                "base": base,
+                "upsert": [p for pid, p in players.items() if self._players.get(pid) != p],
+                "remove": [pid for pid in self._players if pid not in players],
+            }
+        self._players = players
+        return msgpack.packb(payload, use_bin_type=True)
@@ -0,0 +1,91 @@
+# backend/query_profiler.py
+import contextlib
+import contextvars
+import logging
+import os
+import time
+from sqlalchemy import event
+
+import metrics
+
+# Opt-in: the engine hooks are only registered when SQL_PROFILING is set.
+SQL_PROFILING_ENABLED = os.getenv("SQL_PROFILING", "false").lower() in ("1", "true", "yes")
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "100"))
+
+logger = logging.getLogger("bazinga.sql")
+
+_current_scope = contextvars.ContextVar("sql_profile_scope", default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryStats:
+    """Query count and time attributed to one message, route or test block."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.count = 0
+        self.total_ms = 0.0
+        self.statements = []
+
+    def record(self, statement: str, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.statements.append(statement)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start_time"].pop()) * 1000
+    stats = _current_scope.get()
+    label = stats.label if stats else "unscoped"
+    if stats is not None:
+        stats.record(statement, elapsed_ms)
+    if elapsed_ms >= SLOW_QUERY_THRESHOLD_MS:
+        logger.warning(f"Slow query ({elapsed_ms:.1f} ms) in {label}: {statement}")
+
+
+def install(engine):
+    """Registers the timing hooks on the given engine."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextlib.contextmanager
+def profile_scope(label: str, force: bool = False):
+    """
+    Attributes every statement executed inside the block (including work handed
+    to run_in_threadpool, which copies the context) to `label` and logs a summary.
+    """
+    if not (SQL_PROFILING_ENABLED or force):
+        yield None
+        return
+
+    stats = QueryStats(label)
+    token = _current_scope.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_scope.reset(token)
+        metrics.DB_QUERIES_PER_EVENT.observe(stats.count, scope=stats.label)
+        logger.info(f"{stats.label}: {stats.count} queries in {stats.total_ms:.1f} ms")
+
+
+@contextlib.contextmanager
+def query_budget(label: str, max_queries: int):
+    """
+    Raises QueryBudgetExceeded when the block emits more than `max_queries`
+    statements. The engine must have been passed to install() first; tests
+    get it through the query_budget fixture in tests/conftest.py.
+    """
+    with profile_scope(label, force=True) as stats:
+        yield stats
+    if stats.count > max_queries:
+        statements = "\n".join(stats.statements)
+        raise QueryBudgetExceeded(f"{label} emitted {stats.count} queries (budget {max_queries}):\n{statements}")
@@ -0,0 +1,245 @@
+# backend/question_packs.py
+"""
+Imports and exports question packs for the question cache (questions.json).
+
+Packs are JSON (either the cache layout {"<theme>": [{...}, ...]} or a flat
+list of records), CSV with a header row, or JSONL. Records need
+"question_text" and "correct_answer", plus "theme" unless --theme is given.
+Pack files are streamed record by record, so their size doesn't matter.
+Each question is checked against the theme's existing questions and the
+rest of the pack: exact duplicates by normalized-text hash, rewordings by
+MinHash/LSH.
+
+Run from backend/:
+
+    python question_packs.py import pack.jsonl [--theme "Weird History"]
+    python question_packs.py export weird_history.csv --theme "Weird History"
+    python question_packs.py dedupe
+"""
+import argparse
+import csv
+import json
+import os
+from collections import Counter, defaultdict
+from services import gemini
+from services.question_dedup import DEFAULT_SIMILARITY, QuestionIndex
+
+FORMATS = ("json", "csv", "jsonl")
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class _JsonStream:
+    """Just enough of an incremental JSON reader to walk a pack without loading it."""
+
+    def __init__(self, f):
+        self._f = f
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+
+    def _fill(self) -> bool:
+        chunk = self._f.read(READ_CHUNK_SIZE)
+        if not chunk:
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self, skip: str = " \t\r\n") -> str:
+        """Returns the next character that isn't in `skip`, or "" at end of file."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in skip:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Malformed JSON pack: expected {char!r}")
+        self._pos += 1
+
+    def value(self):
+        """Decodes the next string or object, reading more of the file until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, self._pos = self._decoder.raw_decode(self._buffer, self._pos)
+                return value
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+
+    def items(self):
+        """Yields the values of a list whose opening bracket has been consumed."""
+        while True:
+            char = self.peek(" \t\r\n,")
+            if char == "]":
+                self._pos += 1
+                return
+            if not char:
+                raise ValueError("Malformed JSON pack: unexpected end of file")
+            yield self.value()
+
+
+def _read_json(f):
+    stream = _JsonStream(f)
+    if stream.peek() == "[":
+        stream.expect("[")
+        for record in stream.items():
+            yield None, record
+        return
+
+    stream.expect("{")
+    while stream.peek(" \t\r\n,") != "}":
+        theme = stream.value()
+        stream.expect(":")
+        stream.expect("[")
+        for record in stream.items():
+            yield theme, record
+
+
+def _read_csv(f):
+    for record in csv.DictReader(f):
+        yield None, record
+
+
+def _read_jsonl(f):
+    for line in f:
+        if line.strip():
+            yield None, json.loads(line)
+
+
+_READERS = {"json": _read_json, "csv": _read_csv, "jsonl": _read_jsonl}
+
+
+def _format_for(path: str, explicit: str = None) -> str:
+    fmt = explicit or os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in FORMATS:
+        raise SystemExit(f"Can't tell the format of {path}; pass --format ({', '.join(FORMATS)}).")
+    return fmt
+
+
+def iter_pack(path: str, fmt: str = None):
+    """Yields (theme, question_text, correct_answer) from a pack file; theme may be None."""
+    fmt = _format_for(path, fmt)
+    with open(path, newline="" if fmt == "csv" else None, encoding="utf-8") as f:
+        for theme, record in _READERS[fmt](f):
+            if not isinstance(record, dict):
+                yield None, None, None
+                continue
+            yield (
+                theme or record.get("theme"),
+                record.get("question_text"),
+                record.get("correct_answer"),
+            )
+
+
+def _build_indexes(store: dict, threshold: float) -> dict:
+    indexes = defaultdict(lambda: QuestionIndex(threshold))
+    for theme, questions in store.items():
+        for q in questions:
+            indexes[theme].add(q["question_text"], q["correct_answer"])
+    return indexes
+
+
+def import_pack(path: str, theme: str = None, fmt: str = None, threshold: float = DEFAULT_SIMILARITY, dry_run: bool = False) -> Counter:
+    store = gemini.get_all_questions_from_file()
+    indexes = _build_indexes(store, threshold)
+    outcomes = Counter()
+
+    for record_theme, question_text, correct_answer in iter_pack(path, fmt):
+        record_theme = theme or record_theme
+        if not (record_theme and isinstance(question_text, str) and isinstance(correct_answer, str)
+                and question_text.strip() and correct_answer.strip()):
+            outcomes["invalid"] += 1
+            continue
+
+        duplicate = indexes[record_theme].add(question_text, correct_answer)
+        if duplicate:
+            outcomes[f"{duplicate}_duplicate"] += 1
+            continue
+        store.setdefault(record_theme, []).append({"question_text": question_text.strip(), "correct_answer": correct_answer.strip()})
+        outcomes["imported"] += 1
+
+    if outcomes["imported"] and not dry_run:
+        gemini.save_questions_to_file(store)
+    return outcomes
+
+
+def export_pack(path: str, themes=None, fmt: str = None) -> int:
+    fmt = _format_for(path, fmt)
+    store = gemini.get_all_questions_from_file()
+    selected = {theme: store.get(theme, []) for theme in themes} if themes else store
+
+    with open(path, "w", newline="" if fmt == "csv" else None, encoding="utf-8") as f:
+        if fmt == "json":
+            json.dump(selected, f, indent=2)
+        elif fmt == "csv":
+            writer = csv.DictWriter(f, fieldnames=["theme", "question_text", "correct_answer"])
+            writer.writeheader()
+            for theme, questions in selected.items():
+                for q in questions:
+                    writer.writerow({"theme": theme, "question_text": q["question_text"], "correct_answer": q["correct_answer"]})
+        else:
+            for theme, questions in selected.items():
+                for q in questions:
+                    f.write(json.dumps({"theme": theme, "question_text": q["question_text"], "correct_answer": q["correct_answer"]}) + "\n")
+    return sum(len(questions) for questions in selected.values())
+
+
+def dedupe_store(threshold: float = DEFAULT_SIMILARITY, dry_run: bool = False) -> Counter:
+    """Drops duplicates that runtime generation has let into the cache, keeping the first copy."""
+    store = gemini.get_all_questions_from_file()
+    outcomes = Counter()
+    for theme, questions in store.items():
+        index = QuestionIndex(threshold)
+        kept = []
+        for q in questions:
+            duplicate = index.add(q["question_text"], q["correct_answer"])
+            if duplicate:
+                outcomes[f"{duplicate}_duplicate"] += 1
+            else:
+                kept.append(q)
+        store[theme] = kept
+        outcomes["kept"] += len(kept)
+
+    if (outcomes["exact_duplicate"] or outcomes["near_duplicate"]) and not dry_run:
+        gemini.save_questions_to_file(store)
+    return outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="Add a pack's new questions to the cache")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--theme", help="Theme for every record (overrides the pack's own)")
+    import_parser.add_argument("--format", choices=FORMATS)
+    import_parser.add_argument("--similarity", type=float, default=DEFAULT_SIMILARITY, help="MinHash similarity that counts as a near-duplicate")
+    import_parser.add_argument("--dry-run", action="store_true")
+
+    export_parser = commands.add_parser("export", help="Write cached questions to a pack")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--theme", action="append", dest="themes", help="Repeat to export several themes; default is all")
+    export_parser.add_argument("--format", choices=FORMATS)
+
+    dedupe_parser = commands.add_parser("dedupe", help="Remove duplicates already in the cache")
+    dedupe_parser.add_argument("--similarity", type=float, default=DEFAULT_SIMILARITY)
+    dedupe_parser.add_argument("--dry-run", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "import":
+        outcomes = import_pack(args.path, args.theme, args.format, args.similarity, args.dry_run)
+        print(", ".join(f"{key}: {count}" for key, count in sorted(outcomes.items())) or "Pack was empty.")
+    elif args.command == "export":
+        print(f"Exported {export_pack(args.path, args.themes, args.format)} questions to {args.path}.")
+    else:
+        outcomes = dedupe_store(args.similarity, args.dry_run)
+        print(", ".join(f"{key}: {count}" for key, count in sorted(outcomes.items())))
+
+
+if __name__ == "__main__":
+    main()
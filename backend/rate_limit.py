@@ -0,0 +1,76 @@
+# backend/rate_limit.py
+import os
+from database import redis
+
+# (tokens per second, burst) for each bucket. Buckets live in Redis so that a
+# room's limit holds no matter which worker its sockets landed on.
+CONNECTION_LIMIT = (float(os.getenv("WS_RATE_PER_CONNECTION", "5")), int(os.getenv("WS_BURST_PER_CONNECTION", "10")))
+ROOM_LIMIT = (float(os.getenv("WS_RATE_PER_ROOM", "30")), int(os.getenv("WS_BURST_PER_ROOM", "60")))
+# Spectators draw from their own buckets so a large audience can't starve the players' room budget
+SPECTATOR_LIMIT = (float(os.getenv("WS_RATE_PER_SPECTATOR", "1")), int(os.getenv("WS_BURST_PER_SPECTATOR", "3")))
+AUDIENCE_LIMIT = (float(os.getenv("WS_RATE_PER_AUDIENCE", "2000")), int(os.getenv("WS_BURST_PER_AUDIENCE", "4000")))
+# Message types that can trigger question generation get their own, much tighter, per-room bucket
+MESSAGE_TYPE_LIMITS = {
+    "START_GAME": (1 / 10, 2),
+}
+
+# Checks every bucket first and only consumes from them when all have a token,
+# so a rejected message never drains the room's budget. Uses the server clock.
+_TOKEN_BUCKET_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local levels = {}
+for i = 1, #KEYS do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local burst = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local level = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    level = math.min(burst, level + math.max(0, now - ts) * rate)
+    if level < 1 then
+        return 0
+    end
+    levels[i] = level
+end
+for i = 1, #KEYS do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local burst = tonumber(ARGV[2 * i])
+    redis.call('HSET', KEYS[i], 'tokens', levels[i] - 1, 'ts', now)
+    redis.call('EXPIRE', KEYS[i], math.ceil(burst / rate) + 1)
+end
+return 1
+"""
+
+_token_bucket = redis.register_script(_TOKEN_BUCKET_SCRIPT)
+
+
+async def allow_frame(room_code: str, user_id: int) -> bool:
+    """
+    Takes one token from the connection and room buckets in a single round
+    trip. Charged for every frame before it is parsed, so oversized and
+    malformed frames count too.
+    """
+    return await _consume([
+        (f"ratelimit:{room_code}:user:{user_id}", CONNECTION_LIMIT),
+        (f"ratelimit:{room_code}:room", ROOM_LIMIT),
+    ])
+
+
+async def allow_message_type(room_code: str, message_type: str) -> bool:
+    """Takes a token from the type's own bucket, for the few types that have one."""
+    if message_type not in MESSAGE_TYPE_LIMITS:
+        return True
+    return await _consume([(f"ratelimit:{room_code}:type:{message_type}", MESSAGE_TYPE_LIMITS[message_type])])
+
+
+async def allow_audience_message(room_code: str, spectator_id: str) -> bool:
+    return await _consume([
+        (f"ratelimit:{room_code}:spectator:{spectator_id}", SPECTATOR_LIMIT),
+        (f"ratelimit:{room_code}:audience", AUDIENCE_LIMIT),
+    ])
+
+
+async def _consume(buckets) -> bool:
+    keys = [key for key, _ in buckets]
+    args = [value for _, limit in buckets for value in limit]
+    return bool(await _token_bucket(keys=keys, args=args))
@@ -0,0 +1,185 @@
+# backend/retention.py
+"""
+Moves finished games out of the hot tables.
+
+Each batch locks up to `batch_size` finished games (skipping rows another
+worker already holds), writes one ArchivedGame document per game and deletes
+the game's votes, answers, questions and scores, all in one short transaction.
+
+Run once from backend/ with `python retention.py`, or set
+RETENTION_INTERVAL_SECONDS to run it as a background task in each worker.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from database import SessionLocal
+import crud, models
+
+# Finished games stay hot for a while so late reconnects can still read them
+RETENTION_GRACE_SECONDS = int(os.getenv("RETENTION_GRACE_SECONDS", "3600"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "50"))
+# Pause between batches so archival never holds locks back to back
+RETENTION_BATCH_PAUSE_SECONDS = float(os.getenv("RETENTION_BATCH_PAUSE_SECONDS", "0.1"))
+# 0 disables the in-process background task
+RETENTION_INTERVAL_SECONDS = int(os.getenv("RETENTION_INTERVAL_SECONDS", "0"))
+
+logger = logging.getLogger("bazinga.retention")
+
+
+def build_payloads(games, questions, answers, votes, scores):
+    """One JSON document per game; takes ORM rows or game_store records."""
+    voter_ids_by_answer = defaultdict(list)
+    for vote in votes:
+        voter_ids_by_answer[vote.answer_id].append(vote.voter_id)
+
+    answers_by_question = defaultdict(list)
+    for answer in answers:
+        answers_by_question[answer.question_id].append({
+            "id": answer.id,
+            "player_id": answer.player_id,
+            "text": answer.answer_text,
+            "voter_ids": voter_ids_by_answer[answer.id],
+        })
+
+    questions_by_game = defaultdict(list)
+    for question in questions:
+        questions_by_game[question.game_id].append({
+            "id": question.id,
+            "text": question.question_text,
+            "correct_answer": question.correct_answer_text,
+            "correct_answer_id": question.correct_answer_id,
+            "answers": answers_by_question[question.id],
+        })
+
+    scores_by_game = defaultdict(list)
+    for score in scores:
+        scores_by_game[score.game_id].append({"player_id": score.player_id, "score": score.score})
+
+    return {
+        game.id: json.dumps({"questions": questions_by_game[game.id], "scores": scores_by_game[game.id]}, separators=(",", ":"))
+        for game in games
+    }
+
+
+def archive_batch(db: Session, batch_size: int = RETENTION_BATCH_SIZE, grace_seconds: int = RETENTION_GRACE_SECONDS) -> int:
+    """Archives and deletes one batch of finished games. Returns how many were moved."""
+    cutoff = crud.utcnow() - datetime.timedelta(seconds=grace_seconds)
+    games = (
+        db.query(models.Game)
+        .filter(models.Game.finished_at.isnot(None), models.Game.finished_at < cutoff)
+        .order_by(models.Game.finished_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not games:
+        db.rollback()
+        return 0
+
+    game_ids = [g.id for g in games]
+    questions = db.query(models.Question).filter(models.Question.game_id.in_(game_ids)).all()
+    question_ids = [q.id for q in questions]
+    answers = db.query(models.Answer).filter(models.Answer.question_id.in_(question_ids)).all() if question_ids else []
+    answer_ids = [a.id for a in answers]
+    votes = db.query(models.Vote).filter(models.Vote.answer_id.in_(answer_ids)).all() if answer_ids else []
+    scores = db.query(models.PlayerGameScore).filter(models.PlayerGameScore.game_id.in_(game_ids)).all()
+
+    payloads = build_payloads(games, questions, answers, votes, scores)
+    db.add_all([
+        models.ArchivedGame(
+            game_id=game.id,
+            room_id=game.room_id,
+            theme=game.theme,
+            created_at=game.created_at,
+            finished_at=game.finished_at,
+            payload=payloads[game.id],
+        )
+        for game in games
+    ])
+
+    # Break the circular foreign keys, then delete children before parents
+    db.query(models.Game).filter(models.Game.id.in_(game_ids)).update({models.Game.current_question_id: None}, synchronize_session=False)
+    if question_ids:
+        db.query(models.Question).filter(models.Question.id.in_(question_ids)).update({models.Question.correct_answer_id: None}, synchronize_session=False)
+    if answer_ids:
+        db.query(models.Vote).filter(models.Vote.answer_id.in_(answer_ids)).delete(synchronize_session=False)
+        db.query(models.Answer).filter(models.Answer.id.in_(answer_ids)).delete(synchronize_session=False)
+    if question_ids:
+        db.query(models.Question).filter(models.Question.id.in_(question_ids)).delete(synchronize_session=False)
+    db.query(models.PlayerGameScore).filter(models.PlayerGameScore.game_id.in_(game_ids)).delete(synchronize_session=False)
+    db.query(models.Game).filter(models.Game.id.in_(game_ids)).delete(synchronize_session=False)
+    db.commit()
+    return len(game_ids)
+
+
+def run_retention(batch_size: int = RETENTION_BATCH_SIZE, grace_seconds: int = RETENTION_GRACE_SECONDS, max_batches: int = None) -> int:
+    """Archives batches until none are left (or `max_batches` is reached)."""
+    total = 0
+    batches = 0
+    db = SessionLocal()
+    try:
+        while max_batches is None or batches < max_batches:
+            moved = archive_batch(db, batch_size, grace_seconds)
+            if not moved:
+                break
+            total += moved
+            batches += 1
+            time.sleep(RETENTION_BATCH_PAUSE_SECONDS)
+    finally:
+        db.close()
+    if total:
+        logger.info(f"Archived {total} finished games in {batches} batches.")
+    return total
+
+
+def archive_all(batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """
+    Archives every game, finished or not, without a grace period or pauses.
+    For the startup wipe, when nothing is live: games left unfinished by the
+    last run are closed first so their points reach the archive too.
+    """
+    db = SessionLocal()
+    try:
+        db.query(models.Game).filter(models.Game.finished_at.is_(None)).update({models.Game.finished_at: crud.utcnow()}, synchronize_session=False)
+        db.commit()
+        total = 0
+        # A cutoff one second ahead takes in games stamped just now, whatever the column's precision
+        while moved := archive_batch(db, batch_size, grace_seconds=-1):
+            total += moved
+    finally:
+        db.close()
+    if total:
+        logger.info(f"Archived {total} games before the startup wipe.")
+    return total
+
+
+async def retention_loop(interval_seconds: int = RETENTION_INTERVAL_SECONDS):
+    while True:
+        try:
+            await run_in_threadpool(run_retention)
+        except Exception as e:
+            logger.error(f"Error archiving finished games: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=RETENTION_BATCH_SIZE)
+    parser.add_argument("--grace-seconds", type=int, default=RETENTION_GRACE_SECONDS)
+    parser.add_argument("--max-batches", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    moved = run_retention(args.batch_size, args.grace_seconds, args.max_batches)
+    print(f"Archived {moved} finished games.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# backend/room_lifecycle.py
+"""
+Expires rooms that have had no connected players for ROOM_IDLE_TTL_SECONDS.
+
+Connected sockets keep refreshing a sentinel key, room:{code}:alive, along
+with the TTLs on the room's other Redis keys. When the sentinel expires,
+Redis publishes a keyspace notification and every worker releases what it
+holds for the room (registered with on_release), deletes the room's keys and
+marks the room closed in MySQL. Notifications are fire-and-forget, so a
+periodic sweep also closes rooms whose notification nobody heard, including
+rooms that were created but never connected to.
+"""
+import asyncio
+import inspect
+import logging
+import os
+import time
+from fastapi.concurrency import run_in_threadpool
+from database import SessionLocal, redis, redis_pipeline
+import crud
+import game_state
+import metrics
+import presence
+
+# 0 disables expiry entirely
+ROOM_IDLE_TTL_SECONDS = int(os.getenv("ROOM_IDLE_TTL_SECONDS", str(30 * 60)))
+ROOM_SWEEP_INTERVAL_SECONDS = int(os.getenv("ROOM_SWEEP_INTERVAL_SECONDS", "300"))
+ROOM_SWEEP_BATCH_SIZE = int(os.getenv("ROOM_SWEEP_BATCH_SIZE", "500"))
+
+logger = logging.getLogger("bazinga.room_lifecycle")
+
+
+def expired_events_channel() -> str:
+    """Expirations in this app's Redis db only, so scratch dbs on the same server are left alone."""
+    return f"__keyevent@{redis.connection_pool.connection_kwargs.get('db', 0)}__:expired"
+
+
+def alive_key(room_code: str) -> str:
+    return f"room:{room_code}:alive"
+
+
+def users_key(room_code: str) -> str:
+    return f"room:{room_code}:users"
+
+
+def _room_keys(room_code: str):
+    return [
+        users_key(room_code),
+        presence.presence_key(room_code),
+        presence.resuming_key(room_code),
+        game_state.state_key(room_code),
+        game_state.seen_questions_key(room_code),
+    ]
+
+
+def _room_code_from_alive_key(key: str):
+    if key.startswith("room:") and key.endswith(":alive"):
+        return key[len("room:"):-len(":alive")]
+    return None
+
+
+class RoomLifecycle:
+    def __init__(self, idle_ttl: int = ROOM_IDLE_TTL_SECONDS):
+        self.idle_ttl = idle_ttl
+        # Keep-alives arrive every second per socket; Redis only needs a refresh now and then
+        self.touch_interval = max(idle_ttl / 10, 1)
+        # Last Redis refresh per room this worker has seen activity for
+        self._last_touch: dict[str, float] = {}
+        self._releasers = []
+
+    def on_release(self, release):
+        """Registers `release(room_code)` (sync or async) to drop a worker's in-process state for a room."""
+        self._releasers.append(release)
+
+    def queue_touch(self, pipe, room_code: str):
+        if not self.idle_ttl:
+            return
+        pipe.set(alive_key(room_code), 1, ex=self.idle_ttl)
+        for key in _room_keys(room_code):
+            pipe.expire(key, self.idle_ttl)
+        self._last_touch[room_code] = time.monotonic()
+
+    async def touch(self, room_code: str):
+        """Marks the room active; cheap to call often, Redis is refreshed at most every touch_interval."""
+        if not self.idle_ttl:
+            return
+        last = self._last_touch.get(room_code)
+        if last is not None and time.monotonic() - last < self.touch_interval:
+            return
+        async with redis_pipeline() as pipe:
+            self.queue_touch(pipe, room_code)
+            await pipe.execute()
+
+    async def release(self, room_code: str):
+        """Drops this worker's in-process state for the room."""
+        self._last_touch.pop(room_code, None)
+        for release in self._releasers:
+            try:
+                result = release(room_code)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Error releasing room {room_code}: {e}")
+
+    async def expire_room(self, room_code: str, source: str) -> bool:
+        """
+        Releases and closes an idle room. Every worker runs this for each
+        expiry, so all steps are idempotent; returns whether this call closed
+        the MySQL row.
+        """
+        if await redis.exists(alive_key(room_code)):
+            return False  # Someone reconnected after the key expired
+        await self.release(room_code)
+        await redis.delete(*_room_keys(room_code))
+        db = SessionLocal()
+        try:
+            closed = await run_in_threadpool(crud.close_room, db, room_code)
+        finally:
+            db.close()
+        if closed:
+            metrics.ROOMS_EXPIRED.inc(source=source)
+            logger.info(f"Closed idle room {room_code} ({source}).")
+        return closed
+
+    async def _enable_notifications(self):
+        # Merge rather than overwrite, in case something else already uses notifications
+        try:
+            current = (await redis.config_get("notify-keyspace-events")).get("notify-keyspace-events", "")
+            flags = "".join(sorted(set(current) | {"E", "x"}))
+            if flags != "".join(sorted(set(current))):
+                await redis.config_set("notify-keyspace-events", flags)
+        except Exception as e:
+            logger.warning(f"Could not enable keyspace notifications ({e}); relying on the periodic sweep.")
+
+    async def listen_for_expirations(self):
+        await self._enable_notifications()
+        pubsub = redis.pubsub()
+        channel = expired_events_channel()
+        await pubsub.subscribe(channel)
+        try:
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if not message or message['type'] != 'message':
+                    continue
+                room_code = _room_code_from_alive_key(message['data'])
+                if room_code:
+                    try:
+                        await self.expire_room(room_code, "notification")
+                    except Exception as e:
+                        logger.error(f"Error expiring room {room_code}: {e}")
+        finally:
+            await pubsub.unsubscribe(channel)
+            await pubsub.close()
+
+    async def sweep(self) -> int:
+        """Closes open rooms older than the idle TTL whose sentinel key is gone."""
+        closed = 0
+        after_id = 0
+        cutoff_seconds = self.idle_ttl
+        db = SessionLocal()
+        try:
+            while True:
+                rooms = await run_in_threadpool(crud.get_open_rooms_older_than, db, cutoff_seconds, after_id, ROOM_SWEEP_BATCH_SIZE)
+                if not rooms:
+                    break
+                after_id = rooms[-1][0]
+                async with redis_pipeline() as pipe:
+                    for _, room_code in rooms:
+                        pipe.exists(alive_key(room_code))
+                    alive = await pipe.execute()
+                for (_, room_code), is_alive in zip(rooms, alive):
+                    if not is_alive and await self.expire_room(room_code, "sweep"):
+                        closed += 1
+                db.rollback()  # End the read transaction between batches
+        finally:
+            db.close()
+
+        # Rooms this worker touched whose expiry it never heard about
+        stale = [code for code, last in self._last_touch.items() if time.monotonic() - last > 2 * self.idle_ttl]
+        for room_code in stale:
+            if not await redis.exists(alive_key(room_code)):
+                await self.release(room_code)
+        return closed
+
+    async def sweep_loop(self, interval_seconds: int = ROOM_SWEEP_INTERVAL_SECONDS):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Error sweeping idle rooms: {e}")
+
+
+lifecycle = RoomLifecycle()
+
+metrics.TRACKED_ROOMS.set_function(lambda: len(lifecycle._last_touch))
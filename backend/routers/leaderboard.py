@@ -0,0 +1,33 @@
+# backend/routers/leaderboard.py
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+import leaderboard
+
+router = APIRouter(prefix="/leaderboard", tags=["leaderboard"])
+
+@router.get("/games/{game_id}")
+async def get_game_leaderboard(game_id: int):
+    players = await leaderboard.get_game_players(game_id)
+    if not players:
+        raise HTTPException(status_code=404, detail="Game not found")
+    return jsonable_encoder(players)
+
+@router.get("/games/{game_id}/players/{user_id}")
+async def get_game_rank(game_id: int, user_id: int):
+    result = await leaderboard.get_rank(leaderboard.game_key(game_id), user_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="Player not ranked in this game")
+    rank, score = result
+    return {"user_id": user_id, "rank": rank, "score": score}
+
+@router.get("/themes/{theme}")
+async def get_theme_leaderboard(theme: str, limit: int = Query(10, gt=0, le=100)):
+    return jsonable_encoder(await leaderboard.get_theme_leaders(theme, limit))
+
+@router.get("/themes/{theme}/players/{user_id}")
+async def get_theme_rank(theme: str, user_id: int):
+    result = await leaderboard.get_rank(leaderboard.theme_key(theme), user_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="Player not ranked for this theme")
+    rank, score = result
+    return {"user_id": user_id, "rank": rank, "score": score}
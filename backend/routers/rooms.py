@@ -3,16 +3,47 @@ from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisco
 from fastapi.concurrency import run_in_threadpool
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
-import crud, models, schemas
-from database import SessionLocal, redis
+import crud, schemas
+import game_state
+import game_store
+import audience
+import event_trace
+import leaderboard
+import lobby
+import metadata_cache
+import presence
+import room_lifecycle
+from debounce import RoomDebouncer
+from database import SessionLocal, redis, redis_pipeline
 from websocket import manager as websocket_manager
 from services import gemini
+import metrics
 import json
+import os
 import random
 import asyncio
+from typing import List, Optional
 
 router = APIRouter(prefix="/rooms", tags=["rooms"])
 
+# Joins, leaves and reconnect storms within this window share one player_update
+PLAYER_UPDATE_DEBOUNCE_SECONDS = float(os.getenv("PLAYER_UPDATE_DEBOUNCE_SECONDS", "0.25"))
+# How long advancing waits for a question that is still being generated
+QUESTION_WAIT_TIMEOUT_SECONDS = float(os.getenv("QUESTION_WAIT_TIMEOUT_SECONDS", "30"))
+QUESTION_WAIT_POLL_SECONDS = 0.2
+# How long players see their own vote result before the round summary
+VOTE_RESULTS_DISPLAY_SECONDS = float(os.getenv("VOTE_RESULTS_DISPLAY_SECONDS", "5"))
+QUICKMATCH_ROOM_SIZE = int(os.getenv("QUICKMATCH_ROOM_SIZE", "8"))
+# Tries before giving up when claimed seats keep turning out to be stale
+QUICKMATCH_ATTEMPTS = 3
+# How long a claimed seat waits for its room's creator to commit the room
+QUICKMATCH_JOIN_WAIT_SECONDS = float(os.getenv("QUICKMATCH_JOIN_WAIT_SECONDS", "2"))
+QUICKMATCH_JOIN_POLL_SECONDS = 0.05
+PUBLIC_ROOMS_LIMIT = 50
+
+# Holds references to running question producers so they aren't garbage collected
+_question_producers = set()
+
 def get_db():
     db = SessionLocal()
     try:
@@ -20,76 +51,141 @@ def get_db():
     finally:
         db.close()
 
-async def get_game_state(room_code: str):
-    state = await redis.hgetall(f"game_state:{room_code}")
-    if not state:
-        return None
-    # Deserialize complex types
-    if 'seen_question_texts' in state:
-        state['seen_question_texts'] = set(json.loads(state['seen_question_texts']))
-    if 'current_question_index' in state:
-        state['current_question_index'] = int(state['current_question_index'])
-    if 'game_id' in state:
-        state['game_id'] = int(state['game_id'])
-    return state
-
-async def set_game_state(room_code: str, state: dict):
-    # Serialize complex types
-    if 'seen_question_texts' in state:
-        state['seen_question_texts'] = json.dumps(list(state['seen_question_texts']))
-    await redis.hset(f"game_state:{room_code}", mapping=state)
+async def get_game_state_and_player_count(room_code: str):
+    """Fetches the game state and the number of connected players in one round trip."""
+    async with redis_pipeline() as pipe:
+        game_state.queue_read(pipe, room_code)
+        presence.queue_count(pipe, room_code)
+        state, counts, live_workers, resuming = await pipe.execute()
+    return game_state.parse(state), presence.parse_count(counts, live_workers, resuming)
 
 
 @router.get("/themes")
 def get_game_themes():
     return gemini.get_available_themes()
 
+@router.get("/public", response_model=List[schemas.LobbyRoom])
+async def get_public_rooms(theme: Optional[str] = None):
+    theme = lobby.lobby_theme(theme)
+    rooms = await lobby.open_rooms(theme, PUBLIC_ROOMS_LIMIT)
+    return [schemas.LobbyRoom(room_code=room_code, theme=theme, free_seats=free) for room_code, free in rooms]
+
+def _get_or_create_user(db: Session, user: schemas.UserCreate):
+    return crud.get_user_by_username(db, username=user.username) or crud.create_user(db, user)
+
+# Rooms are serialized in the threadpool so that loading players doesn't block the event loop
+def _create_room(db: Session, room: schemas.GameRoomCreate, owner, room_code: str = None):
+    return schemas.GameRoom.from_orm(crud.create_room(db=db, room=room, owner=owner, room_code=room_code))
+
+def _join_room(db: Session, room_code: str, user):
+    db_room = crud.join_room(db=db, room_code=room_code, user=user)
+    return schemas.GameRoom.from_orm(db_room) if db_room else None
+
 @router.post("/", response_model=schemas.GameRoom)
-def create_game_room(payload: schemas.GameRoomAndUserCreate, db: Session = Depends(get_db)):
+async def create_game_room(payload: schemas.GameRoomAndUserCreate, db: Session = Depends(get_db)):
     room_create = schemas.GameRoomCreate(name=payload.name, max_players=payload.max_players)
-    user_create = payload.user
-    db_user = crud.get_user_by_username(db, username=user_create.username) or crud.create_user(db, user_create)
-    return crud.create_room(db=db, room=room_create, owner=db_user)
+    db_user = await run_in_threadpool(_get_or_create_user, db, payload.user)
+    room = await run_in_threadpool(_create_room, db, room_create, db_user)
+    if payload.public:
+        await lobby.list_room(room.room_code, lobby.lobby_theme(payload.theme), room.max_players - len(room.players))
+    event_trace.record("create_room", room.room_code, user=db_user.id, name=room.name, max_players=room.max_players)
+    return room
+
+@router.post("/quickmatch", response_model=schemas.GameRoom)
+async def quick_match(payload: schemas.QuickMatchRequest, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(_get_or_create_user, db, payload.user)
+    theme = lobby.lobby_theme(payload.theme)
+    for _ in range(QUICKMATCH_ATTEMPTS):
+        room_code, created = await lobby.claim_seat(theme, crud.new_room_code(), QUICKMATCH_ROOM_SIZE)
+        if created:
+            room_create = schemas.GameRoomCreate(name=f"Quick match ({theme})", max_players=QUICKMATCH_ROOM_SIZE)
+            room = await run_in_threadpool(_create_room, db, room_create, db_user, room_code)
+            metrics.QUICKMATCH_CLAIMS.inc(result="created")
+            event_trace.record("create_room", room_code, user=db_user.id, name=room.name, max_players=room.max_players)
+            return room
+
+        room = await _join_claimed_room(db, room_code, db_user)
+        if room:
+            metrics.QUICKMATCH_CLAIMS.inc(result="joined")
+            event_trace.record("join", room_code, user=db_user.id)
+            return room
+        # Closed, full or never created: the listing was stale
+        metrics.QUICKMATCH_CLAIMS.inc(result="stale")
+        await lobby.withdraw(room_code)
+    raise HTTPException(status_code=503, detail="No room available right now. Please try again.")
+
+async def _join_claimed_room(db: Session, room_code: str, user):
+    """Joins the room quick-match found, waiting briefly if its creator hasn't committed it yet."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + QUICKMATCH_JOIN_WAIT_SECONDS
+    while True:
+        room = await run_in_threadpool(_join_room, db, room_code, user)
+        if room is not None or loop.time() >= deadline:
+            return room
+        if await run_in_threadpool(crud.get_room_by_code, db, room_code) is not None:
+            return None  # Full or closed
+        db.rollback()  # A fresh snapshot, so the creator's commit becomes visible
+        await asyncio.sleep(QUICKMATCH_JOIN_POLL_SECONDS)
 
 @router.post("/{room_code}/join", response_model=schemas.GameRoom)
-def join_game_room(room_code: str, user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_username(db, username=user.username) or crud.create_user(db, user)
-    db_room = crud.join_room(db=db, room_code=room_code, user=db_user)
-    if not db_room:
+async def join_game_room(room_code: str, user: schemas.UserCreate, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(_get_or_create_user, db, user)
+    room = await run_in_threadpool(_join_room, db, room_code, db_user)
+    if not room:
         raise HTTPException(status_code=404, detail="Room not found or is full")
-    return db_room
+    await lobby.sync_seats(room_code, room.max_players - len(room.players))
+    event_trace.record("join", room_code, user=db_user.id)
+    return room
 
 @router.post("/{room_code}/next_question/{user_id}")
-async def host_advance_to_next_question(room_code: str, user_id: int, db: Session = Depends(get_db)):
-    db_room = await run_in_threadpool(crud.get_room_by_code, db, room_code)
+async def host_advance_to_next_question(room_code: str, user_id: int, db: Session = Depends(get_db), question_id: Optional[int] = None):
+    # Ownership never changes, so this is usually answered without a query
+    db_room = await metadata_cache.get_room(db, room_code)
     if not db_room:
         raise HTTPException(status_code=404, detail="Room not found")
     
     if db_room.owner_id != user_id:
         raise HTTPException(status_code=403, detail="Only the host can advance the game.")
 
-    await advance_to_next_question(room_code)
+    event_trace.record("next_question", room_code, user=user_id)
+    # question_id is the round the host is looking at, so a repeated click doesn't skip the next one
+    await advance_to_next_question(room_code, question_id)
     return {"message": "Advanced to next question."}
 
-async def broadcast_player_update(db: Session, room_code: str):
+def _player_update_message(players) -> str:
+    return json.dumps({"event": "player_update", "players": jsonable_encoder(players)})
+
+async def build_player_update(db: Session, room_code: str, game_id: int = None):
+    if game_id is None:
+        state = await game_state.get(room_code)
+        game_id = state.game_id if state else None
+    if game_id:
+        # Live scores come from the game's Redis leaderboard, no SQL needed
+        return _player_update_message(await leaderboard.get_game_players(game_id))
+
     db_room = await run_in_threadpool(crud.get_room_by_code, db, room_code)
-    if not db_room: return
-
-    game_state = await get_game_state(room_code)
-    if game_state and game_state.get('game_id'):
-        scores = await run_in_threadpool(crud.get_scores_for_game, db, game_state['game_id'])
-        players = [
-            schemas.Player(id=s.player.id, username=s.player.username, score=s.score)
-            for s in scores
-        ]
-    else:
-        players = [
-            schemas.Player(id=p.id, username=p.username, score=0)
-            for p in db_room.players
-        ]
-    
-    await websocket_manager.broadcast(json.dumps({"event": "player_update", "players": jsonable_encoder(players)}), room_code)
+    if not db_room: return None
+    players = [
+        schemas.Player(id=p.id, username=p.username, score=0)
+        for p in db_room.players
+    ]
+    return _player_update_message(players)
+
+async def broadcast_player_update(db: Session, room_code: str, game_id: int = None):
+    message = await build_player_update(db, room_code, game_id)
+    if message:
+        await websocket_manager.broadcast(message, room_code)
+
+async def _broadcast_player_update_for_room(room_code: str):
+    db = SessionLocal()
+    try:
+        await broadcast_player_update(db, room_code)
+    finally:
+        db.close()
 
+player_updates = RoomDebouncer("player_update", _broadcast_player_update_for_room, PLAYER_UPDATE_DEBOUNCE_SECONDS)
+
+@metrics.timed(metrics.GAME_HANDLER_LATENCY, handler="start_game_logic")
 async def _start_game_logic(room_code: str, config: schemas.StartGameRequest, db: Session):
     db_room = await run_in_threadpool(crud.get_room_by_code, db, room_code)
     if not db_room or len(db_room.players) < 2:
@@ -97,118 +193,176 @@ async def _start_game_logic(room_code: str, config: schemas.StartGameRequest, db
         await websocket_manager.broadcast(json.dumps({"event": "error", "message": "Not enough players to start."}), room_code)
         return
 
-    game_state = await get_game_state(room_code) or {}
-    seen_questions = set(game_state.get('seen_question_texts', []))
+    seen_questions = await game_state.get_seen_questions(room_code)
 
-    questions_data = await run_in_threadpool(
-        gemini.generate_game_questions,
+    # Play starts on the first question; the rest are appended behind the current round
+    question_stream = gemini.stream_game_questions(
         theme=config.theme,
         num_questions=config.num_questions,
         seen_questions=seen_questions
     )
+    with metrics.GAME_START_PHASE_LATENCY.time(phase="question_fetch"):
+        first_data = await run_in_threadpool(next, question_stream, None)
 
-    if not questions_data:
+    if not first_data:
         print(f"Error starting game in room {room_code}: Could not get questions.")
         await websocket_manager.broadcast(json.dumps({"event": "error", "message": "Failed to generate questions for the theme."}), room_code)
         return
 
-    questions = [schemas.QuestionCreate(question_text=q['question_text'], correct_answer_text=q['correct_answer']) for q in questions_data]
-    db_game = await run_in_threadpool(crud.create_game_with_questions, db=db, room_id=db_room.id, theme=config.theme, questions=questions)
-
-    game_state.update({
-        'current_question_index': 0,
-        'game_id': db_game.id,
-    })
-
-    for q in questions_data:
-        seen_questions.add(q['question_text'])
-    game_state['seen_question_texts'] = seen_questions
+    questions = [schemas.QuestionCreate(question_text=first_data['question_text'], correct_answer_text=first_data['correct_answer'])]
+    with metrics.GAME_START_PHASE_LATENCY.time(phase="db_create"):
+        db_game = await game_store.store.create_game(db, db_room, config.theme, questions)
 
-    await set_game_state(room_code, game_state)
+    # Seats in a started game are no use to quick-match
+    await lobby.withdraw(room_code)
 
     first_question = db_game.questions[0]
-    await run_in_threadpool(crud.set_current_question, db, db_game.id, first_question.id)
+    await game_store.store.set_current_question(db, db_game.id, first_question.id)
+    db_game.current_question_id = first_question.id
+
+    more_questions = config.num_questions > 1
+    async with redis_pipeline() as pipe:
+        game_state.queue_start(pipe, room_code, db_game.id, [first_data['question_text']], questions_done=not more_questions)
+        leaderboard.queue_start_game(pipe, db_game.id, db_room.players)
+        websocket_manager.queue_broadcast(pipe, json.dumps({"event": "game_started", "game": jsonable_encoder(schemas.Game.from_orm(db_game))}), room_code)
+        await pipe.execute()
+
+    if more_questions:
+        task = asyncio.create_task(_produce_remaining_questions(room_code, db_game.id, question_stream))
+        _question_producers.add(task)
+        task.add_done_callback(_question_producers.discard)
+    else:
+        await run_in_threadpool(question_stream.close)
 
-    await websocket_manager.broadcast(json.dumps({"event": "game_started", "game": jsonable_encoder(schemas.Game.from_orm(db_game))}), room_code)
     await asyncio.sleep(0.1)
     await websocket_manager.broadcast(json.dumps({"event": "new_question", "question": jsonable_encoder(schemas.Question.from_orm(first_question))}), room_code)
-    await broadcast_player_update(db, room_code)
+    player_updates.schedule(room_code)
 
+async def _produce_remaining_questions(room_code: str, game_id: int, question_stream):
+    """Appends the rest of a streamed question set to a game that is already being played."""
+    db = SessionLocal()
+    try:
+        while True:
+            q = await run_in_threadpool(next, question_stream, None)
+            if q is None:
+                break
+            question = schemas.QuestionCreate(question_text=q['question_text'], correct_answer_text=q['correct_answer'])
+            await game_store.store.add_question(db, game_id, question)
+            if await game_state.add_question(room_code, game_id, q['question_text']) < 0:
+                break  # A new game started in the room
+    except Exception as e:
+        print(f"Error adding questions to game {game_id} in room {room_code}: {e}")
+    finally:
+        await game_state.finish_questions(room_code, game_id)
+        # Closing the stream saves any newly generated questions to the cache
+        await run_in_threadpool(question_stream.close)
+        db.close()
+
+async def _wait_for_question(room_code: str, index: int):
+    """Returns the game state once question `index` exists or no more are coming."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + QUESTION_WAIT_TIMEOUT_SECONDS
+    state = await game_state.get(room_code)
+    while state and index >= state.question_count and not state.questions_done and loop.time() < deadline:
+        await asyncio.sleep(QUESTION_WAIT_POLL_SECONDS)
+        state = await game_state.get(room_code)
+    return state
+
+@metrics.timed(metrics.GAME_HANDLER_LATENCY, handler="handle_answer_submission")
 async def handle_answer_submission(room_code: str):
     db = SessionLocal()
     try:
-        state = await get_game_state(room_code)
+        # Connected players are summed from each live worker's field in room:{code}:presence (see presence.py)
+        state, num_active_players = await get_game_state_and_player_count(room_code)
         if not state: return
 
-        db_game = await run_in_threadpool(db.query(models.Game).filter(models.Game.id == state['game_id']).first)
-        if not db_game or not db_game.current_question_id: return
+        question = await game_store.current_question(db, state)
+        if not question: return
 
-        submitted_answers = await run_in_threadpool(crud.get_answers_for_question, db, db_game.current_question_id)
-        
-        # Get number of active players from Redis pubsub
-        num_active_players_tuple = await redis.pubsub_numsub(f"room:{room_code}")
-        num_active_players = num_active_players_tuple[0][1]
+        submitted_answers = await game_store.store.get_answers(db, question.id)
 
         if len(submitted_answers) == num_active_players:
-            correct_answer_text = db_game.current_question.correct_answer_text
-            db_correct_answer = await run_in_threadpool(
-                crud.create_answer, db, 
-                schemas.AnswerCreate(question_id=db_game.current_question_id, answer_text=correct_answer_text),
-                player_id=None
-            )
-            await run_in_threadpool(crud.set_correct_answer_for_question, db, db_game.current_question_id, db_correct_answer.id)
-
-            all_answers_in_round = await run_in_threadpool(crud.get_answers_for_question, db, db_game.current_question_id)
-            all_options = [schemas.Answer.from_orm(a) for a in all_answers_in_round]
+            db_correct_answer = await game_store.store.create_answer(db, question.id, question.correct_answer_text, player_id=None)
+            await game_store.store.set_correct_answer(db, question.id, db_correct_answer.id)
+
+            all_options = jsonable_encoder([schemas.Answer.from_orm(a) for a in submitted_answers + [db_correct_answer]])
             random.shuffle(all_options)
-            await websocket_manager.broadcast(json.dumps({"event": "start_voting", "answers": jsonable_encoder(all_options)}), room_code)
+            # Each player gets the options without their own answer; spectators get them all
+            user_ids = await redis.smembers(room_lifecycle.users_key(room_code))
+            async with redis_pipeline() as pipe:
+                for user_id in map(int, user_ids):
+                    options = [o for o in all_options if o["player_id"] != user_id]
+                    websocket_manager.queue_send_to_user(pipe, json.dumps({"event": "start_voting", "answers": options}), user_id)
+                audience.hub.queue_publish(pipe, json.dumps({"event": "start_voting", "answers": all_options}), room_code)
+                await pipe.execute()
     finally:
         db.close()
 
-async def advance_to_next_question(room_code: str):
+# A disconnect can complete the round; several leaving at once only need one check
+answer_checks = RoomDebouncer("answer_check", handle_answer_submission, PLAYER_UPDATE_DEBOUNCE_SECONDS)
+
+room_lifecycle.lifecycle.on_release(player_updates.cancel)
+room_lifecycle.lifecycle.on_release(answer_checks.cancel)
+room_lifecycle.lifecycle.on_release(lobby.withdraw)
+
+@metrics.timed(metrics.GAME_HANDLER_LATENCY, handler="advance_to_next_question")
+async def advance_to_next_question(room_code: str, from_question_id: Optional[int] = None):
     db = SessionLocal()
     try:
-        state = await get_game_state(room_code)
+        state = await game_state.get(room_code)
         if not state: return
-        
-        db_game = await run_in_threadpool(db.query(models.Game).filter(models.Game.id == state['game_id']).first)
-        if not db_game: return
-
-        state['current_question_index'] += 1
-        await set_game_state(room_code, state)
-
-        if state['current_question_index'] < len(db_game.questions):
-            next_question = db_game.questions[state['current_question_index']]
-            await run_in_threadpool(crud.set_current_question, db, db_game.id, next_question.id)
+        game_id, current_index = state.game_id, state.current_question_index
+        if current_index >= state.question_count: return  # Already over
+        if from_question_id is not None:
+            current_question = await game_store.current_question(db, state)
+            if not current_question or current_question.id != from_question_id: return  # Already moved on
+            db.close()  # Hand the connection back before a possibly long wait; the session reopens on use
+        next_index = current_index + 1
+
+        # Only waits when the game has overtaken the question producer; the
+        # wait happens before any query so no pool connection is held meanwhile.
+        # The index isn't raised until the question is there to show.
+        state = await _wait_for_question(room_code, next_index)
+        if not state or state.game_id != game_id: return
+
+        if next_index < state.question_count:
+            next_question = await game_store.store.get_question_at(db, game_id, next_index)
+            if not next_question:
+                await websocket_manager.broadcast(json.dumps({"event": "error", "message": "Could not load the next question."}), room_code)
+                return
+            if await game_state.advance_question(room_code, game_id, current_index) < 0: return
+            await game_store.store.set_current_question(db, game_id, next_question.id)
             await websocket_manager.broadcast(json.dumps({"event": "new_question", "question": jsonable_encoder(schemas.Question.from_orm(next_question))}), room_code)
+        elif state.questions_done:
+            if await game_state.advance_question(room_code, game_id, current_index) < 0: return
+            await game_store.store.finish_game(db, game_id)
+            standings = await leaderboard.get_game_players(game_id)
+            await websocket_manager.broadcast(json.dumps({"event": "game_over", "leaderboard": jsonable_encoder(standings)}), room_code)
         else:
-            scores = await run_in_threadpool(crud.get_scores_for_game, db, db_game.id)
-            leaderboard = sorted(
-                [schemas.Player(id=s.player.id, username=s.player.username, score=s.score) for s in scores],
-                key=lambda p: p.score, reverse=True
-            )
-            await websocket_manager.broadcast(json.dumps({"event": "game_over", "leaderboard": jsonable_encoder(leaderboard)}), room_code)
+            # Timed out on a slow producer; the host can try again
+            await websocket_manager.broadcast(json.dumps({"event": "error", "message": "The next question is still being written. Try again in a moment."}), room_code)
     finally:
         db.close()
 
+@metrics.timed(metrics.GAME_HANDLER_LATENCY, handler="handle_vote_submission")
 async def handle_vote_submission(room_code: str):
     db = SessionLocal()
     try:
-        state = await get_game_state(room_code)
+        state, num_active_players = await get_game_state_and_player_count(room_code)
         if not state: return
 
-        game_id = state['game_id']
-        db_game = await run_in_threadpool(db.query(models.Game).filter(models.Game.id == game_id).first)
-        if not db_game: return
+        game_id = state.game_id
+        question = await game_store.current_question(db, state)
+        if not question: return
 
-        db_votes = await run_in_threadpool(db.query(models.Vote).join(models.Answer).filter(models.Answer.question_id == db_game.current_question_id).all)
-        
-        num_active_players_tuple = await redis.pubsub_numsub(f"room:{room_code}")
-        num_active_players = num_active_players_tuple[0][1]
+        db_votes = await game_store.store.get_votes(db, question.id)
 
         if len(db_votes) == num_active_players:
             score_updates = {}
-            correct_answer_id = db_game.current_question.correct_answer_id
+            all_answers_in_round = await game_store.store.get_answers(db, question.id)
+            # The correct answer is the one no player wrote
+            correct_answer_id = next((a.id for a in all_answers_in_round if a.player_id is None), None)
+            answers_by_id = {a.id: a for a in all_answers_in_round}
             
             # Prepare individual vote results for all players
             all_results = {}
@@ -217,25 +371,27 @@ async def handle_vote_submission(room_code: str):
                 user_vote = next((v for v in db_votes if v.voter_id == user_id), None)
                 if not user_vote: continue
 
-                voted_answer = user_vote.answer
+                voted_answer = answers_by_id.get(user_vote.answer_id)
+                if not voted_answer: continue
                 is_correct = (voted_answer.id == correct_answer_id)
                 fooled_by = None
-                if not is_correct and voted_answer.player:
-                    fooled_by = voted_answer.player.username
+                if not is_correct and voted_answer.player_id:
+                    fooled_by = voted_answer.player_name
                 
                 all_results[user_id] = {"is_correct": is_correct, "fooled_by": fooled_by, "text": voted_answer.answer_text}
 
-            # Broadcast all results at once
-            await websocket_manager.broadcast(json.dumps({"event": "all_vote_results", "results": all_results}), room_code)
+            # Each player only receives their own result, all in one round trip
+            async with redis_pipeline() as pipe:
+                for user_id, result in all_results.items():
+                    websocket_manager.queue_send_to_user(pipe, json.dumps({"event": "all_vote_results", "results": {user_id: result}}), user_id)
+                await pipe.execute()
             
             # Wait for players to see their individual result
-            await asyncio.sleep(5)
+            await asyncio.sleep(VOTE_RESULTS_DISPLAY_SECONDS)
 
             results = []
-            all_answers_in_round = await run_in_threadpool(crud.get_answers_for_question, db, db_game.current_question_id)
-            
             for answer in all_answers_in_round:
-                voters = [v.voter.username for v in db_votes if v.answer_id == answer.id]
+                voters = [v.voter_name for v in db_votes if v.answer_id == answer.id]
                 points = 0
                 if answer.id == correct_answer_id:
                     author_name = "Bazinga!"
@@ -243,44 +399,88 @@ async def handle_vote_submission(room_code: str):
                         if v.answer_id == answer.id:
                             score_updates[v.voter_id] = score_updates.get(v.voter_id, 0) + 1
                 else:
-                    author_name = answer.player.username if answer.player else "Unknown"
+                    author_name = answer.player_name or "Unknown"
                     points = 1 * len(voters)
                     if answer.player_id:
                          score_updates[answer.player_id] = score_updates.get(answer.player_id, 0) + points
 
                 results.append({"answer_text": answer.answer_text, "author": author_name, "voters": voters, "points": points})
 
-            if score_updates:
-                await run_in_threadpool(crud.update_scores, db, score_updates, game_id)
-                await broadcast_player_update(db, room_code)
+            audience_votes = await audience.get_votes(room_code, question.id)
 
-            await websocket_manager.broadcast(json.dumps({"event": "round_over", "results": results}), room_code)
+            player_update = None
+            if score_updates:
+                db_game = await game_store.store.get_game(db, game_id)
+                async with redis_pipeline() as pipe:
+                    leaderboard.queue_add_points(pipe, game_id, db_game.theme, score_updates)
+                    leaderboard.queue_read_game(pipe, game_id)
+                    *_, ranking = await pipe.execute()
+                leaderboard.persist_scores_later(score_updates, game_id)
+                player_update = _player_update_message(await leaderboard.get_game_players(game_id, ranking))
+
+            async with redis_pipeline() as pipe:
+                if player_update:
+                    websocket_manager.queue_broadcast(pipe, player_update, room_code)
+                websocket_manager.queue_broadcast(pipe, json.dumps({"event": "round_over", "results": results, "audience_votes": audience_votes}), room_code)
+                await pipe.execute()
             # Host will manually advance to the next question
     finally:
         db.close()
 
 @router.websocket("/ws/{room_code}/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, room_code: str, user_id: int):
-    await websocket_manager.connect(websocket, room_code, user_id)
+async def websocket_endpoint(websocket: WebSocket, room_code: str, user_id: int, resume: Optional[str] = None):
+    if websocket_manager.draining:
+        # 1012 (service restart): the client retries with backoff, keeping its
+        # resume token, until a worker that isn't draining takes it (on a
+        # single-worker deploy, the replacement once it is up)
+        await websocket_manager.refuse(websocket, 1012)
+        return
+    conn = await websocket_manager.connect(websocket, room_code, user_id)
+    event_trace.record("connect", room_code, user=user_id)
     db = SessionLocal()
     try:
-        await redis.sadd(f"room:{room_code}:users", user_id)
-        await broadcast_player_update(db, room_code)
+        # A player handed off by a draining worker never left, so the roster is unchanged
+        resumed = resume is not None and await presence.consume_resume_token(resume, room_code, user_id)
+        if resume is not None:
+            metrics.WS_RESUMES.inc(result="accepted" if resumed else "rejected")
+        async with redis_pipeline() as pipe:
+            pipe.sadd(f"room:{room_code}:users", user_id)
+            game_state.queue_read(pipe, room_code)
+            lobby.queue_theme(pipe, room_code)
+            room_lifecycle.lifecycle.queue_touch(pipe, room_code)
+            _, state, lobby_theme, *_ = await pipe.execute()
+        state = game_state.parse(state)
+        if lobby_theme is not None:
+            # Back in the lobby in case it was hidden while the room sat empty
+            await lobby.relist(room_code, lobby_theme)
+        if not resumed:
+            player_updates.schedule(room_code)
+
+        if state:
+            db_game = await game_store.store.get_game(db, state.game_id, with_questions=True)
+            question = db_game and await game_store.current_question(db, state)
+            if question:
+                game = schemas.Game.from_orm(db_game).model_copy(update={"current_question_id": question.id})
+                websocket_manager.send_personal(conn, json.dumps({"event": "game_started", "game": jsonable_encoder(game)}))
+                websocket_manager.send_personal(conn, json.dumps({"event": "new_question", "question": jsonable_encoder(schemas.Question.from_orm(question))}))
+    except BaseException:
+        await websocket_manager.disconnect(conn)
+        raise
+    finally:
+        db.close()
 
-        game_state = await get_game_state(room_code)
-        if game_state and game_state.get('game_id'):
-            db_game = await run_in_threadpool(db.query(models.Game).filter(models.Game.id == game_state['game_id']).first)
-            if db_game and db_game.current_question_id:
-                current_question = await run_in_threadpool(db.query(models.Question).filter(models.Question.id == db_game.current_question_id).first)
-                
-                await websocket.send_text(json.dumps({"event": "game_started", "game": jsonable_encoder(schemas.Game.from_orm(db_game))}))
-                await websocket.send_text(json.dumps({"event": "new_question", "question": jsonable_encoder(schemas.Question.from_orm(current_question))}))
-        
-        # Keep the connection alive, the manager will handle everything else
-        while True:
-            await asyncio.sleep(1) # Ping or wait to keep the connection open
+    # This coroutine is the socket's reader from here on; the manager cleans up when it returns
+    await websocket_manager.message_receiver(conn)
+
+@router.websocket("/audience/ws/{room_code}")
+async def audience_websocket_endpoint(websocket: WebSocket, room_code: str):
+    # Spectators have no room_players row and never touch MySQL
+    spectator_id, conn = await audience.hub.connect(websocket, room_code)
+    if spectator_id is None:
+        return
+    try:
+        await audience.hub.receive(conn, spectator_id)
     except (WebSocketDisconnect, asyncio.CancelledError):
-        # The manager's disconnect logic will handle cleanup
-        websocket_manager.disconnect(websocket, room_code, user_id)
+        pass
     finally:
-        db.close()
\ No newline at end of file
+        audience.hub.disconnect(room_code, spectator_id)
@@ -1,6 +1,6 @@
 # backend/schemas.py
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, TypeAdapter
+from typing import Annotated, List, Literal, Optional, Union
 import datetime
 
 # --- User Schemas ---
@@ -85,6 +85,18 @@ class GameRoomCreate(GameRoomBase):
 
 class GameRoomAndUserCreate(GameRoomBase):
     user: UserCreate
+    # Public rooms are listed for quick-match until their game starts
+    public: bool = False
+    theme: Optional[str] = Field(default=None, max_length=100)
+
+class QuickMatchRequest(BaseModel):
+    user: UserCreate
+    theme: Optional[str] = Field(default=None, max_length=100)
+
+class LobbyRoom(BaseModel):
+    room_code: str
+    theme: str
+    free_seats: int
 
 
 class GameRoom(GameRoomBase):
@@ -99,6 +111,59 @@ class GameRoom(GameRoomBase):
 
 # --- Start Game Schema ---
 class StartGameRequest(BaseModel):
-    theme: str
+    theme: str = Field(min_length=1, max_length=100)
     num_questions: int = Field(gt=0, le=20)
 
+# --- WebSocket Client Message Schemas ---
+# Validated before any DB session or game logic runs; unknown fields are rejected.
+class SubmitAnswerPayload(BaseModel):
+    question_id: int
+    answer_text: str = Field(min_length=1, max_length=200)
+
+    class Config:
+        extra = "forbid"
+
+class SubmitVotePayload(BaseModel):
+    answer_id: int
+
+    class Config:
+        extra = "forbid"
+
+class StartGameMessage(BaseModel):
+    type: Literal["START_GAME"]
+    payload: StartGameRequest
+
+    class Config:
+        extra = "forbid"
+
+class SubmitAnswerMessage(BaseModel):
+    type: Literal["SUBMIT_ANSWER"]
+    payload: SubmitAnswerPayload
+
+    class Config:
+        extra = "forbid"
+
+class SubmitVoteMessage(BaseModel):
+    type: Literal["SUBMIT_VOTE"]
+    payload: SubmitVotePayload
+
+    class Config:
+        extra = "forbid"
+
+ClientMessage = TypeAdapter(
+    Annotated[Union[StartGameMessage, SubmitAnswerMessage, SubmitVoteMessage], Field(discriminator="type")]
+)
+
+class AudienceVotePayload(BaseModel):
+    question_id: int
+    answer_id: int
+
+    class Config:
+        extra = "forbid"
+
+class AudienceVoteMessage(BaseModel):
+    type: Literal["AUDIENCE_VOTE"]
+    payload: AudienceVotePayload
+
+    class Config:
+        extra = "forbid"
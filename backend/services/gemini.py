@@ -1,19 +1,16 @@
 # backend/services/gemini.py
 import json
 import random
+import re
 import os
-import google.generativeai as genai
+import functools
 from dotenv import load_dotenv
 import logging
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from services.question_dedup import QuestionIndex, question_hash
 
 # --- Configuration ---
 load_dotenv()
 API_KEY = os.getenv("GEMINI_API_KEY")
-if API_KEY:
-    genai.configure(api_key=API_KEY)
 
 DIR_PATH = os.path.dirname(os.path.realpath(__file__))
 QUESTIONS_FILE_PATH = os.path.join(DIR_PATH, 'questions.json')
@@ -27,6 +24,17 @@ GENERATION_CONFIG = {
 
 # --- Helper Functions ---
 
+@functools.lru_cache(maxsize=1)
+def get_genai():
+    """
+    Imports and configures the Gemini SDK on first use. The SDK pulls in grpc
+    and protobuf, so importing it lazily keeps worker boot fast when the
+    question cache can serve the game.
+    """
+    import google.generativeai as genai
+    genai.configure(api_key=API_KEY)
+    return genai
+
 def get_all_questions_from_file():
     """Reads and returns all questions from the local JSON file."""
     try:
@@ -44,18 +52,8 @@ def save_questions_to_file(questions_data):
         json.dump(questions_data, f, indent=2)
     logging.info(f"Saved questions to {QUESTIONS_FILE_PATH}. Themes saved: {questions_data.keys()}")
 
-def generate_questions_from_api(theme: str, num_to_generate: int):
-    """Generates new questions for a theme using the Gemini API."""
-    if not API_KEY:
-        logging.warning("GEMINI_API_KEY not found. Cannot generate new questions.")
-        return []
-
-    model = genai.GenerativeModel(
-        model_name="gemini-1.5-flash",
-        generation_config=GENERATION_CONFIG,
-    )
-    
-    prompt = f"""
+def _build_prompt(theme: str, num_to_generate: int) -> str:
+    return f"""
     Generate {num_to_generate} trivia questions for the theme "{theme}".
 
     For each question, provide:
@@ -73,22 +71,73 @@ def generate_questions_from_api(theme: str, num_to_generate: int):
 
     Return the result as a JSON object with a single key "{theme}" which is a list of the generated question objects.
     """
-    
+
+# The value of the top-level theme key, not a bracket inside the theme name
+_LIST_START = re.compile(r'":\s*\[')
+
+def _iter_streamed_questions(chunks):
+    """
+    Yields each question object of a streamed '{"<theme>": [{...}, ...]}'
+    response as soon as its closing brace has arrived, without waiting for
+    the rest of the document.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = None  # Just past the list's opening bracket, once it has arrived
+    for chunk in chunks:
+        buffer += chunk
+        if pos is None:
+            list_start = _LIST_START.search(buffer)
+            if not list_start:
+                continue
+            pos = list_start.end()
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if buffer[pos] == "]":
+                return
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # The object isn't complete yet
+            if isinstance(item, dict) and item.get('question_text') and item.get('correct_answer'):
+                yield item
+
+def stream_questions_from_api(theme: str, num_to_generate: int):
+    """Generates new questions for a theme using the Gemini API, yielding each one as it streams in."""
+    if not API_KEY:
+        logging.warning("GEMINI_API_KEY not found. Cannot generate new questions.")
+        return
+
+    genai = get_genai()
+    model = genai.GenerativeModel(
+        model_name="gemini-1.5-flash",
+        generation_config=GENERATION_CONFIG,
+    )
+
+    generated = 0
     try:
-        response = model.generate_content(prompt)
-        new_questions = json.loads(response.text)
-        logging.info(f"Successfully generated {len(new_questions.get(theme, []))} questions for theme '{theme}' from API.")
-        return new_questions.get(theme, [])
+        response = model.generate_content(_build_prompt(theme, num_to_generate), stream=True)
+        for question in _iter_streamed_questions(chunk.text for chunk in response):
+            generated += 1
+            yield question
+            if generated >= num_to_generate:
+                break
     except Exception as e:
         logging.error(f"Error generating questions from Gemini API: {e}")
-        return []
+    logging.info(f"Generated {generated} questions for theme '{theme}' from API.")
 
 # --- Main Service Functions ---
 
-def generate_game_questions(theme: str, num_questions: int, seen_questions: set = None):
+def stream_game_questions(theme: str, num_questions: int, seen_questions: set = None):
     """
-    Generates a list of questions for a given theme, using a hybrid approach
-    that avoids repeating questions from the 'seen_questions' set.
+    Yields up to `num_questions` questions for a theme, avoiding the ones in
+    'seen_questions'. Cached questions come first; any shortfall is streamed
+    from the API one question at a time, so callers can start a game on the
+    first item. Newly generated questions are saved to the cache even if the
+    caller stops early.
     """
     if seen_questions is None:
         seen_questions = set()
@@ -97,41 +146,56 @@ def generate_game_questions(theme: str, num_questions: int, seen_questions: set
     theme_questions = all_questions_on_disk.get(theme, [])
     logging.info(f"Questions on disk for theme '{theme}': {len(theme_questions)}")
 
-    # Filter out questions that have already been seen in this session
+    # Filter out questions that have already been seen in this session,
+    # ignoring differences in case, punctuation and spacing
+    seen_hashes = {question_hash(text) for text in seen_questions}
     unseen_questions = [
-        q for q in theme_questions if q['question_text'] not in seen_questions
+        q for q in theme_questions if question_hash(q['question_text']) not in seen_hashes
     ]
     logging.info(f"Unseen questions for theme '{theme}': {len(unseen_questions)}")
 
+    selected_questions = random.sample(unseen_questions, min(num_questions, len(unseen_questions)))
+    for q in selected_questions:
+        yield {'question_text': q['question_text'], 'correct_answer': q['correct_answer']}
+
     # If we don't have enough unseen questions, generate more from the API
-    if len(unseen_questions) < num_questions:
-        num_to_generate = num_questions - len(unseen_questions)
-        logging.info(f"Cache miss for theme '{theme}'. Generating {num_to_generate} new unique question(s).")
-        
-        newly_generated_questions = generate_questions_from_api(theme, num_to_generate)
-        
+    num_to_generate = num_questions - len(selected_questions)
+    if num_to_generate <= 0:
+        return
+    logging.info(f"Cache miss for theme '{theme}'. Generating {num_to_generate} new unique question(s).")
+
+    # Generated questions that restate a cached or seen one, reworded or not,
+    # are dropped. Seen texts whose answer isn't cached only match exactly.
+    known_questions = QuestionIndex()
+    for q in theme_questions:
+        known_questions.add(q['question_text'], q['correct_answer'])
+    for text in seen_questions:
+        known_questions.add(text)
+    newly_generated_questions = []
+    try:
+        for q in stream_questions_from_api(theme, num_to_generate):
+            duplicate = known_questions.add(q['question_text'], q['correct_answer'])
+            if duplicate:
+                logging.info(f"Dropped a generated question for theme '{theme}' ({duplicate} duplicate): {q['question_text']}")
+                continue
+            newly_generated_questions.append(q)
+            yield {'question_text': q['question_text'], 'correct_answer': q['correct_answer']}
+    finally:
         if newly_generated_questions:
-            # Add the newly generated questions to our unseen pool
-            unseen_questions.extend(newly_generated_questions)
-            logging.info(f"Added {len(newly_generated_questions)} newly generated questions to unseen pool.")
-            
-            # Also add them to the main list for this theme and save back to the file
             # This ensures our cache grows with new, unique questions
             all_questions_on_disk[theme] = theme_questions + newly_generated_questions
             save_questions_to_file(all_questions_on_disk)
 
-    if not unseen_questions:
+def generate_game_questions(theme: str, num_questions: int, seen_questions: set = None):
+    """
+    Generates a list of questions for a given theme, using a hybrid approach
+    that avoids repeating questions from the 'seen_questions' set.
+    """
+    questions = list(stream_game_questions(theme, num_questions, seen_questions))
+    if not questions:
         logging.warning(f"No unseen questions available for theme '{theme}' after generation attempt.")
         return None
-        
-    num_to_select = min(num_questions, len(unseen_questions))
-    selected_questions = random.sample(unseen_questions, num_to_select)
-    logging.info(f"Selected {len(selected_questions)} questions for theme '{theme}'.")
-    
-    return [
-        {'question_text': q['question_text'], 'correct_answer': q['correct_answer']}
-        for q in selected_questions
-    ]
+    return questions
 
 def get_available_themes():
     """
@@ -0,0 +1,101 @@
+# backend/services/question_dedup.py
+"""
+Duplicate detection for trivia questions.
+
+Exact duplicates are caught by hashing a normalized form of the text (case,
+punctuation and whitespace folded). Near-duplicates, such as the same
+question reworded by the LLM, are caught with MinHash signatures over
+character shingles, bucketed with LSH so each lookup only compares against
+questions that share at least one band. A near-duplicate must also have the
+same normalized answer, which keeps templated questions ("the largest
+ocean" / "the largest lake") apart.
+"""
+import hashlib
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Optional
+
+SHINGLE_SIZE = 4
+NUM_PERMUTATIONS = 128
+# 32 bands of 4 rows: pairs around 0.4 Jaccard already collide in most bands,
+# so the similarity check below, not the banding, decides near-duplicates
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+DEFAULT_SIMILARITY = 0.5
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def question_hash(text: str) -> str:
+    return hashlib.sha1(normalize(text).encode()).hexdigest()
+
+
+def _shingles(normalized: str) -> set:
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def minhash(normalized: str) -> tuple:
+    # One SHAKE digest per shingle supplies all NUM_PERMUTATIONS 32-bit hash
+    # values at once, so the per-permutation minimum runs in C via zip/min
+    hashes = [
+        memoryview(hashlib.shake_128(s.encode()).digest(4 * NUM_PERMUTATIONS)).cast("I")
+        for s in _shingles(normalized)
+    ]
+    return tuple(map(min, zip(*hashes)))
+
+
+def similarity(signature_a: tuple, signature_b: tuple) -> float:
+    """Estimated Jaccard similarity of the two shingle sets."""
+    return sum(x == y for x, y in zip(signature_a, signature_b)) / NUM_PERMUTATIONS
+
+
+class QuestionIndex:
+    """Set of questions that rejects exact and near-duplicate additions."""
+
+    def __init__(self, threshold: float = DEFAULT_SIMILARITY):
+        self.threshold = threshold
+        self._hashes = set()
+        self._signatures = []
+        self._answers = []
+        self._buckets = defaultdict(list)
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def add(self, question_text: str, correct_answer: str = "") -> Optional[str]:
+        """
+        Indexes the question unless it duplicates one already indexed.
+        Returns None when added, otherwise "exact" or "near".
+        """
+        normalized = normalize(question_text)
+        answer = normalize(correct_answer)
+        digest = hashlib.sha1(normalized.encode()).hexdigest()
+        if digest in self._hashes:
+            return "exact"
+
+        signature = minhash(normalized)
+        bands = [
+            (band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS])
+            for band in range(LSH_BANDS)
+        ]
+        candidates = {i for band in bands for i in self._buckets.get(band, ())}
+        if any(
+            self._answers[i] == answer and similarity(signature, self._signatures[i]) >= self.threshold
+            for i in candidates
+        ):
+            return "near"
+
+        self._hashes.add(digest)
+        self._signatures.append(signature)
+        self._answers.append(answer)
+        for band in bands:
+            self._buckets[band].append(len(self._signatures) - 1)
+        return None
@@ -0,0 +1,53 @@
+# backend/tests/conftest.py
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+# Tests never touch the app's own databases: SQLite scratch file and Redis db 15
+# unless TEST_DATABASE_URL / TEST_REDIS_URL say otherwise
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bazinga_tests.sqlite3')}")
+os.environ["REDIS_URL"] = os.getenv("TEST_REDIS_URL", "redis://localhost:6379/15")
+
+from database import SessionLocal, engine, redis  # noqa: E402
+import metadata_cache  # noqa: E402
+import models  # noqa: E402
+import query_profiler  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    metadata_cache.clear()  # Ids start over with the tables
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Pins a block's query count: `with query_budget("vote results", 3): ...`
+    fails the test with the emitted statements if the block runs more.
+    """
+    query_profiler.install(engine)
+    return query_profiler.query_budget
+
+
+@pytest.fixture
+def run():
+    """Runs a coroutine on its own event loop; the Redis pool's connections don't outlive it."""
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await redis.connection_pool.disconnect()
+        return asyncio.run(main())
+    return run
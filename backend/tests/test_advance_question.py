@@ -0,0 +1,92 @@
+# backend/tests/test_advance_question.py
+import asyncio
+import json
+
+import pytest
+
+from routers import rooms
+import crud, schemas
+import game_state
+from database import redis, redis_pipeline
+
+ROOM = "ADV001"
+
+
+def question(n):
+    return schemas.QuestionCreate(question_text=f"Question {n}?", correct_answer_text=f"Answer {n}")
+
+
+@pytest.fixture
+def game(db, monkeypatch):
+    """A game whose first question is out and whose producer is still writing the rest."""
+    host = crud.create_user(db, schemas.UserCreate(username="host", password="x"))
+    room = crud.create_room(db, schemas.GameRoomCreate(name="advance", max_players=4), host)
+    game_id = crud.create_game_with_questions(db, room_id=room.id, theme="science", questions=[question(0)]).id
+
+    events = []
+
+    async def broadcast(message, room_code):
+        events.append(json.loads(message)["event"])
+
+    monkeypatch.setattr(rooms.websocket_manager, "broadcast", broadcast)
+    monkeypatch.setattr(rooms, "QUESTION_WAIT_TIMEOUT_SECONDS", 0.3)
+    monkeypatch.setattr(rooms, "QUESTION_WAIT_POLL_SECONDS", 0.05)
+    return game_id, events
+
+
+async def start(game_id):
+    await redis.delete(game_state.state_key(ROOM), game_state.seen_questions_key(ROOM))
+    async with redis_pipeline() as pipe:
+        game_state.queue_start(pipe, ROOM, game_id, [question(0).question_text], questions_done=False)
+        await pipe.execute()
+
+
+async def produce(db, game_id, n):
+    crud.add_question(db, game_id, question(n))
+    await game_state.add_question(ROOM, game_id, question(n).question_text)
+
+
+def test_slow_producer_keeps_the_game_going(db, game, run):
+    game_id, events = game
+
+    async def play():
+        await start(game_id)
+        # Nothing new within the wait: the round stays put and the host is told
+        await rooms.advance_to_next_question(ROOM)
+        assert events == ["error"]
+        assert (await game_state.get(ROOM)).current_question_index == 0
+
+        # The question arrives while the host waits on it
+        advance = asyncio.create_task(rooms.advance_to_next_question(ROOM))
+        await asyncio.sleep(0.1)
+        await produce(db, game_id, 1)
+        await advance
+        assert events == ["error", "new_question"]
+        assert (await game_state.get(ROOM)).current_question_index == 1
+
+        await game_state.finish_questions(ROOM, game_id)
+        await rooms.advance_to_next_question(ROOM)
+        assert events == ["error", "new_question", "game_over"]
+
+        # Clicking on after the end doesn't finish the game twice
+        await rooms.advance_to_next_question(ROOM)
+        assert events == ["error", "new_question", "game_over"]
+
+    run(play())
+
+
+def test_double_click_advances_once(db, game, run):
+    game_id, events = game
+    first_question_id = crud.get_question_at(db, game_id, 0).id
+
+    async def play():
+        await start(game_id)
+        await produce(db, game_id, 1)
+        await produce(db, game_id, 2)
+        # Both clicks were made on the first question, however far apart they land
+        await asyncio.gather(*(rooms.advance_to_next_question(ROOM, first_question_id) for _ in range(2)))
+        await rooms.advance_to_next_question(ROOM, first_question_id)
+        assert events == ["new_question"]
+        assert (await game_state.get(ROOM)).current_question_index == 1
+
+    run(play())
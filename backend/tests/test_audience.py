@@ -0,0 +1,79 @@
+# backend/tests/test_audience.py
+import json
+
+from fastapi import WebSocketDisconnect
+
+from routers import rooms  # noqa: F401  (import order: rooms -> websocket -> audience)
+import audience
+from database import redis
+
+
+def open_round(hub, room_code, question_id, answer_ids):
+    hub._buffer(room_code, json.dumps({"event": "new_question", "question": {"id": question_id}}))
+    hub._buffer(room_code, json.dumps({"event": "start_voting", "answers": [{"id": a} for a in answer_ids]}))
+
+
+def test_votes_only_for_the_open_round_and_its_options():
+    hub = audience.AudienceHub()
+    assert not hub.accepts_vote("ROOM01", 7, 70)
+
+    open_round(hub, "ROOM01", 7, [70, 71, 72])
+    assert hub.accepts_vote("ROOM01", 7, 71)
+    assert not hub.accepts_vote("ROOM01", 7, 99)
+    assert not hub.accepts_vote("ROOM01", 6, 70)
+    assert not hub.accepts_vote("ROOM02", 7, 70)
+
+    hub._buffer("ROOM01", json.dumps({"event": "round_over", "results": []}))
+    assert not hub.accepts_vote("ROOM01", 7, 71)
+
+    # Options of the last round don't carry over into the next question
+    open_round(hub, "ROOM01", 7, [70])
+    hub._buffer("ROOM01", json.dumps({"event": "new_question", "question": {"id": 8}}))
+    assert not hub.accepts_vote("ROOM01", 8, 70)
+
+
+class VotingSocket:
+    """A spectator that sends its frames, then leaves."""
+    scope = {"subprotocols": []}
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, data):
+        pass
+
+    async def receive_text(self):
+        if not self.frames:
+            raise WebSocketDisconnect()
+        return self.frames.pop(0)
+
+
+def vote(question_id, answer_id):
+    return json.dumps({"type": "AUDIENCE_VOTE", "payload": {"question_id": question_id, "answer_id": answer_id}})
+
+
+def test_votes_are_keyed_on_the_server_issued_connection_id(run):
+    room_code = "AUDV01"
+
+    async def spectate():
+        hub = audience.AudienceHub()
+        await redis.delete(audience.voters_key(room_code, 7), audience.votes_key(room_code, 7), f"ratelimit:{room_code}:audience")
+        sockets = [VotingSocket([vote(7, 70), vote(7, 71), vote(7, 70)]), VotingSocket([vote(7, 71)])]
+        spectators = [await hub.connect(sock, room_code) for sock in sockets]
+        open_round(hub, room_code, 7, [70, 71])
+        # Repeat votes on one socket count once; a second socket is a second voter
+        for spectator_id, conn in spectators:
+            try:
+                await hub.receive(conn, spectator_id)
+            except WebSocketDisconnect:
+                pass
+        for spectator_id, _ in spectators:
+            hub.disconnect(room_code, spectator_id)
+        return await audience.get_votes(room_code, 7), await redis.smembers(audience.voters_key(room_code, 7))
+
+    votes, voters = run(spectate())
+    assert votes == {"70": 1, "71": 1}
+    assert len(voters) == 2 and all(len(v) == 12 for v in voters)
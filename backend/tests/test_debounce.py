@@ -0,0 +1,116 @@
+# backend/tests/test_debounce.py
+import asyncio
+import json
+
+from fastapi import WebSocketDisconnect
+
+import crud, schemas
+from debounce import RoomDebouncer
+from routers import rooms
+import game_state
+import room_lifecycle
+import websocket
+from database import redis
+
+STORM = 200
+RECONNECTS = 5
+
+
+def test_storm_in_one_window_runs_action_once():
+    calls = []
+
+    async def action(room_code):
+        calls.append(room_code)
+
+    async def storm():
+        debouncer = RoomDebouncer("test", action, window=0.05)
+        for _ in range(STORM):
+            debouncer.schedule("ROOM01")
+        debouncer.schedule("ROOM02")
+        await asyncio.sleep(0.15)
+
+    asyncio.run(storm())
+    assert sorted(calls) == ["ROOM01", "ROOM02"]
+
+
+def test_schedule_during_action_opens_a_new_window():
+    calls = []
+
+    async def storm():
+        async def action(room_code):
+            calls.append(room_code)
+            if len(calls) == 1:
+                debouncer.schedule(room_code)  # A change landing while the update is being built
+
+        debouncer = RoomDebouncer("test", action, window=0.05)
+        debouncer.schedule("ROOM01")
+        await asyncio.sleep(0.25)
+
+    asyncio.run(storm())
+    assert calls == ["ROOM01", "ROOM01"]
+
+
+class FakeSocket:
+    """A client that stays until hung up, keeping the events it was sent."""
+    scope = {"subprotocols": []}
+
+    def __init__(self):
+        self.events = []
+        self.hung_up = asyncio.Event()
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, data):
+        self.events.append(json.loads(data)["event"])
+
+    async def receive_text(self):
+        await self.hung_up.wait()
+        raise WebSocketDisconnect()
+
+    async def close(self, code=1000):
+        self.hung_up.set()
+
+
+async def settle(room_code):
+    """Waits out the room's pending player_update and its trip through Redis to the sockets."""
+    await rooms.player_updates.wait(room_code)
+    await asyncio.sleep(0.2)
+
+
+def test_reconnect_storm_sends_one_player_update(db, query_budget, run, monkeypatch):
+    host = crud.create_user(db, schemas.UserCreate(username="host", password="x"))
+    room_code = crud.create_room(db, schemas.GameRoomCreate(name="storm", max_players=8), host).room_code
+    players = [crud.create_user(db, schemas.UserCreate(username=f"player-{i}", password="x")) for i in range(7)]
+    for player in players:
+        crud.join_room(db, room_code, player)
+    host_id, players = host.id, [p.id for p in players]
+
+    # A manager of its own, so its subscription lives and dies with this test's loop
+    monkeypatch.setattr(rooms, "websocket_manager", websocket.ConnectionManager())
+    monkeypatch.setattr(rooms.player_updates, "window", 1.0)
+
+    async def storm():
+        await redis.delete(game_state.state_key(room_code), room_lifecycle.users_key(room_code))
+        watcher = FakeSocket()
+        watching = asyncio.create_task(rooms.websocket_endpoint(watcher, room_code, host_id))
+        await settle(room_code)
+        watcher.events.clear()
+
+        # Every player drops and comes back a few times inside one window
+        for _ in range(RECONNECTS):
+            sockets = [FakeSocket() for _ in players]
+            sessions = [asyncio.create_task(rooms.websocket_endpoint(sock, room_code, user_id)) for sock, user_id in zip(sockets, players)]
+            await asyncio.sleep(0)
+            for sock in sockets:
+                sock.hung_up.set()
+            await asyncio.gather(*sessions)
+
+        # One player_update costs the room and its players, however many reconnects asked for it
+        with query_budget("reconnect storm", 2):
+            await settle(room_code)
+        watcher.hung_up.set()
+        await watching
+        return watcher.events
+
+    assert run(storm()) == ["player_update"]
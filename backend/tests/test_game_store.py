@@ -0,0 +1,96 @@
+# backend/tests/test_game_store.py
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import models, schemas
+import leaderboard
+from database import redis
+from game_store import GameStore, RedisGameStore
+
+
+def test_redis_store_game_ids_start_above_mysql(db, run):
+    # Left by the SQL store, or by this store before Redis was flushed
+    db.add(models.Game(id=7, theme="science"))
+    db.add(models.ArchivedGame(game_id=41, theme="science", payload="{}"))
+    db.commit()
+    room = SimpleNamespace(id=1, players=[])
+
+    async def create_games():
+        await redis.delete(RedisGameStore.IDS_KEY)
+        store = RedisGameStore(snapshot=False)
+        try:
+            first = await store.create_game(None, room, "science", [])
+            second = await store.create_game(None, room, "science", [])
+            return first.id, second.id
+        finally:
+            await redis.delete(RedisGameStore.IDS_KEY, *(store.game_key(i) for i in (42, 43)))
+
+    assert run(create_games()) == (42, 43)
+
+
+def test_game_store_is_an_interface():
+    with pytest.raises(TypeError, match="abstract"):
+        GameStore()
+
+
+async def clear_store():
+    keys = [key async for key in redis.scan_iter(match="store:*")]
+    if keys:
+        await redis.delete(*keys)
+
+
+def test_redis_store_plays_and_archives_a_round(db, run):
+    alice, bob = SimpleNamespace(id=1, username="alice"), SimpleNamespace(id=2, username="bob")
+    room = SimpleNamespace(id=5, players=[alice, bob])
+    questions = [schemas.QuestionCreate(question_text=f"Question {n}?", correct_answer_text=f"Answer {n}") for n in range(2)]
+
+    async def play():
+        await clear_store()
+        store = RedisGameStore(snapshot=False)
+        try:
+            game = await store.create_game(None, room, "science", questions)
+            first = await store.get_question_at(None, game.id, 0)
+            assert first.question_text == "Question 0?" and await store.get_question_at(None, game.id, 2) is None
+            await store.set_current_question(None, game.id, first.id)
+            assert (await store.get_game(None, game.id)).current_question == first
+
+            lie = await store.create_answer(None, first.id, "A lie", alice.id)
+            truth = await store.create_answer(None, first.id, "Answer 0", None)
+            await store.set_correct_answer(None, first.id, truth.id)
+            assert (await store.get_question(None, first.id)).correct_answer_id == truth.id
+            assert [(a.answer_text, a.player_name) for a in await store.get_answers(None, first.id)] == [("A lie", "alice"), ("Answer 0", None)]
+
+            await store.create_vote(None, lie.id, bob.id)
+            await store.create_vote(None, truth.id, alice.id)
+            assert await store.create_vote(None, 10**9, bob.id) is None  # No such answer
+            assert [(v.answer_id, v.voter_name) for v in await store.get_votes(None, first.id)] == [(lie.id, "bob"), (truth.id, "alice")]
+
+            await store.add_scores(None, game.id, {alice.id: 1})
+            await store.add_scores(None, game.id, {alice.id: 1, bob.id: 2})
+            assert sorted((s.username, s.score) for s in await store.get_scores(None, game.id)) == [("alice", 2), ("bob", 2)]
+
+            # Only the first finish counts
+            await store.finish_game(None, game.id)
+            finished_at = await redis.hget(store.game_key(game.id), "finished_at")
+            await store.finish_game(None, game.id)
+            assert (await store.get_game(None, game.id)).finished
+            assert await redis.hget(store.game_key(game.id), "finished_at") == finished_at
+
+            await store._snapshot(game.id)
+            return game.id, first.id, truth.id
+        finally:
+            await clear_store()
+
+    game_id, question_id, truth_id = run(play())
+    archived = db.query(models.ArchivedGame).filter_by(game_id=game_id).one()
+    assert (archived.room_id, archived.theme) == (5, "science")
+    assert archived.created_at <= archived.finished_at
+    payload = json.loads(archived.payload)
+    assert sorted((s["player_id"], s["score"]) for s in payload["scores"]) == [(1, 2), (2, 2)]
+    first = next(q for q in payload["questions"] if q["id"] == question_id)
+    assert [(a["text"], a["voter_ids"]) for a in first["answers"]] == [("A lie", [2]), ("Answer 0", [1])]
+    assert first["correct_answer_id"] == truth_id
+    # The theme leaderboards are rebuilt from exactly these documents
+    assert leaderboard.theme_totals(db) == {"science": {1: 2, 2: 2}}
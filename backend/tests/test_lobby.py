@@ -0,0 +1,75 @@
+# backend/tests/test_lobby.py
+import asyncio
+import collections
+
+import pytest
+
+from routers import rooms
+from database import redis
+import crud, schemas
+import lobby
+
+THEME = "test-theme"
+
+
+@pytest.fixture(autouse=True)
+def clean_lobby(run):
+    async def clear():
+        await redis.delete(lobby.ROOMS_KEY, lobby.SEATS_KEY, lobby.listing_key(THEME))
+    run(clear())
+    yield
+    run(clear())
+
+
+def test_concurrent_claims_fill_rooms_without_overbooking(run):
+    async def burst():
+        return await asyncio.gather(*(lobby.claim_seat(THEME, crud.new_room_code(), 8) for _ in range(50)))
+
+    results = run(burst())
+    seats = collections.Counter(room_code for room_code, _ in results)
+    assert max(seats.values()) <= 8
+    assert sum(created for _, created in results) == len(seats) == 7  # ceil(50 / 8)
+    assert sorted(seats.values()) == [2, 8, 8, 8, 8, 8, 8]
+
+
+def test_sync_seats_only_lowers_and_delists_full_rooms(run):
+    async def sync():
+        await lobby.list_room("ROOM01", THEME, 5)
+        await lobby.sync_seats("ROOM01", 7)  # A stale MySQL count never hands seats back
+        after_raise = await lobby.open_rooms(THEME, 10)
+        await lobby.sync_seats("ROOM01", 2)
+        after_join = await lobby.open_rooms(THEME, 10)
+        await lobby.sync_seats("ROOM01", 0)
+        after_full = await lobby.open_rooms(THEME, 10)
+        await lobby.sync_seats("NOTLISTED", 3)
+        return after_raise, after_join, after_full, await redis.hget(lobby.SEATS_KEY, "NOTLISTED")
+
+    assert run(sync()) == ([("ROOM01", 5)], [("ROOM01", 2)], [], None)
+
+
+def test_quick_match_withdraws_a_stale_listing_and_creates_a_room(db, run, monkeypatch):
+    monkeypatch.setattr(rooms, "QUICKMATCH_JOIN_WAIT_SECONDS", 0.1)
+
+    async def match():
+        # Listed in Redis but never committed to MySQL
+        await lobby.list_room("GHOST1", THEME, 5)
+        room = await rooms.quick_match(schemas.QuickMatchRequest(user=schemas.UserCreate(username="alice", password="x"), theme=THEME), db)
+        return room, await redis.hget(lobby.ROOMS_KEY, "GHOST1"), await lobby.open_rooms(THEME, 10)
+
+    room, ghost_theme, listed = run(match())
+    assert room.room_code != "GHOST1" and ghost_theme is None
+    assert listed == [(room.room_code, rooms.QUICKMATCH_ROOM_SIZE - 1)]
+
+
+def test_quick_match_joins_a_listed_public_room(db, run):
+    async def match():
+        created = await rooms.create_game_room(schemas.GameRoomAndUserCreate(
+            name="open", max_players=4, public=True, theme=THEME, user=schemas.UserCreate(username="host", password="x"),
+        ), db)
+        joined = await rooms.quick_match(schemas.QuickMatchRequest(user=schemas.UserCreate(username="bob", password="x"), theme=THEME), db)
+        return created, joined, await lobby.open_rooms(THEME, 10)
+
+    created, joined, listed = run(match())
+    assert joined.room_code == created.room_code
+    assert {p.username for p in joined.players} == {"host", "bob"}
+    assert listed == [(created.room_code, 2)]
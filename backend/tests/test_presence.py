@@ -0,0 +1,35 @@
+# backend/tests/test_presence.py
+import asyncio
+
+from database import redis, redis_pipeline
+import presence
+
+
+def test_resume_token_redeems_once_under_concurrent_reconnects():
+    async def race():
+        async with redis_pipeline() as pipe:
+            token = presence.queue_issue_resume_token(pipe, "ROOM01", 5)
+            await pipe.execute()
+        try:
+            return await asyncio.gather(*(presence.consume_resume_token(token, "ROOM01", 5) for _ in range(10)))
+        finally:
+            await redis.delete(presence.resuming_key("ROOM01"))
+            await redis.connection_pool.disconnect()
+
+    assert sorted(asyncio.run(race())) == [False] * 9 + [True]
+
+
+def test_resume_token_only_for_its_player_and_room():
+    async def redeem(room_code, user_id):
+        async with redis_pipeline() as pipe:
+            token = presence.queue_issue_resume_token(pipe, "ROOM01", 5)
+            await pipe.execute()
+        try:
+            return await presence.consume_resume_token(token, room_code, user_id)
+        finally:
+            await redis.delete(presence.resuming_key("ROOM01"))
+            await redis.connection_pool.disconnect()
+
+    assert not asyncio.run(redeem("ROOM01", 6))
+    assert not asyncio.run(redeem("ROOM02", 5))
+    assert asyncio.run(redeem("ROOM01", 5))
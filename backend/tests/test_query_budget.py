@@ -0,0 +1,83 @@
+# backend/tests/test_query_budget.py
+import time
+
+import pytest
+
+from routers import rooms
+import crud, models, schemas
+import game_state
+import leaderboard
+import presence
+import query_profiler
+from database import redis, redis_pipeline
+
+PLAYERS = 6
+
+
+def play_round(db):
+    """A room, a game and one question every player has answered; returns (room_code, game_id, question_id, users)."""
+    users = [crud.create_user(db, schemas.UserCreate(username=f"player-{i}", password="x")) for i in range(PLAYERS)]
+    room = crud.create_room(db, schemas.GameRoomCreate(name="budget", max_players=PLAYERS), users[0])
+    for user in users[1:]:
+        crud.join_room(db, room.room_code, user)
+    question = schemas.QuestionCreate(question_text="Capital of France?", correct_answer_text="Paris")
+    game = crud.create_game_with_questions(db, room_id=room.id, theme="geography", questions=[question])
+    question_id = game.questions[0].id
+    for i, user in enumerate(users):
+        crud.create_answer(db, schemas.AnswerCreate(question_id=question_id, answer_text=f"City {i}"), player_id=user.id)
+    room_code, game_id, user_ids = room.room_code, game.id, [u.id for u in users]
+    db.expunge_all()  # Later reads must load authors and voters themselves
+    return room_code, game_id, question_id, user_ids
+
+
+async def go_live(room_code, game_id):
+    """The Redis side of a running game on this worker, with every player connected."""
+    async with redis_pipeline() as pipe:
+        pipe.delete(game_state.state_key(room_code), presence.presence_key(room_code), leaderboard.game_key(game_id))
+        game_state.queue_start(pipe, room_code, game_id, ["Capital of France?"])
+        presence.queue_set_count(pipe, room_code, PLAYERS)
+        pipe.zadd(presence.WORKERS_KEY, {presence.WORKER_ID: time.time()})
+        await pipe.execute()
+
+
+def test_round_handlers_fit_budget(db, query_budget, run, monkeypatch):
+    room_code, game_id, question_id, user_ids = play_round(db)
+    monkeypatch.setattr(rooms, "VOTE_RESULTS_DISPLAY_SECONDS", 0)
+
+    async def answer_round():
+        await go_live(room_code, game_id)
+        # Current question and the answers, then the correct answer inserted
+        # and linked (crud reads each row back after writing it)
+        with query_budget("answer submission", 7):
+            await rooms.handle_answer_submission(room_code)
+
+    run(answer_round())
+
+    answers = crud.get_answers_for_question(db, question_id)
+    correct = next(a for a in answers if a.player_id is None)
+    # Two players find the truth; the rest vote for their neighbour's lie
+    player_answers = {a.player_id: a for a in answers if a.player_id is not None}
+    for i, voter_id in enumerate(user_ids):
+        target = correct if i < 2 else player_answers[user_ids[(i + 1) % PLAYERS]]
+        crud.create_vote(db, schemas.VoteCreate(answer_id=target.id), voter_id=voter_id)
+    db.expunge_all()
+
+    async def vote_round():
+        # Current question (usually cached), votes and answers with names
+        # joined in, the game's theme, and one deferred UPDATE for every score
+        with query_budget("vote results", 5):
+            await rooms.handle_vote_submission(room_code)
+            await leaderboard.flush_pending_writes()
+        return await redis.zrevrange(leaderboard.game_key(game_id), 0, -1, withscores=True)
+
+    standings = run(vote_round())
+    assert sum(score for _, score in standings) == 2 + (PLAYERS - 2)
+    assert sum(s.score for s in crud.get_scores_for_game(db, game_id)) == 2 + (PLAYERS - 2)
+
+
+def test_budget_fails_on_per_player_queries(db, query_budget):
+    _, _, question_id, _ = play_round(db)
+    with pytest.raises(query_profiler.QueryBudgetExceeded, match="budget 1"):
+        with query_budget("lazy authors", 1):
+            answers = db.query(models.Answer).filter(models.Answer.question_id == question_id).all()
+            [a.player.username for a in answers]
@@ -0,0 +1,52 @@
+# backend/tests/test_question_dedup.py
+from services import gemini
+from services.question_dedup import QuestionIndex, normalize, question_hash
+
+
+def test_exact_duplicates_ignore_case_punctuation_and_accents():
+    assert normalize("  Who painted the MONA LISA?! ") == "who painted the mona lisa"
+    assert question_hash("Café au lait?") == question_hash("cafe AU lait")
+
+    index = QuestionIndex()
+    assert index.add("Who painted the Mona Lisa?", "Da Vinci") is None
+    assert index.add("who painted the mona lisa", "Leonardo") == "exact"
+    assert len(index) == 1
+
+
+def test_rewordings_with_the_same_answer_are_near_duplicates():
+    index = QuestionIndex()
+    assert index.add("What is the capital city of France?", "Paris") is None
+    assert index.add("Which city is the capital of France?", "paris!") == "near"
+    assert index.add("What is the capital of France?", "Paris") == "near"
+    assert len(index) == 1
+
+
+def test_near_misses_are_kept():
+    index = QuestionIndex()
+    assert index.add("Which ocean is the largest on Earth?", "Pacific") is None
+    # Same template, different answer
+    assert index.add("Which lake is the largest on Earth?", "Caspian Sea") is None
+    # Same answer, unrelated question
+    assert index.add("Which ocean did the Mayflower cross?", "Pacific") is None
+    assert index.add("Who wrote Hamlet?", "Shakespeare") is None
+    assert len(index) == 4
+
+
+def test_generated_rewordings_of_known_questions_are_dropped(tmp_path, monkeypatch):
+    cache = tmp_path / "questions.json"
+    cache.write_text('{"geography": [{"question_text": "What is the capital city of France?", "correct_answer": "Paris"}]}')
+    generated = [
+        {"question_text": "Which city is the capital of France?", "correct_answer": "Paris"},
+        {"question_text": "What is the capital of Italy?", "correct_answer": "Rome"},
+        {"question_text": "Which city is the capital of Italy?", "correct_answer": "Rome"},
+        {"question_text": "Which river flows through Cairo?", "correct_answer": "The Nile"},
+    ]
+    monkeypatch.setattr(gemini, "QUESTIONS_FILE_PATH", str(cache))
+    monkeypatch.setattr(gemini, "stream_questions_from_api", lambda theme, n: iter(generated))
+
+    seen = {"What is the capital city of France?", "Which river flows through Cairo?"}
+    questions = [q["question_text"] for q in gemini.stream_game_questions("geography", 4, seen)]
+    assert questions == ["What is the capital of Italy?"]
+    assert [q["question_text"] for q in gemini.get_all_questions_from_file()["geography"]] == [
+        "What is the capital city of France?", "What is the capital of Italy?"
+    ]
@@ -0,0 +1,61 @@
+# backend/tests/test_question_packs.py
+import json
+
+import pytest
+
+import question_packs
+from services import gemini
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    path = tmp_path / "questions.json"
+    path.write_text(json.dumps({"geography": [{"question_text": "What is the capital city of France?", "correct_answer": "Paris"}]}))
+    monkeypatch.setattr(gemini, "QUESTIONS_FILE_PATH", str(path))
+    return path
+
+
+def write_pack(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records))
+    return str(path)
+
+
+def test_import_skips_duplicates_of_the_cache_and_of_the_pack(cache, tmp_path):
+    pack = write_pack(tmp_path / "pack.jsonl", [
+        {"question_text": "what is the capital city of france", "correct_answer": "Paris"},
+        {"question_text": "Which city is the capital of France?", "correct_answer": "Paris"},
+        {"question_text": "Which river flows through Cairo?", "correct_answer": "The Nile"},
+        {"question_text": "Which river runs through Cairo?", "correct_answer": "the Nile"},
+        {"question_text": "Which river flows through Vienna?", "correct_answer": "The Danube"},
+        {"question_text": "", "correct_answer": "Nothing"},
+    ])
+    outcomes = question_packs.import_pack(pack, theme="geography")
+    assert outcomes == {"imported": 2, "exact_duplicate": 1, "near_duplicate": 2, "invalid": 1}
+    assert [q["question_text"] for q in json.loads(cache.read_text())["geography"]] == [
+        "What is the capital city of France?", "Which river flows through Cairo?", "Which river flows through Vienna?"
+    ]
+
+
+def test_dry_run_leaves_the_cache_alone(cache, tmp_path):
+    before = cache.read_text()
+    pack = write_pack(tmp_path / "pack.jsonl", [{"theme": "science", "question_text": "What is H2O?", "correct_answer": "Water"}])
+    assert question_packs.import_pack(pack, dry_run=True) == {"imported": 1}
+    assert cache.read_text() == before
+
+
+def test_dedupe_keeps_the_first_copy(cache):
+    cache.write_text(json.dumps({"geography": [
+        {"question_text": "What is the capital city of France?", "correct_answer": "Paris"},
+        {"question_text": "Which city is the capital of France?", "correct_answer": "Paris"},
+        {"question_text": "WHAT IS THE CAPITAL CITY OF FRANCE", "correct_answer": "Paris"},
+        {"question_text": "What is the capital city of Spain?", "correct_answer": "Madrid"},
+    ]}))
+    assert question_packs.dedupe_store() == {"kept": 2, "near_duplicate": 1, "exact_duplicate": 1}
+    assert [q["correct_answer"] for q in json.loads(cache.read_text())["geography"]] == ["Paris", "Madrid"]
+
+
+def test_export_round_trips_through_import(cache, tmp_path):
+    exported = tmp_path / "geography.csv"
+    assert question_packs.export_pack(str(exported), themes=["geography"]) == 1
+    assert list(question_packs.iter_pack(str(exported))) == [("geography", "What is the capital city of France?", "Paris")]
+    assert question_packs.import_pack(str(exported)) == {"exact_duplicate": 1}
@@ -0,0 +1,39 @@
+# backend/tests/test_rate_limit.py
+import json
+
+from fastapi import WebSocketDisconnect
+
+from routers import rooms  # noqa: F401  (import order: rooms -> websocket)
+from database import redis
+import protocol
+import rate_limit
+import websocket
+
+
+class FloodSocket:
+    """Hands the receiver a fixed list of frames, then hangs up."""
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    async def receive_text(self):
+        if not self.frames:
+            raise WebSocketDisconnect()
+        return self.frames.pop(0)
+
+
+def test_bad_frames_take_rate_limit_tokens(run):
+    room_code, user_id = "RLTEST", 9001
+    burst = rate_limit.CONNECTION_LIMIT[1]
+    frames = ["not json"] * burst + ["x" * (websocket.MAX_INBOUND_FRAME_BYTES + 1)] * 5
+
+    async def flood():
+        await redis.delete(f"ratelimit:{room_code}:user:{user_id}", f"ratelimit:{room_code}:room")
+        conn = websocket.Connection(FloodSocket(frames), room_code, user_id, protocol.JsonProtocol(), websocket.SendQueue())
+        await websocket.manager.message_receiver(conn)
+        return [json.loads(message)["reason"] for _, message in conn.send_queue._items]
+
+    reasons = run(flood())
+    assert reasons[:burst] == ["invalid"] * burst
+    # The oversized frames past the burst are turned away before they're looked at
+    assert reasons[burst:] == ["rate_limited"] * 5
@@ -0,0 +1,50 @@
+# backend/tests/test_theme_leaderboard.py
+import json
+
+import crud, models, schemas
+import leaderboard
+
+
+def add_game(db, room, theme, scores):
+    game = crud.create_game_with_questions(db, room_id=room.id, theme=theme, questions=[])
+    for player, points in scores.items():
+        db.add(models.PlayerGameScore(player_id=player.id, game_id=game.id, score=points))
+    db.commit()
+    return game
+
+
+def test_theme_totals_include_archived_games(db):
+    alice = crud.create_user(db, schemas.UserCreate(username="alice", password="pw"))
+    bob = crud.create_user(db, schemas.UserCreate(username="bob", password="pw"))
+    room = crud.create_room(db, schemas.GameRoomCreate(name="themes", max_players=2), alice)
+    add_game(db, room, "science", {alice: 300, bob: 100})
+    add_game(db, room, "history", {bob: 0})
+    # A game retention has already moved out of player_game_scores
+    db.add(models.ArchivedGame(
+        game_id=999, room_id=room.id, theme="science",
+        payload=json.dumps({"questions": [], "scores": [{"player_id": bob.id, "score": 500}]}),
+    ))
+    db.commit()
+
+    assert leaderboard.theme_totals(db) == {"science": {alice.id: 300, bob.id: 600}, "history": {}}
+    assert crud.get_usernames(db, [alice.id, bob.id]) == {alice.id: "alice", bob.id: "bob"}
+
+
+def test_startup_wipe_keeps_theme_totals(db):
+    import main
+
+    alice = crud.create_user(db, schemas.UserCreate(username="alice", password="pw"))
+    bob = crud.create_user(db, schemas.UserCreate(username="bob", password="pw"))
+    room = crud.create_room(db, schemas.GameRoomCreate(name="themes", max_players=2), alice)
+    finished = add_game(db, room, "science", {alice: 300, bob: 100})
+    crud.finish_game(db, finished.id)
+    # Cut off by the restart mid-game
+    add_game(db, room, "science", {bob: 200})
+    before = leaderboard.theme_totals(db)
+
+    main.reset_database()
+    db.expire_all()
+
+    assert leaderboard.theme_totals(db) == before == {"science": {alice.id: 300, bob.id: 300}}
+    assert db.query(models.Game).count() == db.query(models.GameRoom).count() == 0
+    assert crud.get_usernames(db, [alice.id, bob.id]) == {alice.id: "alice", bob.id: "bob"}
@@ -0,0 +1,22 @@
+# backend/uvicorn_worker.py
+"""
+Gunicorn worker class for the app (`-k uvicorn_worker.BazingaUvicornWorker`).
+
+Caps inbound WebSocket messages in the protocol layer, so an oversized frame
+is refused (close code 1009) while it is being read, instead of after
+Starlette has buffered all of it; uvicorn's own default allows 16 MiB. The
+cap is the same WS_MAX_INBOUND_FRAME_BYTES that websocket.py checks as a
+second line. It is read here rather than imported, so the gunicorn master
+doesn't load the app. The websockets implementation enforces it; wsproto
+does not.
+"""
+import os
+from uvicorn.workers import UvicornWorker
+
+
+class BazingaUvicornWorker(UvicornWorker):
+    CONFIG_KWARGS = {
+        **UvicornWorker.CONFIG_KWARGS,
+        "ws": "websockets",
+        "ws_max_size": int(os.getenv("WS_MAX_INBOUND_FRAME_BYTES", "4096")),
+    }
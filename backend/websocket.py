@@ -1,110 +1,463 @@
 # backend/websocket.py
 import asyncio
+import collections
 import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
 from fastapi import WebSocket, WebSocketDisconnect
-from database import redis, SessionLocal
-import crud, models, schemas
-from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from database import redis, redis_pipeline, SessionLocal
+import schemas
+import event_trace
+import game_state
+import game_store
+import lobby
+import metrics
+import presence
+import query_profiler
+import protocol
+import rate_limit
+import room_lifecycle
 
 # Import the game logic handlers from the router
 from routers import rooms as rooms_router
 
+# Outbound buffering per socket. Past the high-water mark a client counts as
+# slow, and it is evicted if it stays there for longer than the grace period.
+SEND_QUEUE_MAX = int(os.getenv("WS_SEND_QUEUE_MAX", "64"))
+SEND_QUEUE_HIGH_WATER = int(os.getenv("WS_SEND_QUEUE_HIGH_WATER", "48"))
+SEND_QUEUE_POLICY = os.getenv("WS_SEND_QUEUE_POLICY", "drop_oldest")  # or "drop_newest"
+SLOW_CONSUMER_GRACE_SECONDS = float(os.getenv("WS_SLOW_CONSUMER_GRACE_SECONDS", "10"))
+# Client frames larger than this are rejected before they are decoded
+MAX_INBOUND_FRAME_BYTES = int(os.getenv("WS_MAX_INBOUND_FRAME_BYTES", "4096"))
+# Events that carry full state, so only the newest pending one is worth sending
+COALESCED_EVENTS = set(os.getenv("WS_COALESCED_EVENTS", "player_update").split(","))
+
+def frame_too_large(data) -> bool:
+    """
+    Second line behind the server's ws_max_size (see uvicorn_worker.py): text
+    frames arrive decoded, so their UTF-8 length is what gets compared.
+    """
+    if isinstance(data, str):
+        # Each character is 1 to 4 bytes, so most frames need no encoding
+        if len(data) > MAX_INBOUND_FRAME_BYTES:
+            return True
+        if len(data) * 4 <= MAX_INBOUND_FRAME_BYTES:
+            return False
+        data = data.encode()
+    return len(data) > MAX_INBOUND_FRAME_BYTES
+
+def room_channel(room_code: str) -> str:
+    return f"room:{room_code}"
+
+def user_channel(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def event_type(message: str):
+    # Server messages are built with json.dumps({"event": ...}), so the type leads the payload
+    if message.startswith('{"event": "'):
+        return message[11:message.find('"', 11)]
+    return None
+
+class SendQueue:
+    """Bounded outbound buffer drained by a socket's writer task."""
+
+    def __init__(self, maxsize: int = SEND_QUEUE_MAX, policy: str = SEND_QUEUE_POLICY):
+        self.maxsize = maxsize
+        self.policy = policy
+        self._items = collections.deque()
+        self._ready = asyncio.Event()
+        self._over_high_water_since = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, message: str) -> bool:
+        event = event_type(message)
+        if event in COALESCED_EVENTS:
+            # Drop the stale copy and queue the new one behind anything sent since
+            for pending in self._items:
+                if pending[0] == event:
+                    self._items.remove(pending)
+                    metrics.WS_SEND_DROPPED.inc(reason="coalesced")
+                    break
+
+        if len(self._items) >= self.maxsize:
+            metrics.WS_SEND_DROPPED.inc(reason="overflow")
+            if self.policy == "drop_newest":
+                return False
+            self._items.popleft()
+
+        self._items.append((event, message))
+        self._ready.set()
+
+        if len(self._items) >= SEND_QUEUE_HIGH_WATER:
+            if self._over_high_water_since is None:
+                self._over_high_water_since = time.monotonic()
+        else:
+            self._over_high_water_since = None
+        return True
+
+    def is_slow_consumer(self) -> bool:
+        return (
+            self._over_high_water_since is not None
+            and time.monotonic() - self._over_high_water_since > SLOW_CONSUMER_GRACE_SECONDS
+        )
+
+    async def get(self) -> str:
+        while not self._items:
+            self._ready.clear()
+            await self._ready.wait()
+        if len(self._items) <= SEND_QUEUE_HIGH_WATER:
+            self._over_high_water_since = None
+        return self._items.popleft()[1]
+
+@dataclass(slots=True)
+class Connection:
+    """
+    Everything a worker keeps per socket. The endpoint coroutine reads from
+    the socket and `task` writes to it; room broadcasts and messages for the
+    player reach `send_queue` through the worker's single shared
+    subscription. Spectators have no user_id.
+    """
+    websocket: WebSocket
+    room_code: str
+    user_id: Optional[int]
+    wire_protocol: object  # protocol.JsonProtocol or protocol.MsgpackDeltaProtocol
+    send_queue: SendQueue
+    task: Optional[asyncio.Task] = None
+    closing: bool = False
+
+class ConnectionRegistry:
+    """Player connections on this worker, indexed by room and by user."""
+
+    def __init__(self):
+        self.by_room: dict[str, dict[int, Connection]] = {}
+        self.by_user: dict[int, Connection] = {}
+
+    def __len__(self):
+        return len(self.by_user)
+
+    def room(self, room_code: str) -> dict[int, Connection]:
+        return self.by_room.get(room_code, {})
+
+    def add(self, conn: Connection) -> Optional[Connection]:
+        """Registers the connection; returns the one it replaces for the same user, if any."""
+        replaced = self.by_user.get(conn.user_id)
+        if replaced is not None:
+            self.remove(replaced)
+        self.by_room.setdefault(conn.room_code, {})[conn.user_id] = conn
+        self.by_user[conn.user_id] = conn
+        return replaced
+
+    def remove(self, conn: Connection) -> bool:
+        room = self.by_room.get(conn.room_code)
+        if not room or room.get(conn.user_id) is not conn:
+            return False
+        del room[conn.user_id]
+        if not room:
+            del self.by_room[conn.room_code]
+        if self.by_user.get(conn.user_id) is conn:
+            del self.by_user[conn.user_id]
+        return True
+
+    def pop_room(self, room_code: str) -> list:
+        conns = list(self.by_room.pop(room_code, {}).values())
+        for conn in conns:
+            if self.by_user.get(conn.user_id) is conn:
+                del self.by_user[conn.user_id]
+        return conns
+
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: dict[str, dict[int, WebSocket]] = {}
+        self.registry = ConnectionRegistry()
+        # One subscription per worker carries every room it has players in,
+        # and the user:{id} channel of each of those players
+        self._pubsub = None
+        self._fanout_task = None
+        self._last_tick = 0.0
+        self._background = set()
+        # Set by drain.py on SIGTERM: no new sockets, and leaving ones keep their seat
+        self.draining = False
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
 
-    async def connect(self, websocket: WebSocket, room_id: str, user_id: int):
+    async def accept(self, websocket: WebSocket, room_code: str, user_id: Optional[int]) -> Connection:
+        """Accepts the socket with the negotiated protocol and starts its writer."""
+        subprotocol = protocol.negotiate(websocket.scope.get("subprotocols"))
+        await websocket.accept(subprotocol=subprotocol)
+        conn = Connection(websocket, room_code, user_id, protocol.for_subprotocol(subprotocol), SendQueue())
+        conn.task = asyncio.create_task(self.socket_writer(conn))
+        return conn
+
+    async def connect(self, websocket: WebSocket, room_id: str, user_id: int) -> Connection:
+        conn = await self.accept(websocket, room_id, user_id)
+        replaced = self.registry.add(conn)
+        channels = []
+        if replaced is not None:
+            # Same user reconnected (e.g. a refresh); the old socket is stale
+            replaced.task.cancel()
+            self._spawn(self.close(replaced, 1000))
+            if replaced.room_code != room_id:
+                await self._room_left(replaced.room_code)
+        else:
+            channels.append(user_channel(user_id))
+        if len(self.registry.room(room_id)) == 1 and (replaced is None or replaced.room_code != room_id):
+            channels.append(room_channel(room_id))
+        if channels:
+            await self._subscribe(*channels)
+        await self._publish_presence(room_id)
+        return conn
+
+    async def disconnect(self, conn: Connection) -> bool:
+        """Drops the connection; returns False if it had already been dropped or replaced."""
+        if not self.registry.remove(conn):
+            return False
+        conn.task.cancel()
+        await self._room_left(conn.room_code, user_channel(conn.user_id))
+        return True
+
+    async def _room_left(self, room_id: str, *channels: str):
+        if not self.registry.room(room_id):
+            channels += (room_channel(room_id),)
+        if channels:
+            await self._unsubscribe(*channels)
+        await self._publish_presence(room_id)
+
+    async def release_room(self, room_id: str):
+        """Closes any sockets still held for an expired room."""
+        conns = self.registry.pop_room(room_id)
+        if conns:
+            await self._unsubscribe(room_channel(room_id), *(user_channel(conn.user_id) for conn in conns))
+        for conn in conns:
+            conn.task.cancel()
+            await self.close(conn, 1001)
+
+    async def close(self, conn: Connection, code: int):
+        try:
+            await conn.websocket.close(code=code)
+        except RuntimeError:
+            pass  # Already closed
+
+    async def refuse(self, websocket: WebSocket, code: int):
+        """
+        Turns a socket away with a close code. Closing before the handshake
+        completes would reach the browser as an HTTP 403, with no code to act on.
+        """
         await websocket.accept()
-        if room_id not in self.active_connections:
-            self.active_connections[room_id] = {}
-        self.active_connections[room_id][user_id] = websocket
-        
-        pubsub_task = asyncio.create_task(self.redis_listener(websocket, room_id))
-        receiver_task = asyncio.create_task(self.message_receiver(websocket, room_id, user_id))
-        
-        # Attach tasks to the websocket object to be able to cancel them on disconnect
-        websocket.tasks = [pubsub_task, receiver_task]
-
-    def disconnect(self, websocket: WebSocket, room_id: str, user_id: int):
-        if room_id in self.active_connections and user_id in self.active_connections[room_id]:
-            del self.active_connections[room_id][user_id]
-            if hasattr(websocket, 'tasks'):
-                for task in websocket.tasks:
-                    task.cancel()
+        await websocket.close(code=code)
+
+    async def _publish_presence(self, room_id: str):
+        async with redis_pipeline() as pipe:
+            presence.queue_set_count(pipe, room_id, len(self.registry.room(room_id)))
+            await pipe.execute()
+
+    async def _subscribe(self, *channels: str):
+        if self._pubsub is None:
+            self._pubsub = redis.pubsub()
+        await self._pubsub.subscribe(*channels)
+        if self._fanout_task is None or self._fanout_task.done():
+            await presence.heartbeat()
+            self._last_tick = time.monotonic()
+            self._fanout_task = asyncio.create_task(self.room_fanout())
+
+    async def _unsubscribe(self, *channels: str):
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(*channels)
 
     async def broadcast(self, message: str, room_id: str):
-        await redis.publish(f"room:{room_id}", message)
+        with metrics.REDIS_PUBLISH_LATENCY.time():
+            await redis.publish(room_channel(room_id), message)
+
+    def queue_broadcast(self, pipe, message: str, room_id: str):
+        """Adds a room broadcast to a pipeline so it ships with the event's other commands."""
+        pipe.publish(room_channel(room_id), message)
+
+    def queue_send_to_user(self, pipe, message: str, user_id: int):
+        """
+        Adds a message for one player, on whichever worker holds their socket.
+        It goes through Redis even when that is this worker, so it stays in
+        order with the room broadcasts around it.
+        """
+        pipe.publish(user_channel(user_id), message)
 
-    async def redis_listener(self, websocket: WebSocket, room_id: str):
-        pubsub = redis.pubsub()
-        await pubsub.subscribe(f"room:{room_id}")
+    def send_personal(self, conn: Connection, message: str):
+        """Queues a reply for a socket on this worker, behind any pending broadcasts."""
+        conn.send_queue.put(message)
+
+    def reject(self, conn: Connection, reason: str, detail: str):
+        metrics.WS_MESSAGES_REJECTED.inc(reason=reason)
+        self.send_personal(conn, json.dumps({"event": "message_rejected", "reason": reason, "message": detail}))
+
+    async def evict(self, conn: Connection):
+        metrics.WS_SLOW_CONSUMER_EVICTIONS.inc()
+        # 1013 (try again later): the receiver sees the close and runs the usual cleanup
+        await self.close(conn, 1013)
+
+    async def socket_writer(self, conn: Connection):
+        websocket, wire_protocol, send_queue = conn.websocket, conn.wire_protocol, conn.send_queue
         try:
             while True:
-                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
-                if message and message['type'] == 'message':
-                    await websocket.send_text(message['data'])
-        except (asyncio.CancelledError, WebSocketDisconnect):
+                message = await send_queue.get()
+                with metrics.WS_FANOUT_LATENCY.time():
+                    encoded = wire_protocol.encode(message)
+                    if wire_protocol.binary:
+                        await websocket.send_bytes(encoded)
+                    else:
+                        await websocket.send_text(encoded)
+                metrics.WS_FANOUT_MESSAGES.inc()
+        except (asyncio.CancelledError, WebSocketDisconnect, RuntimeError):
             pass
+
+    async def _tick(self):
+        # Rooms with a player here stay alive, and so does this worker's presence
+        await presence.heartbeat()
+        for room_code in list(self.registry.by_room):
+            await room_lifecycle.lifecycle.touch(room_code)
+
+    async def room_fanout(self):
+        """Reads the worker's shared subscription and queues each message for the room's local sockets."""
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message and message['type'] == 'message':
+                    data, channel = message['data'], message['channel']
+                    if channel.startswith("user:"):
+                        conn = self.registry.by_user.get(int(channel[len("user:"):]))
+                        conns = (conn,) if conn is not None else ()
+                    else:
+                        conns = self.registry.room(channel[len("room:"):]).values()
+                    for conn in conns:
+                        conn.send_queue.put(data)
+                        if conn.send_queue.is_slow_consumer() and not conn.closing:
+                            conn.closing = True
+                            self._spawn(self.evict(conn))
+                if time.monotonic() - self._last_tick >= presence.WORKER_HEARTBEAT_SECONDS:
+                    self._last_tick = time.monotonic()
+                    self._spawn(self._tick())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in room fan-out: {e}")
+                await asyncio.sleep(1)
+
+    async def handle_message(self, conn: Connection, message):
+        room_code, user_id = conn.room_code, conn.user_id
+        db = SessionLocal()
+        try:
+            if message.type == 'START_GAME':
+                event_trace.record("start_game", room_code, user=user_id, theme=message.payload.theme, num_questions=message.payload.num_questions)
+                await rooms_router._start_game_logic(room_code, message.payload, db)
+
+            elif message.type == 'SUBMIT_ANSWER':
+                payload = message.payload
+                question_id = payload.question_id
+                answer_text_lower = payload.answer_text.lower()
+
+                question = await game_store.store.get_question(db, question_id)
+                if not question: return
+
+                if answer_text_lower == question.correct_answer_text.lower():
+                    event_trace.record("answer", room_code, user=user_id, text=payload.answer_text, rejected="correct")
+                    self.send_personal(conn, json.dumps({"event": "duplicate_answer", "message": "This is too similar to the correct answer. Try something else!"}))
+                    return
+
+                existing_answers = await game_store.store.get_answers(db, question_id)
+                if any(ans.answer_text.lower() == answer_text_lower for ans in existing_answers):
+                    event_trace.record("answer", room_code, user=user_id, text=payload.answer_text, rejected="taken")
+                    self.send_personal(conn, json.dumps({"event": "duplicate_answer", "message": "Someone already submitted that answer. Try to be more original!"}))
+                    return
+
+                await game_store.store.create_answer(db, question_id, payload.answer_text, player_id=user_id)
+                event_trace.record("answer", room_code, user=user_id, text=payload.answer_text, rejected=None)
+
+                await self.broadcast(json.dumps({"event": "player_answered", "user_id": user_id}), room_code)
+                await rooms_router.handle_answer_submission(room_code)
+
+            elif message.type == 'SUBMIT_VOTE':
+                answer_id = message.payload.answer_id
+                if not await game_store.store.create_vote(db, answer_id, voter_id=user_id): return
+                if event_trace.TRACING:
+                    event_trace.record("vote", room_code, user=user_id, author=await self._answer_author(db, room_code, answer_id))
+
+                await self.broadcast(json.dumps({"event": "player_voted", "user_id": user_id}), room_code)
+                await rooms_router.handle_vote_submission(room_code)
         finally:
-            await pubsub.unsubscribe(f"room:{room_id}")
-            await pubsub.close()
+            db.close()
+
+    async def _answer_author(self, db, room_code: str, answer_id: int):
+        # Only used for event traces, so the extra lookups stay off the normal path
+        state = await game_state.get(room_code)
+        question = state and await game_store.current_question(db, state)
+        if not question:
+            return None
+        answers = await game_store.store.get_answers(db, question.id)
+        return next((a.player_id for a in answers if a.id == answer_id), None)
 
-    async def message_receiver(self, websocket: WebSocket, room_code: str, user_id: int):
+    async def message_receiver(self, conn: Connection):
+        """Runs in the socket's endpoint coroutine until the client goes away."""
+        websocket, wire_protocol, room_code, user_id = conn.websocket, conn.wire_protocol, conn.room_code, conn.user_id
         try:
             while True:
-                data = await websocket.receive_text()
-                message = json.loads(data)
-                
-                db = SessionLocal()
+                if wire_protocol.binary:
+                    data = await websocket.receive_bytes()
+                else:
+                    data = await websocket.receive_text()
+
+                # Before any parsing, so a flood of bad frames runs dry like any other
+                if not await rate_limit.allow_frame(room_code, user_id):
+                    self.reject(conn, "rate_limited", "You're doing that too fast. Slow down!")
+                    continue
+                if frame_too_large(data):
+                    self.reject(conn, "frame_too_large", "Message is too large.")
+                    continue
                 try:
-                    if message['type'] == 'START_GAME':
-                        config = schemas.StartGameRequest(**message['payload'])
-                        await rooms_router._start_game_logic(room_code, config, db)
-
-                    elif message['type'] == 'SUBMIT_ANSWER':
-                        payload = message['payload']
-                        question_id = payload['question_id']
-                        answer_text_lower = payload['answer_text'].lower()
-
-                        question = await run_in_threadpool(db.query(models.Question).filter(models.Question.id == question_id).first)
-                        if not question: continue
-
-                        if answer_text_lower == question.correct_answer_text.lower():
-                            await websocket.send_text(json.dumps({"event": "duplicate_answer", "message": "This is too similar to the correct answer. Try something else!"}))
-                            continue
-
-                        existing_answers = await run_in_threadpool(crud.get_answers_for_question, db, question_id)
-                        if any(ans.answer_text.lower() == answer_text_lower for ans in existing_answers):
-                            await websocket.send_text(json.dumps({"event": "duplicate_answer", "message": "Someone already submitted that answer. Try to be more original!"}))
-                            continue
-
-                        answer_data = schemas.AnswerCreate(question_id=question_id, answer_text=payload['answer_text'])
-                        await run_in_threadpool(crud.create_answer, db, answer_data, player_id=user_id)
-                        
-                        await self.broadcast(json.dumps({"event": "player_answered", "user_id": user_id}), room_code)
-                        await rooms_router.handle_answer_submission(room_code)
-
-                    elif message['type'] == 'SUBMIT_VOTE':
-                        answer_id = int(message['payload']['answer_id'])
-                        vote_data = schemas.VoteCreate(answer_id=answer_id)
-                        await run_in_threadpool(crud.create_vote, db, vote_data, voter_id=user_id)
-
-                        await self.broadcast(json.dumps({"event": "player_voted", "user_id": user_id}), room_code)
-                        await rooms_router.handle_vote_submission(room_code)
-                finally:
-                    db.close()
+                    message = schemas.ClientMessage.validate_python(wire_protocol.decode(data))
+                except (ValueError, ValidationError):
+                    self.reject(conn, "invalid", "Message could not be understood.")
+                    continue
+
+                message_type = message.type
+                if not await rate_limit.allow_message_type(room_code, message_type):
+                    self.reject(conn, "rate_limited", "You're doing that too fast. Slow down!")
+                    continue
+
+                metrics.WS_MESSAGES.inc(type=message_type)
+                with metrics.WS_MESSAGE_LATENCY.time(type=message_type), query_profiler.profile_scope(f"ws:{message_type}"):
+                    await self.handle_message(conn, message)
 
         except (WebSocketDisconnect, asyncio.CancelledError):
-            self.disconnect(websocket, room_code, user_id)
-            await redis.srem(f"room:{room_code}:users", user_id)
-            db_disconnect = SessionLocal()
-            try:
-                await rooms_router.handle_answer_submission(room_code)
-                await rooms_router.broadcast_player_update(db_disconnect, room_code)
-            finally:
-                db_disconnect.close()
+            # A socket replaced by a reconnect, or handed off by a draining
+            # worker, leaves the user in the room
+            if await self.disconnect(conn) and not self.draining:
+                event_trace.record("disconnect", room_code, user=user_id)
+                async with redis_pipeline() as pipe:
+                    pipe.srem(f"room:{room_code}:users", user_id)
+                    pipe.scard(f"room:{room_code}:users")
+                    lobby.queue_theme(pipe, room_code)
+                    _, remaining, lobby_theme = await pipe.execute()
+                if not remaining and lobby_theme is not None:
+                    # Quick-match shouldn't seat anyone in a room nobody is waiting in
+                    await lobby.unlist(room_code, lobby_theme)
+                rooms_router.answer_checks.schedule(room_code)
+                rooms_router.player_updates.schedule(room_code)
         except Exception as e:
             print(f"Error in message_receiver: {e}")
-            self.disconnect(websocket, room_code, user_id)
+            await self.disconnect(conn)
+
+manager = ConnectionManager()
+
+metrics.ACTIVE_ROOMS.set_function(lambda: len(manager.registry.by_room))
+metrics.ACTIVE_SOCKETS.set_function(lambda: len(manager.registry))
+
+def _send_queue_depths():
+    depths = [len(conn.send_queue) for users in manager.registry.by_room.values() for conn in users.values()]
+    return {"total": sum(depths), "max": max(depths, default=0)}
 
-manager = ConnectionManager()
\ No newline at end of file
+metrics.WS_SEND_QUEUE_DEPTH.set_function(_send_queue_depths)
+room_lifecycle.lifecycle.on_release(manager.release_room)
@@ -29,6 +29,12 @@ interface GameRoomProps {
   isHost: boolean;
 }
 
+// Closes worth retrying: a dropped connection or failed handshake (1006), a
+// server error (1011), a restart (1012) and "try again later" (1013)
+const RETRY_CLOSE_CODES = new Set([1006, 1011, 1012, 1013]);
+const RETRY_BASE_DELAY_MS = 500;
+const RETRY_MAX_DELAY_MS = 15000;
+
 const parseWebSocketMessage = (message: string) => {
   try { return JSON.parse(message); } catch (error) { return null; }
 };
@@ -50,6 +56,21 @@ const GameRoom: React.FC<GameRoomProps> = ({ roomCode, initialPlayers, userId, i
   const isMobile = useMediaQuery(theme.breakpoints.down('md'));
 
   useEffect(() => {
+    let reconnectTimer: ReturnType<typeof setTimeout> | undefined;
+    let reconnectPending = false;
+    let resumeToken: string | undefined;
+    let attempts = 0;
+    let disposed = false;
+
+    const scheduleReconnect = (delayMs: number) => {
+      clearTimeout(reconnectTimer);
+      reconnectPending = true;
+      reconnectTimer = setTimeout(() => {
+        reconnectPending = false;
+        connect();
+      }, delayMs);
+    };
+
     const handleMessage = (event: MessageEvent) => {
       const data = parseWebSocketMessage(event.data);
       if (!data) return;
@@ -106,17 +127,47 @@ const GameRoom: React.FC<GameRoomProps> = ({ roomCode, initialPlayers, userId, i
         case 'error':
           alert(`Server error: ${data.message}`);
           break;
+        case 'reconnect':
+          // The server is restarting; come back after its suggested delay so everyone doesn't reconnect at once
+          resumeToken = data.resume_token ?? undefined;
+          scheduleReconnect(data.retry_after_ms);
+          break;
       }
     };
 
-    if (userId && typeof userId === 'number') {
-      const ws = new WebSocket(`${WEBSOCKET_URL}/rooms/ws/${roomCode}/${userId}`);
+    const connect = () => {
+      const query = resumeToken ? `?resume=${encodeURIComponent(resumeToken)}` : '';
+      const ws = new WebSocket(`${WEBSOCKET_URL}/rooms/ws/${roomCode}/${userId}${query}`);
       socketRef.current = ws;
       ws.onopen = () => console.log('WebSocket connected');
-      ws.onclose = () => console.log('WebSocket disconnected');
-      ws.onmessage = handleMessage;
+      // An error is always followed by a close, which does the retrying
+      ws.onerror = () => console.log('WebSocket error');
+      ws.onclose = (event: CloseEvent) => {
+        console.log(`WebSocket disconnected (${event.code})`);
+        // Skip sockets already replaced, and closes the reconnect event already scheduled for
+        if (disposed || socketRef.current !== ws || reconnectPending || !RETRY_CLOSE_CODES.has(event.code)) return;
+        // Exponential backoff with full jitter, keeping any resume token for the next try
+        const delayMs = Math.random() * Math.min(RETRY_MAX_DELAY_MS, RETRY_BASE_DELAY_MS * 2 ** attempts);
+        attempts += 1;
+        scheduleReconnect(delayMs);
+      };
+      ws.onmessage = (event: MessageEvent) => {
+        // A draining worker accepts and closes without a word, so only a
+        // message shows this socket was taken (and its resume token used up)
+        resumeToken = undefined;
+        attempts = 0;
+        handleMessage(event);
+      };
+    };
+
+    if (userId && typeof userId === 'number') {
+      connect();
 
-      return () => ws.close();
+      return () => {
+        disposed = true;
+        clearTimeout(reconnectTimer);
+        socketRef.current?.close();
+      };
     }
   }, [roomCode, userId]);
 
@@ -145,7 +196,9 @@ const GameRoom: React.FC<GameRoomProps> = ({ roomCode, initialPlayers, userId, i
 
   const handleNextQuestion = async () => {
     try {
-      const response = await fetch(`${API_URL}/rooms/${roomCode}/next_question/${userId}`, {
+      // Names the round on screen, so a double click can't skip the next one
+      const from = currentQuestion ? `?question_id=${currentQuestion.id}` : '';
+      const response = await fetch(`${API_URL}/rooms/${roomCode}/next_question/${userId}${from}`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',